@@ -1,11 +1,46 @@
 import os
+import json
 import pickle
-import pandas as pd
-from flask import Flask, request, Response
-from health_insurance.HealthInsurance import HealthInsurance
+import time
+from flask import Flask, g, request, Response, send_file, stream_with_context
+from health_insurance import response_format
+from health_insurance.metrics import METRICS, RequestTimer
+from health_insurance.profiler import Profiler, report
+from health_insurance.startup import Startup
+# pandas, sklearn and the artifact loaders are imported by load_services(), off the port-binding path
 
-# Check if model exists, if not train it
-if not os.path.exists('model/model_health_insurance.pkl'):
+# 'eager' loads everything at import; 'background' binds the port first and loads in a thread
+STARTUP_MODE = os.environ.get( 'STARTUP_MODE', 'eager' )
+# how long a request arriving during a background startup waits before getting a 503
+STARTUP_WAIT_SECONDS = float( os.environ.get( 'STARTUP_WAIT_SECONDS', 30 ) )
+
+# scoring engine: 'pandas' (HealthInsurance stages), 'numpy' (HealthInsuranceOptimized) or
+# 'compiled' (CompiledLogistic tables, falling back to numpy when no up-to-date tables exist)
+ENGINE = os.environ.get( 'HEALTH_INSURANCE_ENGINE', 'pandas' )
+
+# records per micro-batch on the NDJSON streaming endpoint
+STREAM_BATCH_SIZE = int( os.environ.get( 'STREAM_BATCH_SIZE', 1000 ) )
+
+# scored by the warm-up prediction that flips /readyz
+WARM_UP_RECORD = {
+    'id': 0, 'Gender': 'Male', 'Age': 44, 'Driving_License': 1, 'Region_Code': 28.0, 'Previously_Insured': 0,
+    'Vehicle_Age': '< 1 Year', 'Vehicle_Damage': 'Yes', 'Annual_Premium': 40454.0, 'Policy_Sales_Channel': 26.0, 'Vintage': 217,
+}
+
+# endpoints the sampling profiler may pick requests from (PROFILE_SAMPLE_EVERY / PROFILE_TOKEN)
+PROFILED_ENDPOINTS = { 'healthinsurance_predict': 'predict' }
+
+# set by load_services()
+score_cache = None
+registry = None
+batcher = None
+
+
+def train_missing_model():
+    # Check if model exists, if not train it
+    from health_insurance.bundle import BUNDLE_FILE
+    if os.path.exists('model/model_health_insurance.pkl') or os.path.exists(BUNDLE_FILE):
+        return
     print("Model not found. Training lightweight model...")
     try:
         from train_lightweight_model import train_lightweight_model
@@ -42,12 +77,87 @@ if not os.path.exists('model/model_health_insurance.pkl'):
             with open(f'parameter/{encoder_name}.pkl', 'wb') as f:
                 pickle.dump({'default': 0.5}, f)
 
-# loading model
-model = pickle.load( open( 'model/model_health_insurance.pkl', 'rb') )
+
+def load_services():
+    global score_cache, registry, batcher
+    from health_insurance.registry import PipelineRegistry
+    from health_insurance.score_cache import ScoreCache
+
+    train_missing_model()
+
+    # cross-request score cache used by the numpy engine (SCORE_CACHE_SIZE=0 disables it)
+    cache_size = int( os.environ.get( 'SCORE_CACHE_SIZE', 50000 ) )
+    cache_ttl = os.environ.get( 'SCORE_CACHE_TTL' )
+    score_cache = ScoreCache( max_size=cache_size, ttl=float( cache_ttl ) if cache_ttl else None ) if cache_size > 0 else None
+
+    # loading model and preprocessing pipeline once; reloaded when the artifacts change
+    registry = PipelineRegistry( check_interval=float( os.environ.get( 'PIPELINE_RELOAD_INTERVAL', 2 ) ), cache=score_cache )
+
+    # optional coalescing of concurrent single-record requests (COALESCE_WINDOW_MS=0 disables it)
+    coalesce_window_ms = float( os.environ.get( 'COALESCE_WINDOW_MS', 0 ) )
+    batcher = coalescing_batcher( coalesce_window_ms / 1000.0, int( os.environ.get( 'COALESCE_MAX_BATCH', 64 ) ) ) if coalesce_window_ms > 0 else None
+
+
+def coalescing_batcher( window, max_batch ):
+    from health_insurance.coalescer import MicroBatcher
+    # strict batch: a NaN or malformed record fails it instead of moving every caller to the 0.5 fallback,
+    # and the batcher then scores each record alone, as if it had not been coalesced
+    return MicroBatcher( lambda records: score_micro_batch( registry.current(), records, strict=True ),
+                         window=window, max_batch=max_batch,
+                         score_each=lambda records: score_micro_batch( registry.current(), records ) )
+
+
+def warm_up():
+    # one prediction through the configured engine: imports, lookups and the model are all exercised.
+    # strict, because the request path answers a failing model with the 0.5 fallback, which would pass any range check
+    rows = score_micro_batch( registry.current(), [ dict( WARM_UP_RECORD ) ], strict=True )
+    if not 0.0 <= rows[0]['score'] <= 1.0:
+        raise ValueError( f"warm-up score out of range: {rows[0]['score']}" )
+
+
+def score_records( snapshot, records, strict=False ):
+    # scores only, with the configured engine; strict raises where requests get the 0.5 fallback
+    if ENGINE == 'compiled' and snapshot.compiled is not None:
+        if strict:
+            return snapshot.compiled.predict_columns( snapshot.engine.columns_from_records( records ), len( records ) )
+        return snapshot.compiled.score_records( records )
+    if ENGINE in ( 'numpy', 'compiled' ):
+        engine = snapshot.engine
+        if strict:
+            return engine.score_matrix( engine.prepare( engine.columns_from_records( records ), len( records ) ) )
+        return engine.score_records( records )
+    import pandas as pd
+    pipeline = snapshot.pipeline
+    test_raw = pd.DataFrame( records, columns=records[0].keys() )
+    df3 = pipeline.data_preparation( pipeline.feature_engineering( pipeline.data_cleaning( test_raw ) ) )
+    if strict:
+        return pipeline.predict_scores( snapshot.model, df3 )
+    return pipeline.get_scores( snapshot.model, df3 )
+
+
+def score_micro_batch( snapshot, records, strict=False ):
+    # rows echo the input with snake_case keys plus the score, whatever the engine
+    return snapshot.engine.records_response( records, score_records( snapshot, records, strict ) )
+
+
+startup = Startup( load_services, warm_up ).start( background=STARTUP_MODE == 'background' )
 
 # initialize API
 app = Flask( __name__ )
 
+if STARTUP_MODE == 'background':
+    @app.before_request
+    def start_loading():
+        # no-op once ready; starts the loader in a process forked before it finished
+        startup.start()
+
+
+def unavailable():
+    # None when the artifacts are loaded (waiting up to STARTUP_WAIT_SECONDS for them), else a 503
+    if startup.wait( STARTUP_WAIT_SECONDS ):
+        return None
+    return Response( json.dumps( startup.status() ), status=503, mimetype='application/json', headers={ 'Retry-After': '1' } )
+
 @app.route( '/', methods=['GET'] )
 def home():
     return '''
@@ -57,43 +167,182 @@ def home():
     <p>Available endpoints:</p>
     <ul>
         <li>GET / - This page</li>
-        <li>GET /health - Health check</li>
+        <li>GET /health - Health check (503 while the model is loading)</li>
+        <li>GET /livez - Liveness: the process is up</li>
+        <li>GET /readyz - Readiness: artifacts loaded and a warm-up prediction succeeded</li>
+        <li>GET /metrics - Stage latencies, request sizes and fallback counts (Prometheus text format)</li>
+        <li>GET /profiles - Sampled request profiles (when profiling is enabled, X-Profile-Token required)</li>
         <li>POST /healthinsurance/predict - Get predictions</li>
+        <li>POST /healthinsurance/predict/stream - NDJSON in, NDJSON out, scored in micro-batches</li>
+        <li>GET /healthinsurance/cache - Score cache statistics</li>
+        <li>GET /healthinsurance/coalescer - Micro-batching statistics</li>
     </ul>
     '''
 
 @app.route( '/health', methods=['GET'] )
 def health_check():
+    if not startup.ready:
+        return Response( json.dumps( { 'status': startup.status()['status'] } ), status=503, mimetype='application/json' )
     return Response( '{"status": "healthy"}', status=200, mimetype='application/json' )
 
+@app.route( '/livez', methods=['GET'] )
+def livez():
+    # answers as soon as the port is bound; only a failed startup makes the process worth restarting
+    status = startup.status()
+    return Response( json.dumps( status ), status=503 if startup.failed else 200, mimetype='application/json' )
+
+@app.route( '/readyz', methods=['GET'] )
+def readyz():
+    status = startup.status()
+    return Response( json.dumps( status ), status=200 if startup.ready else 503, mimetype='application/json' )
+
+@app.route( '/healthinsurance/cache', methods=['GET'] )
+def cache_stats():
+    busy = unavailable()
+    if busy is not None:
+        return busy
+    stats = score_cache.stats() if score_cache is not None else { 'enabled': False }
+    stats['pipeline_version'] = registry.current().version
+    return Response( json.dumps( stats ), status=200, mimetype='application/json' )
+
+@app.route( '/healthinsurance/coalescer', methods=['GET'] )
+def coalescer_stats():
+    busy = unavailable()
+    if busy is not None:
+        return busy
+    stats = batcher.stats() if batcher is not None else { 'enabled': False }
+    return Response( json.dumps( stats ), status=200, mimetype='application/json' )
+
+def respond( fmt, body ):
+    timer = g.get( 'timer' )
+    if timer is not None:
+        timer.mark( 'serialize' )
+    body, headers = response_format.encode( fmt, body )
+    return Response( body, status=200, mimetype=fmt.mimetype, headers=headers )
+
+@app.after_request
+def record_request( response ):
+    # stage histograms for /metrics and the same stages as a Server-Timing header
+    timer = g.pop( 'timer', None )
+    if timer is not None:
+        timer.finish( response.status_code, request.content_length,
+                      None if response.is_streamed else response.content_length )
+        response.headers['Server-Timing'] = timer.server_timing()
+    return response
+
+# opt-in request profiling: with PROFILE_SAMPLE_EVERY and PROFILE_TOKEN unset none of this is registered
+profiler = Profiler.from_env()
+
+if profiler.enabled:
+    @app.before_request
+    def start_profile():
+        if request.endpoint in PROFILED_ENDPOINTS:
+            g.profile = profiler.start( request.headers )
+            g.profile_start = time.perf_counter()
+
+    @app.after_request
+    def save_profile( response ):
+        profile = g.pop( 'profile', None )
+        if profile is not None:
+            seconds = time.perf_counter() - g.profile_start
+            response.headers['X-Profile-Id'] = profiler.stop( profile, PROFILED_ENDPOINTS[request.endpoint], seconds )
+        return response
+
+    @app.route( '/profiles', methods=['GET'] )
+    def list_profiles():
+        if not profiler.authorized( request.headers ):
+            return Response( '{"error": "X-Profile-Token required"}', status=403, mimetype='application/json' )
+        return Response( json.dumps( { 'stats': profiler.stats(), 'profiles': profiler.listing() } ), status=200, mimetype='application/json' )
+
+    @app.route( '/profiles/<name>', methods=['GET'] )
+    def download_profile( name ):
+        if not profiler.authorized( request.headers ):
+            return Response( '{"error": "X-Profile-Token required"}', status=403, mimetype='application/json' )
+        path = profiler.path( name )
+        if path is None:
+            return Response( '{"error": "Profile not found"}', status=404, mimetype='application/json' )
+        if request.args.get( 'format' ) == 'text': # top functions, readable with curl
+            return Response( report( path, sort=request.args.get( 'sort', 'cumulative' ), limit=request.args.get( 'limit', 40, type=int ) ), status=200, mimetype='text/plain' )
+        return send_file( os.path.abspath( path ), mimetype='application/octet-stream', as_attachment=True, download_name=name )
+
+@app.route( '/metrics', methods=['GET'] )
+def metrics():
+    if startup.ready:
+        for phase, seconds in startup.timings.items():
+            METRICS.set( 'startup_seconds', seconds, phase=phase[:-2] )
+    return Response( METRICS.render(), status=200, mimetype='text/plain; version=0.0.4' )
+
 @app.route( '/healthinsurance/predict', methods=['POST'] )
 def healthinsurance_predict():
+    timer = g.timer = RequestTimer( 'predict', ENGINE )
+    timer.mark( 'parse' )
+    try:
+        fmt = response_format.negotiate( request.args, request.headers )
+    except ValueError as e:
+        return Response( json.dumps( { 'error': str( e ) } ), status=406, mimetype='application/json' )
+    
+    if not startup.ready:
+        timer.mark( 'startup_wait' )
+    busy = unavailable()
+    if busy is not None:
+        return busy
+    
+    timer.mark( 'parse' )
     test_json = request.get_json()
    
     if test_json: # there is data
+        timer.rows = 1 if isinstance( test_json, dict ) else len( test_json )
         try:
+            if not fmt.is_default: # compact / columnar / binary layouts
+                records = [ test_json ] if isinstance( test_json, dict ) else test_json
+                snapshot = registry.current()
+                timer.mark( 'score' )
+                scores = score_records( snapshot, records )
+                timer.mark( 'render' )
+                return respond( fmt, response_format.render( fmt, records, scores ) )
+            
+            if batcher is not None and isinstance( test_json, dict ): # unique example: join the current micro-batch
+                timer.mark( 'score' )
+                return respond( fmt, json.dumps( [ batcher.score( test_json ) ] ) )
+            
+            if ENGINE in ( 'numpy', 'compiled' ):
+                snapshot = registry.current()
+                timer.mark( 'score' )
+                
+                if isinstance( test_json, dict ) and ( ENGINE == 'numpy' or snapshot.compiled is None ): # unique example: scalar fast path
+                    return respond( fmt, json.dumps( [ snapshot.engine.predict_one( test_json ) ] ) )
+                
+                records = [ test_json ] if isinstance( test_json, dict ) else test_json
+                return respond( fmt, json.dumps( score_micro_batch( snapshot, records ) ) )
+            
+            import pandas as pd
             if isinstance( test_json, dict ): # unique example
                 test_raw = pd.DataFrame( test_json, index=[0] )
                 
             else: # multiple examples
                 test_raw = pd.DataFrame( test_json, columns=test_json[0].keys() )
                 
-            # Instantiate HealthInsurance class
-            pipeline = HealthInsurance()
+            # Snapshot of the loaded HealthInsurance pipeline and model
+            snapshot = registry.current()
+            pipeline = snapshot.pipeline
             
             # data cleaning
+            timer.mark( 'data_cleaning' )
             df1 = pipeline.data_cleaning( test_raw )
             
             # feature engineering
+            timer.mark( 'feature_engineering' )
             df2 = pipeline.feature_engineering( df1 )
             
             # data preparation
+            timer.mark( 'data_preparation' )
             df3 = pipeline.data_preparation( df2 )
             
             # prediction
-            df_response = pipeline.get_prediction( model, test_raw, df3 )
+            timer.mark( 'get_prediction' )
+            df_response = pipeline.get_prediction( snapshot.model, test_raw, df3 )
             
-            return df_response
+            return respond( fmt, df_response )
             
         except Exception as e:
             return Response( f'{{"error": "{str(e)}"}}', status=500, mimetype='application/json' )
@@ -101,6 +350,66 @@ def healthinsurance_predict():
     else:
         return Response( '{"error": "No data provided"}', status=400, mimetype='application/json' )
 
+@app.route( '/healthinsurance/predict/stream', methods=['POST'] )
+def healthinsurance_predict_stream():
+    if request.mimetype not in ( 'application/x-ndjson', 'application/jsonl' ):
+        return Response( '{"error": "Expected application/x-ndjson"}', status=415, mimetype='application/json' )
+    
+    busy = unavailable()
+    if busy is not None:
+        return busy
+    
+    batch_size = max( request.args.get( 'batch_size', STREAM_BATCH_SIZE, type=int ), 1 )
+    snapshot = registry.current()
+    stream = request.stream
+    
+    def encode( rows ):
+        return ''.join( json.dumps( row ) + '\n' for row in rows )
+    
+    def scored( timer, batch ):
+        timer.mark( 'score' )
+        rows = score_micro_batch( snapshot, batch )
+        timer.mark( 'serialize' )
+        timer.rows += len( batch )
+        return encode( rows )
+    
+    def generate():
+        # the body is read line by line while results are already flowing back
+        # (timed here: the response has left after_request before the first line is read)
+        timer = RequestTimer( 'stream', ENGINE )
+        timer.mark( 'parse' )
+        batch = []
+        status = 200
+        try:
+            for line_no, line in enumerate( stream, 1 ):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads( line )
+                except ValueError as e:
+                    status = 400
+                    yield json.dumps( { 'error': f'line {line_no}: {e}' } ) + '\n'
+                    return
+                batch.extend( record if isinstance( record, list ) else [ record ] )
+                if len( batch ) >= batch_size:
+                    chunk = scored( timer, batch )
+                    timer.mark( 'send' )
+                    yield chunk
+                    timer.mark( 'parse' )
+                    batch = []
+            if batch:
+                chunk = scored( timer, batch )
+                timer.mark( 'send' )
+                yield chunk
+        except Exception as e:
+            status = 500
+            yield json.dumps( { 'error': str( e ) } ) + '\n'
+        finally:
+            timer.finish( status, request.content_length )
+    
+    return Response( stream_with_context( generate() ), status=200, mimetype='application/x-ndjson' )
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run( host='0.0.0.0', port=port, debug=False )
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Mede o cold load (tempo, RSS de pico e módulos importados) dos pickles contra o bundle sem pickle
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+# cada medida roda em um processo novo, sem nenhum módulo já importado
+CHILD = '''
+import json, resource, sys, time
+
+def peak_rss_mb():
+    # VmHWM is per address space; ru_maxrss would carry over the parent's peak across exec
+    try:
+        with open( '/proc/self/status' ) as f:
+            return next( int( line.split()[1] ) for line in f if line.startswith( 'VmHWM:' ) ) / 1024
+    except ( OSError, StopIteration ):
+        return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024
+
+start = time.perf_counter()
+from health_insurance.registry import PipelineRegistry
+snapshot = PipelineRegistry( home_path=sys.argv[1], bundle_file=sys.argv[2] or None ).current()
+loaded = time.perf_counter() - start
+snapshot.engine.predict_one( json.loads( sys.argv[3] ) )
+print( json.dumps( {
+    'load_s': loaded,
+    'first_prediction_s': time.perf_counter() - start,
+    'max_rss_mb': peak_rss_mb(),
+    'sklearn_imported': 'sklearn' in sys.modules,
+    'model': type( snapshot.model ).__name__,
+} ) )
+'''
+
+
+def measure( home, bundle_file, record ):
+    env = dict( os.environ, PYTHONPATH=ROOT )
+    out = subprocess.run( [ sys.executable, '-c', CHILD, home, bundle_file or '', json.dumps( record ) ],
+                          env=env, check=True, capture_output=True, text=True ).stdout
+    return json.loads( out.strip().splitlines()[-1] )
+
+
+def main():
+    from benchmark_single_record import SAMPLE
+    from health_insurance.bundle import BUNDLE_FILE, export_bundle
+
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--repeat', type=int, default=5 )
+    args = parser.parse_args()
+
+    if not os.path.exists( os.path.join( args.home, BUNDLE_FILE ) ):
+        export_bundle( args.home )
+
+    print( f"{'artefatos':<10} {'load (s)':>10} {'1ª predição (s)':>16} {'RSS pico (MB)':>14} {'sklearn':>8}  modelo" )
+    for name, bundle_file in ( ( 'pickles', None ), ( 'bundle', BUNDLE_FILE ) ):
+        runs = [ measure( args.home, bundle_file, SAMPLE ) for _ in range( args.repeat ) ]
+        best = min( runs, key=lambda r: r['load_s'] )
+        print( f"{name:<10} {best['load_s']:>10.3f} {best['first_prediction_s']:>16.3f} {best['max_rss_mb']:>14.1f} "
+               f"{str( best['sklearn_imported'] ):>8}  {best['model']}" )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark das tabelas compiladas (CompiledLogistic) contra data_preparation + get_prediction e o engine NumPy
+"""
+
+import argparse
+
+import numpy as np
+
+from benchmark_engine import best_of, synthetic_frame
+from health_insurance.compiled import CompiledLogistic
+from health_insurance.registry import PipelineRegistry
+
+
+def pandas_prediction( snapshot, df_raw ):
+    pipeline = snapshot.pipeline
+    df = df_raw.copy()
+    df3 = pipeline.data_preparation( pipeline.feature_engineering( pipeline.data_cleaning( df ) ) )
+    return pipeline.get_prediction( snapshot.model, df, df3 )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--sizes', default='1,1000,100000,1000000' )
+    args = parser.parse_args()
+
+    snapshot = PipelineRegistry( home_path=args.home ).current()
+    engine = snapshot.engine
+    compiled = snapshot.compiled or CompiledLogistic.from_engine( engine )
+
+    print( f"{'linhas':>10} {'pandas (s)':>12} {'numpy (s)':>12} {'tabelas (s)':>12} {'vs pandas':>10} {'vs numpy':>9}" )
+    for n_rows in [ int( n ) for n in args.sizes.split( ',' ) ]:
+        df_raw = synthetic_frame( n_rows )
+        repeat = 20 if n_rows <= 1000 else 3
+
+        np.testing.assert_allclose( compiled.score_frame( df_raw ), engine.score_frame( df_raw ), rtol=1e-9 )
+
+        t_pandas = best_of( lambda: pandas_prediction( snapshot, df_raw ), repeat )
+        t_numpy = best_of( lambda: engine.score_frame( df_raw ), repeat )
+        t_compiled = best_of( lambda: compiled.score_frame( df_raw ), repeat )
+        print( f'{n_rows:>10} {t_pandas:>12.6f} {t_numpy:>12.6f} {t_compiled:>12.6f} '
+               f'{t_pandas / t_compiled:>9.1f}x {t_numpy / t_compiled:>8.2f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark do pipeline pandas (HealthInsurance) contra o engine NumPy (HealthInsuranceOptimized)
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from health_insurance.registry import PipelineRegistry
+from health_insurance.synthetic import generate_frame
+
+
+def synthetic_frame( n_rows, seed=42 ):
+    """
+    Gera clientes sintéticos com o mesmo schema de data/sample_train.csv (sem Response), com as distribuições do train.csv
+    """
+    return generate_frame( n_rows, seed=seed, response=False )
+
+
+def pandas_scores( snapshot, df_raw ):
+    pipeline = snapshot.pipeline
+    df1 = pipeline.data_cleaning( df_raw.copy() )
+    df2 = pipeline.feature_engineering( df1 )
+    df3 = pipeline.data_preparation( df2 )
+    return pipeline.predict_scores( snapshot.model, df3 )
+
+
+def best_of( func, repeat ):
+    timings = []
+    for _ in range( repeat ):
+        start = time.perf_counter()
+        func()
+        timings.append( time.perf_counter() - start )
+    return min( timings )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--sizes', default='1,1000,1000000' )
+    args = parser.parse_args()
+
+    snapshot = PipelineRegistry( home_path=args.home ).current()
+    engine = snapshot.engine
+    engine32 = type( engine )( snapshot.pipeline, snapshot.model, dtype=np.float32 )
+
+    print( f"{'linhas':>10} {'pandas (s)':>12} {'numpy f64 (s)':>14} {'numpy f32 (s)':>14} {'speed-up':>9}" )
+    for n_rows in [ int( n ) for n in args.sizes.split( ',' ) ]:
+        df_raw = synthetic_frame( n_rows )
+        repeat = 20 if n_rows <= 1000 else 3
+
+        np.testing.assert_allclose( engine.score_frame( df_raw ), pandas_scores( snapshot, df_raw ), rtol=1e-6 )
+
+        t_pandas = best_of( lambda: pandas_scores( snapshot, df_raw ), repeat )
+        t_numpy = best_of( lambda: engine.score_frame( df_raw ), repeat )
+        t_numpy32 = best_of( lambda: engine32.score_frame( df_raw ), repeat )
+        print( f'{n_rows:>10} {t_pandas:>12.6f} {t_numpy:>14.6f} {t_numpy32:>14.6f} {t_pandas / t_numpy:>8.1f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark do Random Forest achatado (FlatForest) contra o predict_proba do sklearn: throughput por tamanho de lote,
+tamanho em disco e RSS de pico de um processo que carrega o modelo e pontua
+"""
+
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from benchmark_cold_load import ROOT
+from benchmark_engine import best_of, synthetic_frame
+from health_insurance.HealthInsurance import FEATURE_COLUMNS, HealthInsurance, load_artifacts
+from health_insurance.HealthInsurance_optimized import FEATURE_INDEX, HealthInsuranceOptimized
+from health_insurance.schema import snake_case
+from health_insurance.bundle import export_bundle
+from health_insurance.forest import FlatForest
+
+# cada carga roda em um processo novo; a RSS inclui as páginas do arquivo efetivamente tocadas
+CHILD = '''
+import pickle, sys, time
+import numpy as np
+start = time.perf_counter()
+if sys.argv[1] == 'pickle':
+    with open( sys.argv[2], 'rb' ) as f:
+        model = pickle.load( f )
+else:
+    from health_insurance.bundle import load_bundle
+    model = load_bundle( sys.argv[2] )[1]
+X = np.load( sys.argv[3] )
+model.predict_proba( X )
+with open( '/proc/self/status' ) as f:
+    rss = next( int( line.split()[1] ) for line in f if line.startswith( 'VmHWM:' ) ) / 1024
+print( '{"seconds": %f, "max_rss_mb": %f}' % ( time.perf_counter() - start, rss ) )
+'''
+
+
+def features( engine, df_raw ):
+    X = engine.prepare( { snake_case( c ): df_raw[c].to_numpy() for c in df_raw.columns }, len( df_raw ) )
+    return X[:, [ FEATURE_INDEX[c] for c in FEATURE_COLUMNS ]]
+
+
+def measure( kind, path, sample ):
+    env = dict( os.environ, PYTHONPATH=ROOT )
+    out = subprocess.run( [ sys.executable, '-c', CHILD, kind, path, sample ], env=env, check=True, capture_output=True, text=True ).stdout
+    return json.loads( out.strip().splitlines()[-1] )
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com parameter/' )
+    parser.add_argument( '--rows', type=int, default=100000, help='linhas de treino do forest' )
+    parser.add_argument( '--trees', type=int, default=100 )
+    parser.add_argument( '--sizes', default='1,100,1000,20000' )
+    args = parser.parse_args()
+
+    from sklearn.ensemble import RandomForestClassifier
+
+    artifacts = load_artifacts( args.home )
+    engine = HealthInsuranceOptimized( HealthInsurance( artifacts=artifacts ) )
+    df = synthetic_frame( args.rows, seed=1 )
+    rng = np.random.default_rng( 0 )
+    logit = -2 + 1.5 * ( df['Vehicle_Damage'] == 'Yes' ) - 3 * df['Previously_Insured'] + 0.02 * ( df['Age'] - 40 )
+    y = ( rng.random( len( df ) ) < 1 / ( 1 + np.exp( -logit ) ) ).astype( int )
+    # mesmo modelo do train_model.py: árvores sem limite de profundidade
+    forest = RandomForestClassifier( n_estimators=args.trees, random_state=42, n_jobs=1 ).fit( features( engine, df ), y )
+    flat = FlatForest.from_sklearn( forest )
+
+    sizes = [ int( n ) for n in args.sizes.split( ',' ) ]
+    X_test = features( engine, synthetic_frame( max( sizes ), seed=5 ) )
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_file = os.path.join( tmp, 'model.pkl' )
+        with open( pickle_file, 'wb' ) as f:
+            pickle.dump( forest, f )
+        bundle_file = export_bundle( path=os.path.join( tmp, 'model.bundle' ), artifacts=artifacts, model=forest )
+        sample = os.path.join( tmp, 'sample.npy' )
+        np.save( sample, X_test[:1000] )
+
+        print( f'nós: {flat.n_nodes}  profundidade máx.: {flat.max_depth}' )
+        print( f'pickle: {os.path.getsize( pickle_file ) / 1e6:.1f} MB  bundle: {os.path.getsize( bundle_file ) / 1e6:.1f} MB' )
+        for kind, path in ( ( 'pickle', pickle_file ), ( 'bundle', bundle_file ) ):
+            run = measure( kind, path, sample )
+            print( f"{kind:<7} carga + 1000 linhas: {run['seconds']:.2f} s  RSS pico: {run['max_rss_mb']:.0f} MB" )
+
+    print( f"\n{'linhas':>8} {'sklearn (s)':>12} {'flat (s)':>10} {'speedup':>8}" )
+    for n_rows in sizes:
+        X = X_test[:n_rows]
+        np.testing.assert_allclose( flat.predict_proba( X ), forest.predict_proba( X ), rtol=0, atol=1e-12 )
+        repeat = 20 if n_rows <= 1000 else 3
+        t_sklearn = best_of( lambda: forest.predict_proba( X ), repeat )
+        t_flat = best_of( lambda: flat.predict_proba( X ), repeat )
+        print( f'{n_rows:>8} {t_sklearn:>12.6f} {t_flat:>10.6f} {t_sklearn / t_flat:>7.2f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Teste de carga de /healthinsurance/predict: em processo (test client do Flask) e por HTTP em loopback (python app.py)
+
+Para cada tamanho de lote e nível de concorrência, mede requisições/s, registros/s e latência p50/p95/p99.
+Os resultados saem em JSON (--output) e podem ser comparados com uma execução anterior (--baseline):
+o script sai com código 1 se alguma métrica piorar mais que --threshold.
+
+Os payloads vêm de um arquivo JSONL (--payloads, um cliente ou uma lista de clientes por linha) e/ou de clientes sintéticos.
+"""
+
+import argparse
+import http.client
+import importlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from benchmark_engine import synthetic_frame
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+PREDICT = '/healthinsurance/predict'
+HEADERS = { 'Content-Type': 'application/json' }
+
+# métricas que podem ser comparadas com o baseline (--metrics): nome -> True se maior é melhor
+COMPARED = { 'p50_ms': False, 'p95_ms': False, 'p99_ms': False, 'requests_per_s': True, 'rows_per_s': True }
+
+
+def load_records( path, synthetic, seed=42 ):
+    """
+    Clientes do arquivo JSONL (linhas com um dict ou uma lista de dicts) seguidos de `synthetic` clientes sintéticos
+    """
+    records = []
+    if path:
+        with open( path ) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads( line )
+                    records.extend( record if isinstance( record, list ) else [ record ] )
+    if synthetic > 0:
+        records.extend( synthetic_frame( synthetic, seed=seed ).to_dict( 'records' ) )
+    if not records:
+        raise ValueError( 'nenhum payload: informe --payloads ou --synthetic > 0' )
+    return records
+
+
+def bodies( records, batch_size, distinct ):
+    """
+    `distinct` corpos JSON de `batch_size` clientes, tirados de posições diferentes do pool (lote 1 vira um dict)
+    """
+    out = []
+    for i in range( distinct ):
+        start = ( i * batch_size ) % len( records )
+        batch = list( itertools.islice( itertools.cycle( records ), start, start + batch_size ) )
+        out.append( json.dumps( batch[0] if batch_size == 1 else batch ).encode() )
+    return out
+
+
+class InProcess( object ):
+    name = 'inprocess'
+
+    def __init__( self, app_module ):
+        self.app = app_module.app
+
+    def session( self ):
+        client = self.app.test_client()
+        return lambda body: client.post( PREDICT, data=body, headers=HEADERS ).status_code
+
+    def close( self ):
+        pass
+
+
+class Loopback( object ):
+    name = 'http'
+
+    def __init__( self, host, port, server=None ):
+        self.host, self.port, self.server = host, port, server
+
+    @classmethod
+    def spawn( cls, home, port, env, timeout=120 ):
+        server = subprocess.Popen( [ sys.executable, os.path.join( ROOT, 'app.py' ) ], cwd=home or ROOT,
+                                   env=dict( env, PORT=str( port ), PYTHONPATH=ROOT ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+        target = cls( '127.0.0.1', port, server )
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            try:
+                if target.get( '/readyz' ) == 200:
+                    return target
+            except OSError:
+                time.sleep( 0.1 )
+        target.close()
+        raise RuntimeError( 'servidor não ficou pronto' )
+
+    def get( self, path ):
+        conn = http.client.HTTPConnection( self.host, self.port, timeout=5 )
+        try:
+            conn.request( 'GET', path )
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def session( self ):
+        # uma conexão keep-alive por thread, reaberta após erro
+        state = { 'conn': None }
+
+        def post( body ):
+            if state['conn'] is None:
+                state['conn'] = http.client.HTTPConnection( self.host, self.port, timeout=120 )
+            try:
+                state['conn'].request( 'POST', PREDICT, body=body, headers=HEADERS )
+                response = state['conn'].getresponse()
+                response.read()
+                return response.status
+            except ( OSError, http.client.HTTPException ):
+                state['conn'].close()
+                state['conn'] = None
+                return 0
+        return post
+
+    def close( self ):
+        if self.server is not None:
+            self.server.terminate()
+            self.server.wait()
+
+
+def run_cell( target, payloads, concurrency, duration, min_requests ):
+    """
+    `concurrency` threads enviando os corpos em rodízio por `duration` segundos (e ao menos `min_requests` no total)
+    """
+    latencies = [ [] for _ in range( concurrency ) ]
+    errors = [ 0 ] * concurrency
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker( i ):
+        post = target.session()
+        post( payloads[i % len( payloads )] ) # aquecimento da conexão
+        for n in itertools.count( i ):
+            done = sum( len( l ) for l in latencies )
+            if time.perf_counter() >= deadline and done >= min_requests:
+                break
+            t0 = time.perf_counter()
+            status = post( payloads[n % len( payloads )] )
+            latencies[i].append( time.perf_counter() - t0 )
+            errors[i] += status != 200
+
+    threads = [ threading.Thread( target=worker, args=( i, ) ) for i in range( concurrency ) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    timings = np.concatenate( [ np.asarray( l ) for l in latencies ] ) * 1000
+    p50, p95, p99 = np.percentile( timings, [ 50, 95, 99 ] )
+    return { 'requests': len( timings ), 'errors': sum( errors ), 'seconds': round( elapsed, 3 ),
+             'requests_per_s': len( timings ) / elapsed, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'max_ms': timings.max() }
+
+
+def compare( results, baseline, threshold, metrics=( 'p50_ms', 'rows_per_s' ) ):
+    """
+    Regressões de `metrics` acima de `threshold` (fração) entre células com o mesmo modo, lote e concorrência
+    """
+    previous = { ( r['mode'], r['batch_size'], r['concurrency'] ): r for r in baseline['results'] }
+    regressions = []
+    for result in results:
+        old = previous.get( ( result['mode'], result['batch_size'], result['concurrency'] ) )
+        if old is None:
+            continue
+        for metric in metrics:
+            higher_is_better = COMPARED[metric]
+            if not old.get( metric ):
+                continue
+            change = result[metric] / old[metric] - 1
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append( dict( mode=result['mode'], batch_size=result['batch_size'], concurrency=result['concurrency'],
+                                          metric=metric, baseline=old[metric], current=result[metric], change=change ) )
+    return regressions
+
+
+def int_list( text ):
+    return [ int( v ) for v in text.split( ',' ) if v ]
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--mode', choices=[ 'inprocess', 'http', 'both' ], default='both' )
+    parser.add_argument( '--engine', default=os.environ.get( 'HEALTH_INSURANCE_ENGINE', 'numpy' ) )
+    parser.add_argument( '--batch-sizes', type=int_list, default=[ 1, 10, 100, 1000, 10000 ] )
+    parser.add_argument( '--concurrency', type=int_list, default=[ 1, 4 ] )
+    parser.add_argument( '--duration', type=float, default=3.0, help='segundos por célula' )
+    parser.add_argument( '--min-requests', type=int, default=5 )
+    parser.add_argument( '--payloads', default='', help='JSONL com clientes reais (um dict ou lista por linha)' )
+    parser.add_argument( '--synthetic', type=int, default=20000, help='clientes sintéticos somados ao pool' )
+    parser.add_argument( '--distinct', type=int, default=8, help='corpos diferentes por tamanho de lote' )
+    parser.add_argument( '--score-cache', action='store_true', help='mantém o cache de scores (desligado por padrão)' )
+    parser.add_argument( '--port', type=int, default=5085 )
+    parser.add_argument( '--output', default='', help='grava os resultados em JSON' )
+    parser.add_argument( '--baseline', default='', help='JSON de uma execução anterior para comparar' )
+    parser.add_argument( '--threshold', type=float, default=0.10, help='piora máxima aceita em relação ao baseline' )
+    parser.add_argument( '--metrics', default='p50_ms,rows_per_s', help=f'métricas comparadas, entre {",".join( COMPARED )}' )
+    args = parser.parse_args()
+
+    # repetir os mesmos corpos mediria o cache de scores, não o modelo
+    env = dict( os.environ, HEALTH_INSURANCE_ENGINE=args.engine, STARTUP_MODE='eager' )
+    if not args.score_cache:
+        env['SCORE_CACHE_SIZE'] = '0'
+    records = load_records( args.payloads, args.synthetic )
+    args.home = os.path.abspath( args.home ) if args.home else ''
+
+    targets = []
+    if args.mode in ( 'inprocess', 'both' ):
+        os.environ.update( env )
+        if args.home:
+            os.chdir( args.home )
+        targets.append( lambda: InProcess( importlib.import_module( 'app' ) ) )
+    if args.mode in ( 'http', 'both' ):
+        targets.append( lambda: Loopback.spawn( args.home, args.port, env ) )
+
+    print( f'engine={args.engine} pool={len( records )} clientes duração={args.duration}s CPUs={os.cpu_count()}' )
+    print( f"{'modo':<11}{'lote':>7}{'conc':>6}{'req/s':>10}{'linhas/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erros':>7}" )
+    results = []
+    for make_target in targets:
+        target = make_target()
+        try:
+            for batch_size in args.batch_sizes:
+                payloads = bodies( records, batch_size, args.distinct )
+                for concurrency in args.concurrency:
+                    cell = run_cell( target, payloads, concurrency, args.duration, args.min_requests )
+                    cell.update( mode=target.name, batch_size=batch_size, concurrency=concurrency,
+                                 rows_per_s=cell['requests_per_s'] * batch_size )
+                    results.append( cell )
+                    print( f"{target.name:<11}{batch_size:>7}{concurrency:>6}{cell['requests_per_s']:>10.1f}{cell['rows_per_s']:>12.0f}"
+                           f"{cell['p50_ms']:>10.2f}{cell['p95_ms']:>10.2f}{cell['p99_ms']:>10.2f}{cell['errors']:>7}" )
+        finally:
+            target.close()
+
+    report = { 'engine': args.engine, 'cpus': os.cpu_count(), 'python': platform.python_version(), 'pool': len( records ),
+               'payloads': args.payloads or None, 'duration': args.duration, 'created': time.time(), 'results': results }
+    if args.output:
+        with open( args.output, 'w' ) as f:
+            json.dump( report, f, indent=2 )
+        print( f'\n💾 resultados em {args.output}' )
+
+    failed = any( r['errors'] for r in results )
+    if args.baseline:
+        with open( args.baseline ) as f:
+            baseline = json.load( f )
+        if baseline.get( 'engine' ) != args.engine or baseline.get( 'cpus' ) != os.cpu_count():
+            print( f"⚠️  baseline com engine={baseline.get( 'engine' )} CPUs={baseline.get( 'cpus' )}: comparação entre ambientes diferentes" )
+        regressions = compare( results, baseline, args.threshold, [ m for m in args.metrics.split( ',' ) if m ] )
+        for r in regressions:
+            print( f"❌ {r['mode']} lote={r['batch_size']} conc={r['concurrency']} {r['metric']}: "
+                   f"{r['baseline']:.2f} → {r['current']:.2f} ({r['change']:+.1%})" )
+        if not regressions:
+            print( f'✅ nenhuma regressão acima de {args.threshold:.0%} em relação a {args.baseline}' )
+        failed |= bool( regressions )
+    if any( r['errors'] for r in results ):
+        print( '❌ houve requisições com erro' )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
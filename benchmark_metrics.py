@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Mede o custo da instrumentação (RequestTimer, histogramas, Server-Timing) em relação ao custo de uma requisição
+
+1. custo isolado de um ciclo completo do RequestTimer (marks + finish + header), comparado ao tempo médio de
+   uma requisição /healthinsurance/predict pelo test client do Flask (mesmo processo, sem rede)
+2. A/B das requisições com o timer real e com um timer nulo (informativo: a variação entre rodadas é da ordem do efeito)
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+
+from benchmark_single_record import SAMPLE
+from health_insurance.metrics import Metrics, RequestTimer
+
+STAGES = { 'pandas': [ 'parse', 'data_cleaning', 'feature_engineering', 'data_preparation', 'get_prediction', 'serialize' ],
+           'numpy': [ 'parse', 'score', 'serialize' ] }
+
+
+class NullTimer( object ):
+    rows = 0
+
+    def __init__( self, route, engine ):
+        pass
+
+    def mark( self, name ):
+        pass
+
+    def finish( self, *args, **kwargs ):
+        pass
+
+    def server_timing( self ):
+        return ''
+
+
+def timer_cost( stages, iterations ):
+    metrics = Metrics()
+    start = time.perf_counter()
+    for _ in range( iterations ):
+        timer = RequestTimer( 'predict', 'numpy' )
+        for stage in stages:
+            timer.mark( stage )
+        timer.rows = 1
+        timer.finish( 200, 250, 300, metrics=metrics )
+        timer.server_timing()
+    return ( time.perf_counter() - start ) / iterations
+
+
+def request_cost( client, payload, iterations ):
+    for _ in range( max( iterations // 10, 5 ) ):
+        client.post( '/healthinsurance/predict', json=payload )
+    start = time.perf_counter()
+    for _ in range( iterations ):
+        client.post( '/healthinsurance/predict', json=payload )
+    return ( time.perf_counter() - start ) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--iterations', type=int, default=2000 )
+    parser.add_argument( '--rounds', type=int, default=3 )
+    parser.add_argument( '--max-overhead', type=float, default=0.02 )
+    args = parser.parse_args()
+
+    if args.home:
+        os.chdir( args.home )
+    app_module = importlib.import_module( 'app' )
+    client = app_module.app.test_client()
+
+    failed = False
+    print( f"{'engine':<8}{'linhas':>7}{'requisição (µs)':>18}{'timer (µs)':>12}{'overhead':>10}{'A/B':>9}" )
+    for engine in ( 'numpy', 'pandas' ):
+        app_module.ENGINE = engine
+        iterations = args.iterations if engine == 'numpy' else max( args.iterations // 10, 50 )
+        for rows in ( 1, 100 ):
+            payload = SAMPLE if rows == 1 else [ SAMPLE ] * rows
+            per_request = min( request_cost( client, payload, iterations ) for _ in range( args.rounds ) )
+            per_timer = min( timer_cost( STAGES[engine], 20000 ) for _ in range( args.rounds ) )
+
+            app_module.RequestTimer = NullTimer
+            bare = min( request_cost( client, payload, iterations ) for _ in range( args.rounds ) )
+            app_module.RequestTimer = RequestTimer
+
+            overhead = per_timer / per_request
+            failed |= overhead > args.max_overhead
+            print( f'{engine:<8}{rows:>7}{per_request * 1e6:>18.1f}{per_timer * 1e6:>12.2f}{overhead:>10.2%}'
+                   f'{per_request / bare - 1:>+9.1%}' )
+
+    print( f"\n{'❌' if failed else '✅'} overhead máximo permitido: {args.max_overhead:.0%}" )
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Escalabilidade do scoring em lote com processos (fork + copy-on-write) para 1, 2, 4 e 8 workers
+"""
+
+import argparse
+import os
+import time
+
+from benchmark_engine import synthetic_frame
+from health_insurance.batch_score import make_scorer
+from health_insurance.parallel import parallel_score_frame
+from health_insurance.registry import PipelineRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--rows', type=int, default=1000000 )
+    parser.add_argument( '--workers', default='1,2,4,8' )
+    parser.add_argument( '--engine', choices=[ 'numpy', 'pandas' ], default='pandas' )
+    args = parser.parse_args()
+
+    # carregado uma única vez no processo pai, antes do fork
+    score = make_scorer( PipelineRegistry( home_path=args.home ).current(), args.engine )
+    df = synthetic_frame( args.rows )
+
+    print( f'engine={args.engine} linhas={args.rows} CPUs={os.cpu_count()}' )
+    print( f"{'workers':>8} {'tempo (s)':>10} {'linhas/s':>12} {'speed-up':>9}" )
+    baseline = None
+    for workers in [ int( w ) for w in args.workers.split( ',' ) ]:
+        start = time.perf_counter()
+        parallel_score_frame( score, df, workers )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print( f'{workers:>8} {elapsed:>10.3f} {args.rows / elapsed:>12,.0f} {baseline / elapsed:>8.2f}x' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compara requisições por segundo entre o servidor de desenvolvimento (python app.py) e o Gunicorn
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from benchmark_single_record import SAMPLE
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+
+def wait_for( port, timeout=60 ):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection( '127.0.0.1', port, timeout=2 )
+            conn.request( 'GET', '/health' )
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep( 0.2 )
+    return False
+
+
+def load( port, duration, concurrency, payload ):
+    """
+    Dispara requisições POST com conexões keep-alive e devolve (requisições, erros)
+    """
+    body = json.dumps( payload )
+    headers = { 'Content-Type': 'application/json' }
+    counts = [ 0 ] * concurrency
+    errors = [ 0 ] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def worker( i ):
+        conn = http.client.HTTPConnection( '127.0.0.1', port, timeout=30 )
+        while time.perf_counter() < deadline:
+            try:
+                conn.request( 'POST', '/healthinsurance/predict', body=body, headers=headers )
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    counts[i] += 1
+                else:
+                    errors[i] += 1
+            except ( OSError, http.client.HTTPException ):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection( '127.0.0.1', port, timeout=30 )
+
+    threads = [ threading.Thread( target=worker, args=( i, ) ) for i in range( concurrency ) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum( counts ), sum( errors )
+
+
+def run_mode( name, command, home, port, args ):
+    env = dict( os.environ, PORT=str( port ), PYTHONPATH=ROOT )
+    server = subprocess.Popen( command, cwd=home or ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+    try:
+        if not wait_for( port ):
+            print( f'❌ {name}: servidor não respondeu' )
+            return
+        load( port, 1, args.concurrency, SAMPLE )  # aquecimento
+        requests_ok, errors = load( port, args.duration, args.concurrency, SAMPLE )
+        print( f'{name:<28} {requests_ok / args.duration:>10.1f} req/s   erros={errors}' )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--duration', type=float, default=10 )
+    parser.add_argument( '--concurrency', type=int, default=16 )
+    parser.add_argument( '--workers', type=int, default=2 )
+    parser.add_argument( '--threads', type=int, default=4 )
+    parser.add_argument( '--port', type=int, default=5055 )
+    args = parser.parse_args()
+
+    print( f'concorrência={args.concurrency} duração={args.duration}s CPUs={os.cpu_count()}' )
+    run_mode( 'python app.py (Werkzeug)', [ sys.executable, os.path.join( ROOT, 'app.py' ) ], args.home, args.port, args )
+
+    os.environ.update( WEB_CONCURRENCY=str( args.workers ), GUNICORN_THREADS=str( args.threads ) )
+    gunicorn = [ sys.executable, '-m', 'gunicorn', '-c', os.path.join( ROOT, 'gunicorn.conf.py' ), 'app:app' ]
+    run_mode( f'gunicorn {args.workers}w x {args.threads}t', gunicorn, args.home, args.port + 1, args )
+
+
+if __name__ == '__main__':
+    main()
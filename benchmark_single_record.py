@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da predição de um único cliente (payload dict), sem HTTP
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from health_insurance.registry import PipelineRegistry
+
+SAMPLE = {
+    "Gender": "Male",
+    "Age": 44,
+    "Driving_License": 1,
+    "Region_Code": 28.0,
+    "Previously_Insured": 0,
+    "Vehicle_Age": "< 1 Year",
+    "Vehicle_Damage": "Yes",
+    "Annual_Premium": 40454.0,
+    "Policy_Sales_Channel": 26.0,
+    "Vintage": 217
+}
+
+
+def fast_path( engine, record ):
+    return json.dumps( [ engine.predict_one( record ) ] )
+
+
+def pandas_path( snapshot, record ):
+    pipeline = snapshot.pipeline
+    test_raw = pd.DataFrame( record, index=[0] )
+    df1 = pipeline.data_cleaning( test_raw )
+    df2 = pipeline.feature_engineering( df1 )
+    df3 = pipeline.data_preparation( df2 )
+    return pipeline.get_prediction( snapshot.model, test_raw, df3 )
+
+
+def latencies( func, iterations ):
+    timings = np.empty( iterations )
+    for i in range( iterations ):
+        start = time.perf_counter()
+        func()
+        timings[i] = time.perf_counter() - start
+    return timings * 1000
+
+
+def report( name, timings ):
+    p50, p95, p99 = np.percentile( timings, [ 50, 95, 99 ] )
+    print( f'{name:<14} p50={p50:.4f} ms  p95={p95:.4f} ms  p99={p99:.4f} ms  max={timings.max():.4f} ms' )
+    return p99
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--iterations', type=int, default=10000 )
+    parser.add_argument( '--target-ms', type=float, default=1.0, help='p99 máximo aceito para o fast path' )
+    args = parser.parse_args()
+
+    snapshot = PipelineRegistry( home_path=args.home ).current()
+    engine = snapshot.engine
+
+    # warm-up
+    for _ in range( 100 ):
+        fast_path( engine, SAMPLE )
+
+    p99 = report( 'fast path', latencies( lambda: fast_path( engine, SAMPLE ), args.iterations ) )
+    report( 'pandas', latencies( lambda: pandas_path( snapshot, SAMPLE ), max( args.iterations // 100, 10 ) ) )
+
+    if p99 < args.target_ms:
+        print( f'✅ p99 do fast path abaixo de {args.target_ms} ms' )
+        return True
+    print( f'❌ p99 do fast path acima de {args.target_ms} ms' )
+    return False
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit( 0 if success else 1 )
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark por etapa: o caminho pandas do HealthInsurance (data_cleaning, feature_engineering, data_preparation,
+get_prediction) lado a lado com as etapas equivalentes do engine NumPy e das tabelas compiladas, de 1 a 10M linhas
+
+Para cada etapa: melhor tempo entre --repeat execuções, linhas/s, pico de memória alocada (tracemalloc, numa execução
+separada, porque o tracemalloc deixa tudo mais lento) e crescimento do RSS do processo durante a etapa.
+Etapas que montam JSON por registro (todo o caminho pandas e o serialize do engine) param em --max-json-rows.
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmark_engine import synthetic_frame
+from health_insurance.compiled import CompiledLogistic
+from health_insurance.registry import PipelineRegistry
+from health_insurance.schema import snake_case
+
+
+def rss_bytes():
+    # RSS atual; sem /proc, o pico do processo (só cresce)
+    try:
+        with open( '/proc/self/statm' ) as f:
+            return int( f.read().split()[1] ) * os.sysconf( 'SC_PAGE_SIZE' )
+    except OSError:
+        return resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss * 1024
+
+
+def pandas_stages( snapshot ):
+    pipeline, model = snapshot.pipeline, snapshot.model
+    return [
+        ( 'data_cleaning', lambda s: s.update( df1=pipeline.data_cleaning( s['raw'] ) ) ),
+        ( 'feature_engineering', lambda s: s.update( df2=pipeline.feature_engineering( s['df1'] ) ) ),
+        ( 'data_preparation', lambda s: s.update( df3=pipeline.data_preparation( s['df2'] ) ) ),
+        ( 'get_prediction', lambda s: s.update( body=pipeline.get_prediction( model, s['raw'], s['df3'] ),
+                                                scores=s['raw']['score'].to_numpy() ) ),
+        # as duas etapas acima terminam com um gc.collect(): quanto custa um, com o heap neste estado
+        ( 'gc.collect', lambda s: gc.collect() ),
+    ]
+
+
+def columns_stage( s ):
+    s['columns'] = { snake_case( c ): s['raw'][c].to_numpy() for c in s['raw'].columns }
+
+
+def numpy_stages( engine, json_rows ):
+    stages = [
+        ( 'columns', columns_stage ),
+        ( 'prepare', lambda s: s.update( X=engine.prepare( s['columns'], s['rows'] ) ) ),
+        ( 'predict', lambda s: s.update( scores=engine.predict_matrix( s['X'] ) ) ),
+    ]
+    if json_rows:
+        # a resposta padrão da API no engine numpy: json.dumps dos registros com o score
+        stages.append( ( 'serialize', lambda s: s.update( body=json.dumps( engine.records_response( s['records'], s['scores'] ) ) ) ) )
+    return stages
+
+
+def compiled_stages( compiled ):
+    return [
+        ( 'columns', columns_stage ),
+        ( 'score', lambda s: s.update( scores=compiled.score_columns( s['columns'], s['rows'] ) ) ),
+    ]
+
+
+def run_chain( stages, df_raw, records, trace=False ):
+    """
+    Executa as etapas em sequência (cada uma lê o estado da anterior); por etapa: (segundos, pico tracemalloc, Δ RSS)
+    """
+    # o caminho pandas altera o frame de entrada; os engines só leem as colunas
+    mutates = stages[0][0] == 'data_cleaning'
+    state = { 'raw': df_raw.copy() if mutates else df_raw, 'rows': len( df_raw ), 'records': records }
+    out = {}
+    for name, step in stages:
+        if trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        rss = rss_bytes()
+        start = time.perf_counter()
+        step( state )
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base if trace else None
+        out[name] = ( seconds, peak, rss_bytes() - rss )
+    return out, state.get( 'scores' )
+
+
+def measure( stages, df_raw, records, repeat, memory ):
+    runs = [ run_chain( stages, df_raw, records ) for _ in range( repeat ) ]
+    scores = runs[-1][1]
+    result = { name: { 'seconds': min( run[0][name][0] for run in runs ), 'rss_growth_bytes': max( run[0][name][2] for run in runs ) }
+               for name, _ in stages }
+    if memory:
+        tracemalloc.start()
+        try:
+            traced, _ = run_chain( stages, df_raw, records, trace=True )
+        finally:
+            tracemalloc.stop()
+        for name in result:
+            result[name]['peak_bytes'] = traced[name][1]
+    return result, scores
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--sizes', default='1,100,10000,1000000,10000000' )
+    parser.add_argument( '--repeat', type=int, default=0, help='execuções por etapa (padrão: 20 até 10k linhas, 3 até 1M, 1 acima)' )
+    parser.add_argument( '--max-json-rows', type=int, default=1000000, help='maior tamanho para as etapas que montam JSON' )
+    parser.add_argument( '--no-memory', action='store_true', help='pula a execução com tracemalloc' )
+    parser.add_argument( '--output', default='', help='grava os resultados em JSON' )
+    args = parser.parse_args()
+
+    snapshot = PipelineRegistry( home_path=args.home ).current()
+    engine = snapshot.engine
+    compiled = snapshot.compiled or CompiledLogistic.from_engine( engine )
+
+    print( f"{'linhas':>10}  {'implementação':<15}{'etapa':<21}{'tempo (s)':>12}{'linhas/s':>16}{'pico MB':>10}{'Δ RSS MB':>10}" )
+    results = []
+    for n_rows in [ int( n ) for n in args.sizes.split( ',' ) ]:
+        df_raw = records = None # o tamanho anterior sai da memória antes de gerar o próximo
+        gc.collect()
+        df_raw = synthetic_frame( n_rows )
+        json_rows = n_rows <= args.max_json_rows
+        records = df_raw.to_dict( 'records' ) if json_rows else None
+        repeat = args.repeat or ( 20 if n_rows <= 10000 else 3 if n_rows <= 1000000 else 1 )
+
+        implementations = [ ( 'numpy', numpy_stages( engine, json_rows ) ), ( 'compiled', compiled_stages( compiled ) ) ]
+        if json_rows:
+            implementations.insert( 0, ( 'pandas', pandas_stages( snapshot ) ) )
+
+        scores = {}
+        for implementation, stages in implementations:
+            stage_results, scores[implementation] = measure( stages, df_raw, records, repeat, not args.no_memory )
+            for stage, r in stage_results.items():
+                r.update( rows=n_rows, implementation=implementation, stage=stage, repeat=repeat )
+                results.append( r )
+                peak = f"{r['peak_bytes'] / 2**20:>10.1f}" if 'peak_bytes' in r else f"{'-':>10}"
+                print( f"{n_rows:>10}  {implementation:<15}{stage:<21}{r['seconds']:>12.6f}{n_rows / max( r['seconds'], 1e-9 ):>16,.0f}"
+                       f"{peak}{r['rss_growth_bytes'] / 2**20:>10.1f}" )
+        if 'pandas' in scores:
+            np.testing.assert_allclose( scores['numpy'], scores['pandas'], rtol=1e-6 )
+        np.testing.assert_allclose( scores['compiled'], scores['numpy'], rtol=1e-9 )
+        print()
+
+    if args.output:
+        with open( args.output, 'w' ) as f:
+            json.dump( { 'cpus': os.cpu_count(), 'created': time.time(), 'results': results }, f, indent=2 )
+        print( f'💾 resultados em {args.output}' )
+
+
+if __name__ == '__main__':
+    main()
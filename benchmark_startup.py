@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Mede o cold start do servidor: tempo até o bind (primeira resposta em /livez) e até a primeira predição,
+com STARTUP_MODE=eager e STARTUP_MODE=background, no Werkzeug (python app.py) e no Gunicorn.
+Também mede a memória do servidor carregado: a soma do PSS do master e dos workers (páginas compartilhadas
+via fork contam uma vez só), que é o que conta no limite de memória do plano.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmark_single_record import SAMPLE
+
+ROOT = os.path.dirname( os.path.abspath( __file__ ) )
+
+
+def request( port, method, path, body=None ):
+    conn = http.client.HTTPConnection( '127.0.0.1', port, timeout=60 )
+    try:
+        headers = { 'Content-Type': 'application/json' } if body is not None else {}
+        conn.request( method, path, body=body, headers=headers )
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def process_tree( pid ):
+    pids = [ pid ]
+    try:
+        with open( f'/proc/{pid}/task/{pid}/children' ) as f:
+            for child in f.read().split():
+                pids.extend( process_tree( int( child ) ) )
+    except OSError:
+        pass
+    return pids
+
+
+def tree_pss_bytes( pid ):
+    # PSS somado de todos os processos do servidor; None sem /proc (ex.: macOS)
+    total = 0
+    for p in process_tree( pid ):
+        try:
+            with open( f'/proc/{p}/smaps_rollup' ) as f:
+                total += next( int( line.split()[1] ) for line in f if line.startswith( 'Pss:' ) ) * 1024
+        except ( OSError, StopIteration ):
+            return None
+    return total
+
+
+def cold_start( command, env, home, port, timeout=120, settle=2.0 ):
+    """
+    Sobe o servidor e devolve (segundos até o bind, segundos até a primeira predição, status do /readyz,
+    PSS do servidor `settle` segundos depois da primeira predição, quando todos os workers já carregaram)
+    """
+    start = time.perf_counter()
+    server = subprocess.Popen( command, cwd=home or ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL )
+    try:
+        bound = None
+        while time.perf_counter() - start < timeout:
+            try:
+                request( port, 'GET', '/livez' )
+                bound = time.perf_counter() - start
+                break
+            except OSError:
+                time.sleep( 0.005 )
+        if bound is None:
+            return None
+        # a requisição feita logo após o bind espera o carregamento (STARTUP_WAIT_SECONDS) em vez de falhar
+        body = json.dumps( SAMPLE )
+        while time.perf_counter() - start < timeout:
+            status, _ = request( port, 'POST', '/healthinsurance/predict', body )
+            if status == 200:
+                break
+            time.sleep( 0.005 )
+        first_prediction = time.perf_counter() - start
+        _, ready = request( port, 'GET', '/readyz' )
+        time.sleep( settle )
+        return bound, first_prediction, json.loads( ready ), tree_pss_bytes( server.pid )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser( description=__doc__ )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--runs', type=int, default=3 )
+    parser.add_argument( '--engine', default='numpy', help='HEALTH_INSURANCE_ENGINE dos servidores' )
+    parser.add_argument( '--workers', type=int, default=2 )
+    parser.add_argument( '--port', type=int, default=5075 )
+    args = parser.parse_args()
+
+    servers = {
+        'python app.py': [ sys.executable, os.path.join( ROOT, 'app.py' ) ],
+        f'gunicorn {args.workers}w': [ sys.executable, '-m', 'gunicorn', '-c', os.path.join( ROOT, 'gunicorn.conf.py' ), 'app:app' ],
+    }
+    print( f'engine={args.engine} execuções={args.runs} CPUs={os.cpu_count()} (medianas, segundos desde o spawn)' )
+    print( f"{'servidor':<16}{'modo':<12}{'bind':>8}{'1ª predição':>14}{'pronto (worker)':>18}{'PSS MB':>10}" )
+    for name, command in servers.items():
+        for mode in ( 'eager', 'background' ):
+            env = dict( os.environ, PORT=str( args.port ), PYTHONPATH=ROOT, STARTUP_MODE=mode,
+                        HEALTH_INSURANCE_ENGINE=args.engine, WEB_CONCURRENCY=str( args.workers ) )
+            runs = [ cold_start( command, env, args.home, args.port ) for _ in range( args.runs ) ]
+            runs = [ run for run in runs if run is not None ]
+            if not runs:
+                print( f'{name:<16}{mode:<12}  servidor não respondeu' )
+                continue
+            bind = statistics.median( run[0] for run in runs )
+            first = statistics.median( run[1] for run in runs )
+            ready = statistics.median( run[2].get( 'ready_after_s', float( 'nan' ) ) for run in runs )
+            pss = [ run[3] for run in runs if run[3] is not None ]
+            pss = f'{statistics.median( pss ) / 2**20:>10.1f}' if pss else f"{'-':>10}"
+            print( f'{name:<16}{mode:<12}{bind:>8.3f}{first:>14.3f}{ready:>18.3f}{pss}' )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import importlib
+import os
+import pickle
+import sys
+
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from health_insurance.HealthInsurance import FEATURE_COLUMNS, HealthInsurance
+
+
+def prepare_features( pipeline, df_raw ):
+    """
+    Executa as etapas pandas do HealthInsurance e devolve as colunas de FEATURE_COLUMNS
+    """
+    df = pipeline.data_cleaning( df_raw.copy() )
+    df = pipeline.feature_engineering( df )
+    df = pipeline.data_preparation( df )
+    return df.reindex( columns=FEATURE_COLUMNS, fill_value=0 )
+
+
+def write_artifacts( home, model=None ):
+    """
+    Gera scalers, encoders e modelo a partir de data/sample_train.csv em `home`
+    """
+    df = pd.read_csv( os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' ) )
+    os.makedirs( os.path.join( home, 'model' ), exist_ok=True )
+    os.makedirs( os.path.join( home, 'parameter' ), exist_ok=True )
+
+    artifacts = {
+        'annual_premium_scaler': StandardScaler().fit( df[['Annual_Premium']].values ),
+        'age_scaler': MinMaxScaler().fit( df[['Age']].values ),
+        'vintage_scaler': MinMaxScaler().fit( df[['Vintage']].values ),
+        'gender_encoder': df.groupby( 'Gender' )['Response'].mean().to_dict(),
+        'region_code_encoder': df.groupby( 'Region_Code' )['Response'].mean().to_dict(),
+        'policy_sales_channel_encoder': df.groupby( 'Policy_Sales_Channel' ).size() / len( df ),
+    }
+    for name, obj in artifacts.items():
+        with open( os.path.join( home, 'parameter', name + '.pkl' ), 'wb' ) as f:
+            pickle.dump( obj, f )
+
+    if model is None:
+        X = prepare_features( HealthInsurance( artifacts=artifacts ), df.drop( columns='Response' ) )
+        model = LogisticRegression( solver='liblinear' ).fit( X, df['Response'] )
+    with open( os.path.join( home, 'model', 'model_health_insurance.pkl' ), 'wb' ) as f:
+        pickle.dump( model, f )
+    return artifacts
+
+
+@pytest.fixture
+def artifacts_home( tmp_path ):
+    write_artifacts( str( tmp_path ) )
+    return str( tmp_path )
+
+
+@pytest.fixture
+def app_module( artifacts_home, monkeypatch ):
+    """
+    Importa app.py com os artefatos de teste (o app usa caminhos relativos)
+    """
+    monkeypatch.chdir( artifacts_home )
+    sys.modules.pop( 'app', None )
+    yield importlib.import_module( 'app' )
+    sys.modules.pop( 'app', None )
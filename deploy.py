@@ -85,7 +85,7 @@ def main():
     print("4. Conecte seu repositório GitHub")
     print("5. Configure:")
     print("   - Build Command: pip install -r requirements.txt")
-    print("   - Start Command: python app.py")
+    print("   - Start Command: gunicorn -c gunicorn.conf.py app:app")
     print("   - Environment: Python 3")
     print("6. Clique em 'Deploy Web Service'")
     print()
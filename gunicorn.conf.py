@@ -0,0 +1,39 @@
+# Configuração do Gunicorn para produção
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# O app (modelo, scalers e encoders) é carregado uma única vez no master
+# (preload_app) e os workers são criados via fork, compartilhando essa memória.
+# Os artefatos continuam sendo recarregados a quente pelo PipelineRegistry,
+# então um novo modelo não exige reload. Para trocar o código: `kill -HUP <master>`
+# recria os workers de forma graciosa; com preload_app o código do master só muda
+# com um restart completo.
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get( 'PORT', 5000 )}"
+
+# processos e threads por processo
+workers = int( os.environ.get( 'WEB_CONCURRENCY', 2 ) )
+threads = int( os.environ.get( 'GUNICORN_THREADS', 4 ) )
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# carrega o modelo no master antes do fork; com STARTUP_MODE=background o master
+# só faz o bind e cada worker carrega o modelo em uma thread própria (/readyz)
+preload_app = os.environ.get( 'STARTUP_MODE', 'eager' ) != 'background'
+
+# recicla cada worker após N requisições para limitar o crescimento de memória
+max_requests = int( os.environ.get( 'GUNICORN_MAX_REQUESTS', 5000 ) )
+max_requests_jitter = int( os.environ.get( 'GUNICORN_MAX_REQUESTS_JITTER', 500 ) )
+
+timeout = int( os.environ.get( 'GUNICORN_TIMEOUT', 60 ) )
+graceful_timeout = int( os.environ.get( 'GUNICORN_GRACEFUL_TIMEOUT', 30 ) )
+keepalive = 5
+
+accesslog = '-' if os.environ.get( 'GUNICORN_ACCESS_LOG' ) else None
+
+
+def when_ready( server ):
+    # objetos do app carregado ficam fora do GC: as coletas nos workers não
+    # tocam nessas páginas, preservando o copy-on-write
+    gc.freeze()
@@ -1,23 +1,60 @@
+import os
 import pickle
-import inflection
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
 import gc
 
+from health_insurance.metrics import record_fallback
+from health_insurance.schema import rename
+
+ARTIFACT_FILES = {
+    'annual_premium_scaler': 'parameter/annual_premium_scaler.pkl',
+    'age_scaler': 'parameter/age_scaler.pkl',
+    'vintage_scaler': 'parameter/vintage_scaler.pkl',
+    'gender_encoder': 'parameter/gender_encoder.pkl',
+    'region_code_encoder': 'parameter/region_code_encoder.pkl',
+    'policy_sales_channel_encoder': 'parameter/policy_sales_channel_encoder.pkl',
+}
+
+# Columns produced by data_preparation, vehicle_age levels in get_dummies order
+FEATURE_COLUMNS = [ 'annual_premium', 'age', 'vintage', 'region_code', 'policy_sales_channel', 'previously_insured', 'vehicle_damage',
+                    'vehicle_age_between1and2years', 'vehicle_age_lessthan1year', 'vehicle_age_over2years' ]
+
+
+def model_columns( model ):
+    # columns the model was fitted on, in fit order (None when unknown)
+    names = getattr( model, 'feature_names_in_', None )
+    if names is not None:
+        return list( names )
+    if getattr( model, 'n_features_in_', None ) == len( FEATURE_COLUMNS ):
+        return list( FEATURE_COLUMNS )
+    return None
+
+
+def load_pickle( path ):
+    with open( path, 'rb' ) as f:
+        return pickle.load( f )
+
+
+def load_artifacts( home_path='' ):
+    return { name: load_pickle( os.path.join( home_path, path ) ) for name, path in ARTIFACT_FILES.items() }
+
+
 class HealthInsurance( object ):
-    def __init__( self ):
-        self.home_path = ''  # Relative path for deployment
+    def __init__( self, home_path='', artifacts=None ):
+        self.home_path = home_path  # Relative path for deployment
         try:
-            self.annual_premium_scaler = pickle.load( open( self.home_path + 'parameter/annual_premium_scaler.pkl', 'rb') )
-            self.age_scaler = pickle.load( open( self.home_path + 'parameter/age_scaler.pkl', 'rb') )
-            self.vintage_scaler = pickle.load( open( self.home_path + 'parameter/vintage_scaler.pkl', 'rb') )
-            self.gender_encoder = pickle.load( open( self.home_path + 'parameter/gender_encoder.pkl', 'rb') )
-            self.region_code_encoder = pickle.load( open( self.home_path + 'parameter/region_code_encoder.pkl', 'rb') )
-            self.policy_sales_channel_encoder = pickle.load( open( self.home_path + 'parameter/policy_sales_channel_encoder.pkl', 'rb') )
+            if artifacts is None:
+                artifacts = load_artifacts( self.home_path )
+            self.annual_premium_scaler = artifacts['annual_premium_scaler']
+            self.age_scaler = artifacts['age_scaler']
+            self.vintage_scaler = artifacts['vintage_scaler']
+            self.gender_encoder = artifacts['gender_encoder']
+            self.region_code_encoder = artifacts['region_code_encoder']
+            self.policy_sales_channel_encoder = artifacts['policy_sales_channel_encoder']
         except Exception as e:
             print(f"Warning: Could not load all encoders: {e}")
             # Create fallback encoders
+            from sklearn.preprocessing import MinMaxScaler
             self.annual_premium_scaler = MinMaxScaler()
             self.age_scaler = MinMaxScaler()
             self.vintage_scaler = MinMaxScaler()
@@ -29,12 +66,8 @@ class HealthInsurance( object ):
     def data_cleaning( self, df1 ): 
         
         ## 1.1. Rename Columns
-        cols_old = df1.columns
-        snakecase = lambda x: inflection.underscore( x )
-        cols_new = list( map( snakecase, cols_old ) )
-        
-        # rename
-        df1.columns = cols_new
+        # fixed raw -> snake_case map (schema.COLUMN_MAP)
+        df1 = rename( df1 )
         
         ## 1.2. Data Types - convert if necessary
         # No specific data type changes needed for this dataset
@@ -56,9 +89,10 @@ class HealthInsurance( object ):
         )
         
         ## 2.2. Vehicle Damage Processing
+        # int8 flag, not a category, when the column was read as one
         df2['vehicle_damage'] = df2['vehicle_damage'].apply(
             lambda x: 1 if str(x).strip().lower() == 'yes' else 0
-        )
+        ).astype( np.int8 )
         
         return df2
 
@@ -68,7 +102,8 @@ class HealthInsurance( object ):
         ## 5.1. Normalization
         # annual_premium
         try:
-            df5['annual_premium'] = self.annual_premium_scaler.transform( df5[['annual_premium']].values )
+            # float64 like the fit, also for float32 columns from schema.read_csv
+            df5['annual_premium'] = self.annual_premium_scaler.transform( df5[['annual_premium']].values.astype( np.float64 ) )
         except:
             df5['annual_premium'] = (df5['annual_premium'] - df5['annual_premium'].mean()) / df5['annual_premium'].std()
 
@@ -92,7 +127,8 @@ class HealthInsurance( object ):
         # Target Encoding for region_code
         df5['region_code'] = df5['region_code'].map( self.region_code_encoder ).fillna(0.5)
         
-        # One Hot Encoding for vehicle_age
+        # One Hot Encoding for vehicle_age (pandas imported here: the numpy engine never needs it)
+        import pandas as pd
         df5 = pd.get_dummies( df5, prefix='vehicle_age', columns=['vehicle_age'] )
         
         # Frequency Encoding for policy_sales_channel
@@ -114,16 +150,37 @@ class HealthInsurance( object ):
         return df5[available_cols]
     
     
-    def get_prediction( self, model, original_data, test_data ):
+    def predict_scores( self, model, test_data ):
+        cols = model_columns( model )
+        if cols is None:
+            return model.predict_proba( test_data )[:, 1]
+        
+        missing = [ col for col in cols if col not in test_data.columns and not col.startswith( 'vehicle_age_' ) ]
+        if missing:
+            raise KeyError( f'Missing model features: {missing}' )
+        
+        # vehicle_age levels absent from this batch are all-zero dummies
+        test_data = test_data.reindex( columns=cols, fill_value=0 )
+        if getattr( model, 'feature_names_in_', None ) is None:
+            test_data = test_data.values
+        
+        return model.predict_proba( test_data )[:, 1]
+    
+    
+    def get_scores( self, model, test_data ):
         # prediction
         try:
-            pred = model.predict_proba( test_data )
-            # join pred into the original data
-            original_data['score'] = pred[:, 1]  # probability of buying insurance
+            return self.predict_scores( model, test_data )  # probability of buying insurance
         except Exception as e:
             print(f"Prediction error: {e}")
             # Fallback prediction
-            original_data['score'] = 0.5  # Default score
+            record_fallback( 'pandas', len( test_data ) )
+            return np.full( len( test_data ), 0.5 )  # Default score
+    
+    
+    def get_prediction( self, model, original_data, test_data ):
+        # join pred into the original data
+        original_data['score'] = self.get_scores( model, test_data )
         
         result = original_data.to_json( orient='records', date_format='iso' )
         
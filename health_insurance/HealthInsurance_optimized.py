@@ -1,133 +1,315 @@
-import pickle
-import inflection
-import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, MinMaxScaler, RobustScaler
-import gc
 
-class HealthInsurance( object ):
-    def __init__( self ):
-        self.home_path = ''  # Relative path for deployment
-        try:
-            self.annual_premium_scaler = pickle.load( open( self.home_path + 'parameter/annual_premium_scaler.pkl', 'rb') )
-            self.age_scaler = pickle.load( open( self.home_path + 'parameter/age_scaler.pkl', 'rb') )
-            self.vintage_scaler = pickle.load( open( self.home_path + 'parameter/vintage_scaler.pkl', 'rb') )
-            self.gender_encoder = pickle.load( open( self.home_path + 'parameter/gender_encoder.pkl', 'rb') )
-            self.region_code_encoder = pickle.load( open( self.home_path + 'parameter/region_code_encoder.pkl', 'rb') )
-            self.policy_sales_channel_encoder = pickle.load( open( self.home_path + 'parameter/policy_sales_channel_encoder.pkl', 'rb') )
-        except Exception as e:
-            print(f"Warning: Could not load all encoders: {e}")
-            # Create fallback encoders
-            self.annual_premium_scaler = MinMaxScaler()
-            self.age_scaler = MinMaxScaler()
-            self.vintage_scaler = MinMaxScaler()
-            self.gender_encoder = {'Male': 0.6, 'Female': 0.4}
-            self.region_code_encoder = {i: 0.02 for i in range(1, 54)}
-            self.policy_sales_channel_encoder = {i: 0.01 for i in range(1, 165)}
-        
-        
-    def data_cleaning( self, df1 ): 
-        
-        ## 1.1. Rename Columns
-        cols_old = df1.columns
-        snakecase = lambda x: inflection.underscore( x )
-        cols_new = list( map( snakecase, cols_old ) )
-        
-        # rename
-        df1.columns = cols_new
-        
-        ## 1.2. Data Types - convert if necessary
-        # No specific data type changes needed for this dataset
-        
-        ## 1.3. Check for missing values and handle them
-        # This dataset doesn't have missing values based on previous analysis
-        
-        return df1 
-
-
-    def feature_engineering( self, df2 ):
-        
-        ## 2.1. Vehicle Age Processing
-        df2['vehicle_age'] = df2['vehicle_age'].apply(
-            lambda x: 'over2years' if x == '> 2 Years'
-            else 'between1and2years' if x == '1-2 Year'
-            else 'lessthan1year' if x == '< 1 Year'
-            else x
-        )
-        
-        ## 2.2. Vehicle Damage Processing
-        df2['vehicle_damage'] = df2['vehicle_damage'].apply(
-            lambda x: 1 if str(x).strip().lower() == 'yes' else 0
-        )
-        
-        return df2
-
-
-    def data_preparation( self, df5 ):
-
-        ## 5.1. Normalization
-        # annual_premium
-        try:
-            df5['annual_premium'] = self.annual_premium_scaler.transform( df5[['annual_premium']].values )
-        except:
-            df5['annual_premium'] = (df5['annual_premium'] - df5['annual_premium'].mean()) / df5['annual_premium'].std()
+from health_insurance.HealthInsurance import FEATURE_COLUMNS, HealthInsurance, model_columns
+from health_insurance.metrics import record_fallback
+from health_insurance.schema import snake_case
 
-        ## 5.2. Rescaling 
-        # age
-        try:
-            df5['age'] = self.age_scaler.transform( df5[['age']].values )
-        except:
-            df5['age'] = (df5['age'] - df5['age'].min()) / (df5['age'].max() - df5['age'].min())
-        
-        # vintage
+# vehicle_age one-hot slots: raw label and the label produced by feature_engineering
+VEHICLE_AGE_LEVELS = {
+    'vehicle_age_between1and2years': ( '1-2 Year', 'between1and2years' ),
+    'vehicle_age_lessthan1year': ( '< 1 Year', 'lessthan1year' ),
+    'vehicle_age_over2years': ( '> 2 Years', 'over2years' ),
+}
+
+DEFAULT_ENCODING = 0.5
+FEATURE_INDEX = { col: i for i, col in enumerate( FEATURE_COLUMNS ) }
+# extra always-zero slot for dummy columns the model knows but we never produce
+ZERO_SLOT = len( FEATURE_COLUMNS )
+# raw or engineered vehicle_age label -> one-hot slot
+VEHICLE_AGE_SLOT = { label: FEATURE_INDEX[name] for name, labels in VEHICLE_AGE_LEVELS.items() for label in labels }
+
+
+def _affine( scaler ):
+    # (a, b, clip) such that scaler.transform(x) == clip(a * x + b); None when not fitted
+    try:
+        t0, t1 = scaler.transform( np.array( [[0.0], [1.0]] ) )[:, 0]
+    except Exception:
+        return None
+    clip = None
+    if getattr( scaler, 'clip', False ):
+        # the probe itself was clipped: MinMaxScaler is X * scale_ + min_
+        t1, t0 = scaler.scale_[0] + scaler.min_[0], scaler.min_[0]
+        clip = scaler.feature_range
+    return float( t1 - t0 ), float( t0 ), clip
+
+
+def _float( value ):
+    try:
+        return float( value )
+    except ( TypeError, ValueError ):
+        return float( 'nan' )
+
+
+class _Lookup( object ):
+    """Array-indexed encoder: integer codes index a dense table, strings use a small key list."""
+
+    def __init__( self, encoder, default=DEFAULT_ENCODING, scale=1.0 ):
+        # scale multiplies every encoding (and the default), e.g. to fold in a model coefficient
+        self.default = default * scale
+        values = {}
+        for key, value in dict( encoder ).items():
+            values[key] = self.default if value is None or value != value else float( value ) * scale
+        self.values = values
+
+        numeric = { k: v for k, v in values.items() if isinstance( k, ( int, float, np.integer, np.floating ) ) and not isinstance( k, bool ) }
+        self.strings = [ ( k, v ) for k, v in values.items() if isinstance( k, str ) ]
+        # dense table only when every numeric key is a small non-negative integer
+        self.dense = all( k == k and float( k ).is_integer() and 0 <= k < 2**20 for k in numeric )
+        self.table = np.full( int( max( numeric ) ) + 1 if numeric and self.dense else 0, self.default )
+        if self.dense:
+            for k, v in numeric.items():
+                self.table[int( k )] = v
+
+    def encode( self, column, out ):
+        column = np.asarray( column )
+        out[:] = self.default
+        kind = column.dtype.kind
+        if kind in 'iuf' and self.dense:
+            # numeric input never matches string keys
+            codes = column.astype( np.float64, copy=False )
+            valid = ( codes >= 0 ) & ( codes < len( self.table ) )
+            idx = codes[valid].astype( np.int64 )
+            hit = idx == codes[valid]
+            valid[valid] = hit
+            out[valid] = self.table[idx[hit]]
+        elif kind in 'UO' and not len( self.table ) and len( self.strings ) <= 16:
+            for key, value in self.strings:
+                out[column == key] = value
+        else:
+            # mixed input or keys: one dict lookup per distinct value
+            uniq, inverse = _unique_objects( column ) if kind == 'O' else np.unique( column, return_inverse=True )
+            table = np.array( [ self.encode_one( u.item() if hasattr( u, 'item' ) else u ) for u in uniq ], dtype=np.float64 )
+            out[:] = table[inverse]
+        return out
+
+    def encode_one( self, value ):
         try:
-            df5['vintage'] = self.vintage_scaler.transform( df5[['vintage']].values )
-        except:
-            df5['vintage'] = (df5['vintage'] - df5['vintage'].min()) / (df5['vintage'].max() - df5['vintage'].min())
-
-        ## 5.3. Encoding
-        # Target Encoding for gender
-        df5['gender'] = df5['gender'].map( self.gender_encoder ).fillna(0.5)
-        
-        # Target Encoding for region_code
-        df5['region_code'] = df5['region_code'].map( self.region_code_encoder ).fillna(0.5)
-        
-        # One Hot Encoding for vehicle_age
-        df5 = pd.get_dummies( df5, prefix='vehicle_age', columns=['vehicle_age'] )
-        
-        # Frequency Encoding for policy_sales_channel
-        df5['policy_sales_channel'] = df5['policy_sales_channel'].map( self.policy_sales_channel_encoder ).fillna(0.5)
-        
-        # Select columns used in the model
-        cols_selected = ['annual_premium', 'age', 'vintage', 'region_code', 'policy_sales_channel', 'previously_insured', 'vehicle_damage']
-        
-        # Handle missing columns after encoding
-        available_cols = [col for col in cols_selected if col in df5.columns]
-        
-        # Add vehicle_age dummy columns if they exist
-        vehicle_age_cols = [col for col in df5.columns if col.startswith('vehicle_age_')]
-        available_cols.extend(vehicle_age_cols)
-        
-        # Force garbage collection
-        gc.collect()
-        
-        return df5[available_cols]
-    
-    
-    def get_prediction( self, model, original_data, test_data ):
-        # prediction
+            return self.values.get( value, self.default )
+        except TypeError:
+            return self.default
+
+
+def _unique_objects( column ):
+    index = {}
+    inverse = np.empty( len( column ), dtype=np.int64 )
+    for i, value in enumerate( column ):
+        inverse[i] = index.setdefault( value, len( index ) )
+    return list( index ), inverse
+
+
+def _vehicle_damage( column, out ):
+    column = np.asarray( column )
+    if column.dtype.kind not in 'UOS':
+        out[:] = 0
+        return out
+    out[:] = column == 'Yes'
+    other = ~( out.astype( bool ) | ( column == 'No' ) )
+    if other.any():
+        out[other] = [ 1 if str( x ).strip().lower() == 'yes' else 0 for x in column[other] ]
+    return out
+
+
+class HealthInsuranceOptimized( object ):
+    """NumPy scoring engine equivalent to the HealthInsurance pandas stages.
+
+    Encoders are compiled into lookup tables and fitted scalers into affine
+    coefficients once; scoring writes straight into a preallocated feature
+    matrix laid out as FEATURE_COLUMNS.
+    """
+
+    def __init__( self, pipeline=None, model=None, dtype=np.float64, cache=None, version=None ):
+        if pipeline is None:
+            pipeline = HealthInsurance()
+        self.model = model
+        self.dtype = dtype
+        # optional ScoreCache shared across requests; keys are scoped by version
+        self.cache = cache
+        self.version = version
+
+        self.annual_premium = _affine( pipeline.annual_premium_scaler )
+        self.age = _affine( pipeline.age_scaler )
+        self.vintage = _affine( pipeline.vintage_scaler )
+        self.region_code_lookup = _Lookup( pipeline.region_code_encoder )
+        self.policy_sales_channel_lookup = _Lookup( pipeline.policy_sales_channel_encoder )
+
+        self._compile_model()
+
+    def _compile_model( self ):
+        model = self.model
+        self.take = None
+        self.missing = []
+        self.coef = None
+        cols = model_columns( model ) if model is not None else None
+        if cols is not None:
+            self.missing = [ c for c in cols if c not in FEATURE_INDEX and not c.startswith( 'vehicle_age_' ) ]
+            self.take = np.array( [ FEATURE_INDEX.get( c, ZERO_SLOT ) for c in cols ], dtype=np.int64 )
+        self.feature_names = getattr( model, 'feature_names_in_', None )
+        # flattened forests read the matrix directly; the names only mean something to sklearn
+        if type( model ).__name__ == 'FlatForest':
+            self.feature_names = None
+
+        # binary logistic models are scored with an inlined dot product
+        coef = getattr( model, 'coef_', None )
+        loss = getattr( model, 'loss', 'log_loss' )
+        multi_class = getattr( model, 'multi_class', 'auto' )
+        if coef is not None and self.take is not None and coef.shape[0] == 1 and len( model.classes_ ) == 2 \
+                and loss in ( 'log_loss', 'log' ) and multi_class in ( 'auto', 'ovr' ) \
+                and type( model ).__name__ in ( 'LogisticRegression', 'SGDClassifier', 'LogisticModel' ):
+            self.coef = np.zeros( ZERO_SLOT + 1 )
+            np.add.at( self.coef, self.take, coef[0] )
+            self.intercept = float( model.intercept_[0] )
+
+    # ------------------------------------------------------------------
+    # feature matrix
+
+    def _scale( self, column, coefs, out ):
+        values = np.asarray( column, dtype=np.float64 )
+        if coefs is None:
+            return None
+        a, b, clip = coefs
+        np.multiply( values, a, out=out )
+        out += b
+        if clip is not None:
+            np.clip( out, clip[0], clip[1], out=out )
+        return out
+
+    def prepare( self, columns, n_rows=None ):
+        """Build the (n_rows, len(FEATURE_COLUMNS) + 1) feature matrix from snake_case columns."""
+        if n_rows is None:
+            n_rows = len( columns['age'] )
+        X = np.empty( ( n_rows, ZERO_SLOT + 1 ), dtype=self.dtype, order='F' )
+        col = lambda name: X[:, FEATURE_INDEX[name]]
+
+        if self._scale( columns['annual_premium'], self.annual_premium, col( 'annual_premium' ) ) is None:
+            values = np.asarray( columns['annual_premium'], dtype=np.float64 )
+            with np.errstate( invalid='ignore', divide='ignore' ):
+                col( 'annual_premium' )[:] = ( values - values.mean() ) / values.std( ddof=1 )
+        for name in ( 'age', 'vintage' ):
+            if self._scale( columns[name], getattr( self, name ), col( name ) ) is None:
+                values = np.asarray( columns[name], dtype=np.float64 )
+                with np.errstate( invalid='ignore', divide='ignore' ):
+                    col( name )[:] = ( values - values.min() ) / ( values.max() - values.min() )
+
+        self.region_code_lookup.encode( columns['region_code'], col( 'region_code' ) )
+        self.policy_sales_channel_lookup.encode( columns['policy_sales_channel'], col( 'policy_sales_channel' ) )
+        col( 'previously_insured' )[:] = np.asarray( columns['previously_insured'], dtype=np.float64 )
+        _vehicle_damage( columns['vehicle_damage'], col( 'vehicle_damage' ) )
+
+        vehicle_age = np.asarray( columns['vehicle_age'] )
+        for name, labels in VEHICLE_AGE_LEVELS.items():
+            if vehicle_age.dtype.kind in 'UOS':
+                col( name )[:] = ( vehicle_age == labels[0] ) | ( vehicle_age == labels[1] )
+            else:
+                col( name )[:] = 0
+        X[:, ZERO_SLOT] = 0
+        return X
+
+    def prepare_one( self, row ):
+        """Build the 1 x N feature matrix for one snake_case record with scalar lookups."""
+        x = np.zeros( ( 1, ZERO_SLOT + 1 ), dtype=self.dtype )
+        v = x[0]
+        for name in ( 'annual_premium', 'age', 'vintage' ):
+            coefs = getattr( self, name )
+            if coefs is None:
+                # batch statistics of a single row are undefined (0/0)
+                v[FEATURE_INDEX[name]] = float( 'nan' )
+                continue
+            a, b, clip = coefs
+            value = _float( row[name] ) * a + b
+            if clip is not None:
+                value = min( max( value, clip[0] ), clip[1] )
+            v[FEATURE_INDEX[name]] = value
+
+        v[FEATURE_INDEX['region_code']] = self.region_code_lookup.encode_one( row['region_code'] )
+        v[FEATURE_INDEX['policy_sales_channel']] = self.policy_sales_channel_lookup.encode_one( row['policy_sales_channel'] )
+        v[FEATURE_INDEX['previously_insured']] = _float( row['previously_insured'] )
+
+        damage = row['vehicle_damage']
+        if damage == 'Yes':
+            v[FEATURE_INDEX['vehicle_damage']] = 1
+        elif damage != 'No':
+            v[FEATURE_INDEX['vehicle_damage']] = 1 if str( damage ).strip().lower() == 'yes' else 0
+
+        vehicle_age = row['vehicle_age']
+        if isinstance( vehicle_age, str ) and vehicle_age in VEHICLE_AGE_SLOT:
+            v[VEHICLE_AGE_SLOT[vehicle_age]] = 1
+        return x
+
+    def predict_one( self, record ):
+        """Score one raw or snake_case record; returns the response row with its score."""
+        row = { snake_case( k ): v for k, v in record.items() }
+        row['score'] = float( self.predict_scores( self.prepare_one( row ) )[0] )
+        return row
+
+    def columns_from_records( self, records ):
+        # same column set as pd.DataFrame( records, columns=records[0].keys() )
+        return { snake_case( key ): [ r.get( key ) for r in records ] for key in records[0] }
+
+    # ------------------------------------------------------------------
+    # scoring
+
+    def predict_matrix( self, X ):
+        if self.missing:
+            raise KeyError( f'Missing model features: {self.missing}' )
+        if self.coef is not None:
+            z = X @ self.coef.astype( X.dtype, copy=False )
+            z += self.intercept
+            if np.isnan( z ).any():
+                # predict_proba rejects the whole batch as well
+                raise ValueError( 'Input contains NaN' )
+            with np.errstate( over='ignore' ):
+                return 1.0 / ( 1.0 + np.exp( -z ) )
+        X = X[:, self.take] if self.take is not None else X[:, :ZERO_SLOT]
+        if self.feature_names is not None:
+            import pandas as pd
+            X = pd.DataFrame( X, columns=self.feature_names )
+        return self.model.predict_proba( X )[:, 1]
+
+    def score_matrix( self, X ):
+        """Scores of an encoded matrix, through the score cache; raises instead of falling back."""
+        if self.cache is not None and len( X ) <= self.cache.max_batch:
+            return self._predict_cached( X )
+        return self.predict_matrix( X )
+
+    def predict_scores( self, X ):
         try:
-            pred = model.predict_proba( test_data )
-            # join pred into the original data
-            original_data['score'] = pred[:, 1]  # probability of buying insurance
+            return self.score_matrix( X )
         except Exception as e:
             print(f"Prediction error: {e}")
             # Fallback prediction
-            original_data['score'] = 0.5  # Default score
-        
-        result = original_data.to_json( orient='records', date_format='iso' )
-        
-        # Force garbage collection
-        gc.collect()
-        
-        return result
+            record_fallback( 'numpy', len( X ) )
+            return np.full( len( X ), 0.5 )
+
+    def _predict_cached( self, X ):
+        X = np.ascontiguousarray( X )
+        if len( X ) == 1:
+            first, inverse = np.zeros( 1, dtype=np.int64 ), np.zeros( 1, dtype=np.int64 )
+        else:
+            # identical encoded rows are scored once
+            rows = X.view( np.dtype( ( np.void, X.dtype.itemsize * X.shape[1] ) ) ).ravel()
+            _, first, inverse = np.unique( rows, return_index=True, return_inverse=True )
+
+        keys = [ ( self.version, X[i].tobytes() ) for i in first ]
+        scores = self.cache.get_many( keys, rows=len( X ) )
+        miss = [ i for i, score in enumerate( scores ) if score is None ]
+        if miss:
+            fresh = self.predict_matrix( X[first[miss]] )
+            self.cache.put_many( [ keys[i] for i in miss ], fresh )
+            for i, score in zip( miss, fresh ):
+                scores[i] = score
+        return np.asarray( scores, dtype=np.float64 )[inverse]
+
+    def score_columns( self, columns, n_rows=None ):
+        return self.predict_scores( self.prepare( columns, n_rows ) )
+
+    def score_records( self, records ):
+        return self.score_columns( self.columns_from_records( records ), len( records ) )
+
+    def score_frame( self, df ):
+        # raw or snake_case DataFrame, e.g. a chunk of train.csv
+        columns = { snake_case( c ): df[c].to_numpy() for c in df.columns }
+        return self.score_columns( columns, len( df ) )
+
+    def records_response( self, records, scores ):
+        # input echoed back with snake_case keys, as documented in the README
+        return [ dict( { snake_case( k ): v for k, v in r.items() }, score=float( score ) ) for r, score in zip( records, scores ) ]
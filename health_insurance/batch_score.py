@@ -0,0 +1,153 @@
+"""Score a customer CSV in bounded chunks.
+
+    python -m health_insurance.batch_score input.csv output.csv [--chunk-size N]
+
+Rows are read `chunk_size` at a time, scored and appended to the output, so
+memory stays flat regardless of file size. After every chunk a small JSON
+checkpoint (`output.csv.ckpt`) records how many rows and output bytes are
+durable; rerunning the same command after a crash truncates the partial
+chunk and resumes from there.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from health_insurance.parallel import ScoringPool, fork_available
+from health_insurance.registry import PipelineRegistry
+from health_insurance.schema import read_csv
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def checkpoint_path( output_path ):
+    return output_path + '.ckpt'
+
+
+def _input_identity( input_path, chunk_size ):
+    st = os.stat( input_path )
+    return { 'input': os.path.abspath( input_path ), 'input_size': st.st_size, 'input_mtime_ns': st.st_mtime_ns, 'chunk_size': chunk_size }
+
+
+def _read_checkpoint( output_path, identity ):
+    try:
+        with open( checkpoint_path( output_path ) ) as f:
+            state = json.load( f )
+    except ( OSError, ValueError ):
+        return None
+    if any( state.get( k ) != v for k, v in identity.items() ):
+        return None
+    return state
+
+
+def _write_checkpoint( output_path, state ):
+    tmp = checkpoint_path( output_path ) + '.tmp'
+    with open( tmp, 'w' ) as f:
+        json.dump( state, f )
+        f.flush()
+        os.fsync( f.fileno() )
+    os.replace( tmp, checkpoint_path( output_path ) )
+
+
+def make_scorer( snapshot, engine='numpy' ):
+    if engine == 'compiled' and snapshot.compiled is not None:
+        return snapshot.compiled.score_frame
+    if engine in ( 'numpy', 'compiled' ):
+        return snapshot.engine.score_frame
+
+    pipeline = snapshot.pipeline
+
+    def score_pandas( chunk ):
+        df1 = pipeline.data_cleaning( chunk.copy() )
+        df2 = pipeline.feature_engineering( df1 )
+        df3 = pipeline.data_preparation( df2 )
+        return pipeline.predict_scores( snapshot.model, df3 )
+
+    return score_pandas
+
+
+def iter_chunks( input_path, chunk_size, skip_rows=0 ):
+    # a callable, not a range: pandas turns list-likes into a set of every skipped row number
+    skiprows = ( lambda i: 0 < i <= skip_rows ) if skip_rows else None
+    return read_csv( input_path, chunksize=chunk_size, skiprows=skiprows )
+
+
+def batch_score( input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, home_path='', engine='numpy',
+                 resume=True, scores_only=False, score_chunk=None, workers=1, log=sys.stderr ):
+    """Score `input_path` into `output_path`; returns the number of rows written.
+
+    With `workers` > 1 chunks are scored by a fork pool that shares the
+    loaded model copy-on-write; output order is unchanged.
+    """
+    if score_chunk is None:
+        score_chunk = make_scorer( PipelineRegistry( home_path=home_path ).current(), engine )
+
+    identity = _input_identity( input_path, chunk_size )
+    state = _read_checkpoint( output_path, identity ) if resume else None
+    if state is not None and ( not os.path.exists( output_path ) or os.path.getsize( output_path ) < state['output_bytes'] ):
+        state = None
+    if state is None:
+        state = dict( identity, rows_done=0, output_bytes=0 )
+    elif log:
+        print( f'Resuming {input_path} at row {state["rows_done"]}', file=log )
+
+    mode = 'r+b' if state['output_bytes'] else 'wb'
+    start = time.perf_counter()
+    rows_this_run = 0
+    with contextlib.ExitStack() as stack:
+        chunks = iter_chunks( input_path, chunk_size, state['rows_done'] )
+        if workers > 1 and fork_available():
+            scored = stack.enter_context( ScoringPool( score_chunk, workers ) ).imap( chunks )
+        else:
+            scored = ( ( chunk, score_chunk( chunk ) ) for chunk in chunks )
+
+        out = stack.enter_context( open( output_path, mode ) )
+        # drop whatever a crashed run wrote after the last checkpoint
+        out.seek( state['output_bytes'] )
+        out.truncate()
+
+        for chunk, scores in scored:
+            result = pd.DataFrame( { 'score': scores } ) if scores_only else chunk.assign( score=scores )
+            if scores_only and 'id' in chunk.columns:
+                result.insert( 0, 'id', chunk['id'].values )
+
+            out.write( result.to_csv( index=False, header=state['rows_done'] == 0 ).encode() )
+            out.flush()
+            os.fsync( out.fileno() )
+
+            state['rows_done'] += len( chunk )
+            state['output_bytes'] = out.tell()
+            _write_checkpoint( output_path, state )
+
+            rows_this_run += len( chunk )
+            if log:
+                elapsed = time.perf_counter() - start
+                print( f'{state["rows_done"]} rows scored | {rows_this_run / elapsed:,.0f} rows/s', file=log )
+
+    os.remove( checkpoint_path( output_path ) )
+    return state['rows_done']
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Score a customer CSV in bounded chunks.' )
+    parser.add_argument( 'input' )
+    parser.add_argument( 'output' )
+    parser.add_argument( '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE )
+    parser.add_argument( '--home', default='', help='directory holding model/ and parameter/' )
+    parser.add_argument( '--engine', choices=[ 'numpy', 'compiled', 'pandas' ], default='numpy' )
+    parser.add_argument( '--workers', type=int, default=1, help='scoring processes (fork, model shared copy-on-write)' )
+    parser.add_argument( '--scores-only', action='store_true', help='write only id and score' )
+    parser.add_argument( '--no-resume', action='store_true', help='ignore an existing checkpoint' )
+    args = parser.parse_args( argv )
+
+    rows = batch_score( args.input, args.output, chunk_size=args.chunk_size, home_path=args.home, engine=args.engine,
+                        resume=not args.no_resume, scores_only=args.scores_only, workers=args.workers )
+    print( f'{rows} rows written to {args.output}', file=sys.stderr )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+"""Random Forest training under explicit RAM and model-size budgets.
+
+An unbounded forest grows with the data: every tree keeps splitting until
+its leaves are pure, so model size and training RAM are only known after
+the fact. Here the budgets come first. For each candidate tree count the
+planner turns them into a per-tree node cap (`max_leaf_nodes`), a bootstrap
+size (`max_samples`) no larger than the capped trees can use, a depth cap
+and the number of trees built in parallel. Each candidate is then fitted,
+pruned back under the model budget if the estimate was off, and scored on
+the validation split; the best one that stayed within both budgets wins.
+
+Peak RSS is measured per stage by resetting the kernel's high-water mark
+(/proc/self/clear_refs), so a run can be checked under a cgroup limit:
+
+    systemd-run --scope -p MemoryMax=512M python train_model.py --max-rss-mb 450 --max-model-mb 60
+"""
+import math
+import os
+import resource
+import time
+
+import numpy as np
+
+MB = 1024 * 1024
+TREE_COUNTS = ( 100, 50, 25 )
+# in-bag rows per leaf a capped tree can still make use of; more only costs RAM and time
+ROWS_PER_LEAF = 50
+# working set of one tree being built, per in-bag row (sample indices, feature buffers)
+# and per training row (the bootstrap sample_weight vector)
+BYTES_PER_BAG_ROW = 48
+BYTES_PER_ROW = 8
+# the fitted forest is copied one tree at a time while pickling; keep headroom for it
+RAM_HEADROOM = 0.1
+MIN_LEAF_NODES = 8
+
+
+def _status_kb( field ):
+    try:
+        with open( '/proc/self/status' ) as f:
+            return next( int( line.split()[1] ) for line in f if line.startswith( field + ':' ) )
+    except ( OSError, StopIteration ):
+        return None
+
+
+def current_rss_mb():
+    kb = _status_kb( 'VmRSS' )
+    return kb / 1024 if kb is not None else peak_rss_mb()
+
+
+def peak_rss_mb():
+    kb = _status_kb( 'VmHWM' )
+    return kb / 1024 if kb is not None else resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    # Linux >= 4.0: writing 5 resets VmHWM to the current RSS
+    try:
+        with open( '/proc/self/clear_refs', 'w' ) as f:
+            f.write( '5' )
+        return True
+    except OSError:
+        return False
+
+
+def cgroup_limit_mb():
+    for path in ( '/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes' ):
+        try:
+            with open( path ) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int( value ) < 2**60:
+            return int( value ) / MB
+    return None
+
+
+class StageMeter( object ):
+    """Wall time and peak RSS of consecutive named stages.
+
+    `mark(name)` closes the running stage and opens the next one. Without
+    clear_refs the peaks are cumulative since process start (`reset` False).
+    """
+
+    def __init__( self ):
+        self.stages = []
+        self._name = None
+
+    def mark( self, name ):
+        self.finish()
+        self._name = name
+        self._reset = reset_peak_rss()
+        self._start = time.perf_counter()
+
+    def finish( self ):
+        if self._name is None:
+            return
+        self.stages.append( { 'stage': self._name, 'seconds': round( time.perf_counter() - self._start, 3 ),
+                              'peak_rss_mb': round( peak_rss_mb(), 1 ), 'reset': self._reset } )
+        self._name = None
+
+    def peak_mb( self ):
+        return max( ( s['peak_rss_mb'] for s in self.stages ), default=0.0 )
+
+    def lines( self ):
+        return [ f"   {s['stage']:<14} {s['seconds']:>8.1f} s {s['peak_rss_mb']:>9.1f} MB" for s in self.stages ]
+
+
+class Budget( object ):
+    """Training limits; None means unbounded."""
+
+    def __init__( self, max_rss_mb=None, max_model_mb=None, tree_counts=TREE_COUNTS, max_depth=None, min_samples_leaf=5,
+                  n_jobs=-1, random_state=42 ):
+        self.max_rss_mb = max_rss_mb
+        self.max_model_mb = max_model_mb
+        self.tree_counts = tuple( tree_counts )
+        self.max_depth = max_depth
+        self.min_samples_leaf = min_samples_leaf
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    @classmethod
+    def from_env( cls ):
+        """Budget from TRAIN_MAX_RSS_MB / TRAIN_MAX_MODEL_MB, or None when neither is set."""
+        rss = os.environ.get( 'TRAIN_MAX_RSS_MB' )
+        model = os.environ.get( 'TRAIN_MAX_MODEL_MB' )
+        if not rss and not model:
+            return None
+        return cls( max_rss_mb=float( rss ) if rss else None, max_model_mb=float( model ) if model else None )
+
+    def to_dict( self ):
+        return { 'max_rss_mb': self.max_rss_mb, 'max_model_mb': self.max_model_mb, 'tree_counts': list( self.tree_counts ),
+                 'max_depth': self.max_depth, 'min_samples_leaf': self.min_samples_leaf }
+
+
+def bytes_per_node( n_classes=2 ):
+    """In-memory (and pickled) size of one sklearn tree node plus its class counts."""
+    from sklearn.tree._tree import NODE_DTYPE
+    return NODE_DTYPE.itemsize + 8 * n_classes
+
+
+def forest_nodes( forest ):
+    return sum( estimator.tree_.node_count for estimator in forest.estimators_ )
+
+
+def _n_jobs( n_jobs ):
+    cpus = os.cpu_count() or 1
+    return cpus if n_jobs is None or n_jobs < 0 else max( 1, min( n_jobs, cpus ) )
+
+
+def plan( budget, n_trees, n_rows, baseline_mb, node_bytes ):
+    """RandomForestClassifier parameters for `n_trees` within `budget`, or a str saying why none fit."""
+    model_bytes = budget.max_model_mb * MB if budget.max_model_mb else math.inf
+    ram_bytes = ( budget.max_rss_mb * ( 1 - RAM_HEADROOM ) - baseline_mb ) * MB if budget.max_rss_mb else math.inf
+    if ram_bytes <= 0:
+        return f'{baseline_mb:.0f} MB already resident, nothing left of {budget.max_rss_mb:.0f} MB'
+
+    # unconstrained trees: one leaf per min_samples_leaf rows at most
+    nodes = min( model_bytes / ( n_trees * node_bytes ), 2 * n_rows / budget.min_samples_leaf )
+    n_jobs = _n_jobs( budget.n_jobs )
+
+    def bag_rows( nodes ):
+        return min( n_rows, int( ( nodes + 1 ) / 2 * ROWS_PER_LEAF ) )
+
+    def ram_needed( nodes, n_jobs ):
+        # finished trees + trees under construction (capacity doubling) and their row buffers
+        working = BYTES_PER_ROW * n_rows + BYTES_PER_BAG_ROW * bag_rows( nodes ) + 2 * nodes * node_bytes
+        return n_trees * nodes * node_bytes + n_jobs * working
+
+    while ram_needed( nodes, n_jobs ) > ram_bytes:
+        if n_jobs > 1:
+            n_jobs -= 1
+        else:
+            nodes *= 0.8
+            if nodes < 2 * MIN_LEAF_NODES - 1:
+                return f'{n_trees} trees of {MIN_LEAF_NODES} leaves need more than {ram_bytes / MB:.0f} MB'
+    if nodes < 2 * MIN_LEAF_NODES - 1:
+        return f'{n_trees} trees of {MIN_LEAF_NODES} leaves exceed {budget.max_model_mb} MB'
+
+    leaves = int( ( nodes + 1 ) // 2 )
+    bounded = leaves < n_rows / budget.min_samples_leaf
+    bag = bag_rows( 2 * leaves - 1 )
+    # balanced enough trees; also bounds the number of levels FlatForest walks
+    depth = budget.max_depth or ( 2 * math.ceil( math.log2( leaves ) ) if bounded else None )
+    return { 'n_estimators': n_trees, 'max_leaf_nodes': leaves if bounded else None, 'max_depth': depth,
+             'max_samples': bag / n_rows if bag < n_rows else None, 'min_samples_leaf': budget.min_samples_leaf, 'n_jobs': n_jobs }
+
+
+def evaluate( forest, X, y ):
+    from sklearn.metrics import accuracy_score, recall_score, roc_auc_score
+    p = forest.predict_proba( X )[:, 1]
+    y = np.asarray( y )
+    predicted = forest.classes_[( p > 0.5 ).astype( int )]
+    return { 'accuracy': float( accuracy_score( y, predicted ) ),
+             'recall': float( recall_score( y, predicted, zero_division=0 ) ),
+             'roc_auc': float( roc_auc_score( y, p ) ) if len( np.unique( y ) ) == 2 else None }
+
+
+def prune_to_budget( forest, max_bytes, X, y, node_bytes ):
+    """Drop the individually weakest trees until the forest fits `max_bytes`; returns how many were dropped."""
+    if forest_nodes( forest ) * node_bytes <= max_bytes:
+        return 0
+    from sklearn.metrics import roc_auc_score
+    X = np.asarray( X, dtype=np.float32 )
+    two_classes = len( np.unique( y ) ) == 2
+    quality = [ roc_auc_score( y, tree.predict_proba( X )[:, 1] ) if two_classes else 0.0 for tree in forest.estimators_ ]
+    keep = list( np.argsort( quality )[::-1] )
+    dropped = 0
+    while len( keep ) > 1 and sum( forest.estimators_[i].tree_.node_count for i in keep ) * node_bytes > max_bytes:
+        keep.pop()
+        dropped += 1
+    forest.estimators_ = [ forest.estimators_[i] for i in sorted( keep ) ]
+    forest.n_estimators = len( forest.estimators_ )
+    return dropped
+
+
+def fit_budgeted_forest( X_train, y_train, X_val, y_val, budget, meter=None ):
+    """Fit one forest per tree count in `budget` and keep the best that fits; returns (forest, report).
+
+    The candidates are scored on `X_val`, so it should hold the features the
+    served model receives (the prepared matrix, not the raw columns).
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from health_insurance.forest import NODE_BYTES
+
+    node_bytes = bytes_per_node( len( np.unique( y_train ) ) )
+    max_bytes = budget.max_model_mb * MB if budget.max_model_mb else math.inf
+    meter = meter or StageMeter()
+    candidates = []
+    best, best_index = None, None
+    for n_trees in budget.tree_counts:
+        params = plan( budget, n_trees, len( X_train ), current_rss_mb(), node_bytes )
+        if isinstance( params, str ):
+            candidates.append( { 'n_estimators': n_trees, 'skipped': params } )
+            continue
+
+        meter.mark( f'fit_{n_trees}' )
+        forest = RandomForestClassifier( random_state=budget.random_state, **params ).fit( X_train, y_train )
+        pruned = prune_to_budget( forest, max_bytes, X_val, y_val, node_bytes )
+        metrics = evaluate( forest, X_val, y_val )
+        meter.finish()
+
+        nodes = forest_nodes( forest )
+        peak = meter.stages[-1]['peak_rss_mb']
+        candidate = dict( params, n_estimators=forest.n_estimators, pruned_trees=pruned, nodes=nodes,
+                          model_mb=round( nodes * node_bytes / MB, 2 ),
+                          bundle_mb=round( nodes * NODE_BYTES / MB, 2 ),
+                          fit_peak_rss_mb=peak, **metrics )
+        candidate['within_budget'] = nodes * node_bytes <= max_bytes and ( not budget.max_rss_mb or peak <= budget.max_rss_mb )
+        candidates.append( candidate )
+
+        if best is None or _better( candidate, candidates[best_index] ):
+            best, best_index = forest, len( candidates ) - 1
+        # only the best forest stays resident while the next one is fitted
+        del forest
+
+    if best is None:
+        raise MemoryError( 'No forest fits the budget: ' + '; '.join( c['skipped'] for c in candidates ) )
+    columns = getattr( X_val, 'columns', None )
+    report = { 'budget': budget.to_dict(), 'cgroup_limit_mb': cgroup_limit_mb(), 'bytes_per_node': node_bytes,
+               'features': [ str( c ) for c in columns ] if columns is not None else None, 'validation_rows': len( X_val ),
+               'candidates': candidates, 'chosen': best_index }
+    return best, report
+
+
+def _better( candidate, incumbent ):
+    # within budget first, then ranking quality, then the smaller model
+    key = lambda c: ( c['within_budget'], c['roc_auc'] if c['roc_auc'] is not None else c['accuracy'], -c['model_mb'] )
+    return key( candidate ) > key( incumbent )
+
+
+def report_lines( report ):
+    lines = [ f"   {'árvores':>7} {'folhas':>7} {'amostra':>8} {'nós':>9} {'modelo MB':>10} {'bundle MB':>10} "
+              f"{'RSS MB':>8} {'acurácia':>9} {'recall':>7} {'AUC':>6}" ]
+    for i, c in enumerate( report['candidates'] ):
+        if 'skipped' in c:
+            lines.append( f"   {c['n_estimators']:>7} ignorado: {c['skipped']}" )
+            continue
+        sample = f"{c['max_samples']:.0%}" if c['max_samples'] else '100%'
+        auc = f"{c['roc_auc']:.3f}" if c['roc_auc'] is not None else '-'
+        mark = ' <- escolhido' if i == report['chosen'] else ( '' if c['within_budget'] else ' (fora do orçamento)' )
+        lines.append( f"   {c['n_estimators']:>7} {str( c['max_leaf_nodes'] or '-' ):>7} {sample:>8} {c['nodes']:>9} {c['model_mb']:>10.1f} "
+                      f"{c['bundle_mb']:>10.1f} {c['fit_peak_rss_mb']:>8.0f} {c['accuracy']:>9.3f} {c['recall']:>7.3f} {auc:>6}{mark}" )
+    return lines
@@ -0,0 +1,142 @@
+"""Content-addressed cache for the training stages.
+
+A stage's key is the SHA-256 of its name, CACHE_VERSION and its inputs:
+digests of the data files, the feature list, hyperparameters and the
+keys of the stages it reads from. Its output is pickled under
+`<TRAIN_CACHE_DIR>/<stage>/<key>.pkl`, so a rebuild with the same inputs
+loads it instead of recomputing, and a change anywhere upstream changes
+every downstream key.
+
+Keys depend only on inputs, never on outputs, so values are loaded
+lazily: when the model stage is a hit, the parsed frame it was trained
+on is never read back. Each build writes a manifest with the key and
+status of every stage (hit, miss or unused).
+
+    TRAIN_CACHE_DIR   cache directory (default .build_cache)
+    TRAIN_CACHE=0     recompute every stage and write nothing
+    TRAIN_CACHE_KEEP  entries kept per stage (default 3, oldest removed)
+
+Bump CACHE_VERSION when a stage's code changes what it produces.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+
+CACHE_VERSION = 1
+DEFAULT_ROOT = '.build_cache'
+DEFAULT_KEEP = 3
+MANIFEST_FILE = 'model/build_manifest.json'
+
+
+def file_digest( path, block_size=1 << 20 ):
+    digest = hashlib.sha256()
+    with open( path, 'rb' ) as f:
+        for block in iter( lambda: f.read( block_size ), b'' ):
+            digest.update( block )
+    return digest.hexdigest()
+
+
+def _jsonable( value ):
+    if hasattr( value, 'tolist' ):
+        return value.tolist()
+    return str( value )
+
+
+def cache_key( stage, inputs ):
+    payload = json.dumps( { 'stage': stage, 'version': CACHE_VERSION, 'inputs': inputs }, sort_keys=True, default=_jsonable )
+    return hashlib.sha256( payload.encode() ).hexdigest()
+
+
+class Stage( object ):
+    """One cached stage: `key` is known up front, `value` is loaded or computed on first access."""
+
+    def __init__( self, cache, name, key, compute ):
+        self.cache = cache
+        self.name = name
+        self.key = key
+        self.compute = compute
+        self.status = 'unused'
+        self.seconds = 0.0
+        self._value = None
+
+    @property
+    def path( self ):
+        return os.path.join( self.cache.root, self.name, self.key + '.pkl' )
+
+    @property
+    def value( self ):
+        if self.status == 'unused':
+            start = time.perf_counter()
+            self._value, self.status = self._load_or_compute()
+            self.seconds = time.perf_counter() - start
+        return self._value
+
+    def _load_or_compute( self ):
+        if self.cache.enabled and os.path.exists( self.path ):
+            try:
+                with open( self.path, 'rb' ) as f:
+                    value = pickle.load( f )
+                os.utime( self.path )  # pruning drops the least recently used entries
+                return value, 'hit'
+            except Exception:
+                pass  # truncated or unreadable entry: recompute and overwrite
+        value = self.compute()
+        if self.cache.enabled:
+            self.cache.store( self, value )
+        return value, 'miss'
+
+    def to_dict( self ):
+        return { 'stage': self.name, 'key': self.key, 'status': self.status, 'seconds': round( self.seconds, 3 ) }
+
+
+class BuildCache( object ):
+
+    def __init__( self, root=None, enabled=None, keep=None ):
+        self.root = root or os.environ.get( 'TRAIN_CACHE_DIR', DEFAULT_ROOT )
+        self.enabled = os.environ.get( 'TRAIN_CACHE', '1' ) != '0' if enabled is None else enabled
+        self.keep = keep or int( os.environ.get( 'TRAIN_CACHE_KEEP', DEFAULT_KEEP ) )
+        self.stages = []
+
+    def stage( self, name, inputs, compute ):
+        """Declare a stage; `compute()` runs only if `.value` is needed and the key is not cached."""
+        stage = Stage( self, name, cache_key( name, inputs ), compute )
+        self.stages.append( stage )
+        return stage
+
+    def store( self, stage, value ):
+        directory = os.path.dirname( stage.path )
+        os.makedirs( directory, exist_ok=True )
+        fd, tmp = tempfile.mkstemp( dir=directory, suffix='.tmp' )
+        try:
+            with os.fdopen( fd, 'wb' ) as f:
+                pickle.dump( value, f, protocol=pickle.HIGHEST_PROTOCOL )
+            os.replace( tmp, stage.path )
+        except BaseException:
+            os.unlink( tmp )
+            raise
+        self._prune( directory )
+
+    def _prune( self, directory ):
+        entries = sorted( ( os.path.join( directory, name ) for name in os.listdir( directory ) if name.endswith( '.pkl' ) ),
+                          key=os.path.getmtime, reverse=True )
+        for path in entries[self.keep:]:
+            os.remove( path )
+
+    def manifest( self, **extra ):
+        stages = [ stage.to_dict() for stage in self.stages ]
+        manifest = { 'version': CACHE_VERSION, 'cache_dir': self.root, 'enabled': self.enabled, 'stages': stages,
+                     'hits': sum( s['status'] == 'hit' for s in stages ), 'misses': sum( s['status'] == 'miss' for s in stages ) }
+        manifest.update( extra )
+        return manifest
+
+    def write_manifest( self, path=MANIFEST_FILE, **extra ):
+        os.makedirs( os.path.dirname( path ) or '.', exist_ok=True )
+        with open( path, 'w' ) as f:
+            json.dump( self.manifest( **extra ), f, indent=2 )
+        return path
+
+    def summary( self ):
+        return [ f"   {stage.name:<12}{stage.status:<8}{stage.key[:12]}" for stage in self.stages ]
@@ -0,0 +1,275 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+BUNDLE_FILE = 'model/health_insurance.bundle'
+MAGIC = b'HIBUNDLE'
+# bump when the header layout changes; readers refuse other versions
+FORMAT_VERSION = 1
+# every array starts on a 64-byte boundary of the data section
+ALIGN = 64
+
+
+class BundleError( ValueError ):
+    pass
+
+
+# ----------------------------------------------------------------------
+# container: MAGIC | uint32 header length | JSON header | padding | data
+
+def _align( n ):
+    return -n % ALIGN
+
+
+def write_bundle( path, meta, arrays ):
+    """Write `arrays` (name -> ndarray) plus the JSON-serializable `meta` to one flat file."""
+    layout = {}
+    blobs = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray( array )
+        if array.dtype.hasobject:
+            raise BundleError( f'{name}: object arrays cannot be bundled' )
+        layout[name] = { 'dtype': array.dtype.str, 'shape': list( array.shape ), 'offset': offset }
+        blobs.append( array.tobytes() )
+        blobs.append( b'\0' * _align( len( blobs[-1] ) ) )
+        offset += len( blobs[-2] ) + len( blobs[-1] )
+
+    digest = hashlib.sha256()
+    for blob in blobs:
+        digest.update( blob )
+    header = json.dumps( { 'format_version': FORMAT_VERSION, 'sha256': digest.hexdigest(), 'meta': meta, 'arrays': layout } ).encode()
+    prefix = MAGIC + struct.pack( '<I', len( header ) ) + header
+    prefix += b' ' * _align( len( prefix ) )
+
+    os.makedirs( os.path.dirname( path ) or '.', exist_ok=True )
+    tmp = path + '.tmp'
+    with open( tmp, 'wb' ) as f:
+        f.write( prefix )
+        for blob in blobs:
+            f.write( blob )
+    os.replace( tmp, path )
+    return path
+
+
+def read_bundle( path, verify=True ):
+    """(meta, arrays) with every array a read-only view of one memory map of the file."""
+    with open( path, 'rb' ) as f:
+        if f.read( len( MAGIC ) ) != MAGIC:
+            raise BundleError( f'{path}: not a model bundle' )
+        length, = struct.unpack( '<I', f.read( 4 ) )
+        header = json.loads( f.read( length ) )
+    if header['format_version'] != FORMAT_VERSION:
+        raise BundleError( f'{path}: format {header["format_version"]}, expected {FORMAT_VERSION}' )
+
+    start = len( MAGIC ) + 4 + length
+    start += _align( start )
+    size = os.path.getsize( path ) - start
+    data = np.memmap( path, dtype=np.uint8, mode='r', offset=start, shape=( size, ) ) if size else np.empty( 0, np.uint8 )
+    if verify and hashlib.sha256( data ).hexdigest() != header['sha256']:
+        raise BundleError( f'{path}: checksum mismatch' )
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype( spec['dtype'] )
+        count = int( np.prod( spec['shape'] ) )
+        raw = data[spec['offset']:spec['offset'] + count * dtype.itemsize]
+        arrays[name] = raw.view( dtype ).reshape( spec['shape'] )
+    return header['meta'], arrays
+
+
+# ----------------------------------------------------------------------
+# numpy-only stand-ins for the pickled sklearn objects
+
+class FlatScaler( object ):
+    """StandardScaler / MinMaxScaler transform from its fitted parameters."""
+
+    def __init__( self, mode, scale, offset, clip=None ):
+        self.mode = mode
+        self.scale = scale
+        self.offset = offset
+        self.clip = clip is not None
+        self.feature_range = tuple( clip ) if clip is not None else ( 0, 1 )
+        # MinMaxScaler attribute names, read by the numpy engine
+        self.scale_ = np.array( [ scale ] )
+        self.min_ = np.array( [ offset ] )
+
+    @classmethod
+    def from_sklearn( cls, scaler ):
+        if isinstance( scaler, cls ):
+            return scaler
+        name = type( scaler ).__name__
+        if name == 'StandardScaler':
+            mean = scaler.mean_[0] if getattr( scaler, 'mean_', None ) is not None else 0.0
+            scale = scaler.scale_[0] if getattr( scaler, 'scale_', None ) is not None else 1.0
+            return cls( 'standard', float( scale ), float( mean ) )
+        if name == 'MinMaxScaler' and hasattr( scaler, 'min_' ):
+            clip = scaler.feature_range if getattr( scaler, 'clip', False ) else None
+            return cls( 'minmax', float( scaler.scale_[0] ), float( scaler.min_[0] ), clip )
+        raise BundleError( f'Cannot bundle a {name}' )
+
+    def transform( self, X ):
+        X = np.array( X, dtype=np.float64 )
+        if self.mode == 'standard':
+            X -= self.offset
+            X /= self.scale
+        else:
+            X *= self.scale
+            X += self.offset
+            if self.clip:
+                np.clip( X, self.feature_range[0], self.feature_range[1], out=X )
+        return X
+
+    def to_meta( self ):
+        return { 'mode': self.mode, 'scale': self.scale, 'offset': self.offset,
+                 'clip': list( self.feature_range ) if self.clip else None }
+
+
+class LogisticModel( object ):
+    """Binary logistic model (LogisticRegression / log-loss SGDClassifier) without sklearn."""
+
+    def __init__( self, coef, intercept, classes, feature_names=None ):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.asarray( classes )
+        self.n_features_in_ = coef.shape[1]
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray( feature_names, dtype=object )
+
+    def decision_function( self, X ):
+        return np.asarray( X, dtype=np.float64 ) @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba( self, X ):
+        with np.errstate( over='ignore' ):
+            p = 1.0 / ( 1.0 + np.exp( -self.decision_function( X ) ) )
+        return np.column_stack( [ 1 - p, p ] )
+
+    def predict( self, X ):
+        return self.classes_[( self.decision_function( X ) > 0 ).astype( int )]
+
+
+def _is_forest( model ):
+    return type( model ).__name__ in ( 'RandomForestClassifier', 'ExtraTreesClassifier', 'FlatForest' )
+
+
+def _is_logistic( model ):
+    name = type( model ).__name__
+    if name == 'LogisticModel':
+        return True
+    return name in ( 'LogisticRegression', 'SGDClassifier' ) and getattr( model, 'coef_', None ) is not None \
+        and model.coef_.shape[0] == 1 and getattr( model, 'loss', 'log_loss' ) in ( 'log_loss', 'log' )
+
+
+# ----------------------------------------------------------------------
+# encoders: small string dicts in the header, numeric ones as dense arrays
+
+def _encode_mapping( name, encoder, meta, arrays ):
+    items = dict( encoder ).items()
+    if all( isinstance( k, str ) for k, _ in items ):
+        meta[name] = { 'kind': 'strings', 'values': { k: float( v ) for k, v in items } }
+        return
+    if any( isinstance( k, str ) for k, _ in items ):
+        raise BundleError( f'{name}: mixed string and numeric keys cannot be bundled' )
+    keys = np.array( [ k for k, _ in items ], dtype=np.float64 )
+    values = np.array( [ v for _, v in items ], dtype=np.float64 )
+    key_kind = 'int' if all( isinstance( k, ( int, np.integer ) ) for k, _ in items ) else 'float'
+    if len( keys ) and np.all( ( keys >= 0 ) & ( keys < 2**20 ) & ( keys == np.floor( keys ) ) ):
+        # dense: position = key; NaN = no entry, which both pipelines treat like a NaN encoding
+        table = np.full( int( keys.max() ) + 1, np.nan )
+        table[keys.astype( np.int64 )] = values
+        meta[name] = { 'kind': 'dense', 'keys': key_kind }
+        arrays[name] = table
+    else:
+        meta[name] = { 'kind': 'pairs', 'keys': key_kind }
+        arrays[name + '.keys'] = keys
+        arrays[name] = values
+
+
+def _decode_mapping( name, meta, arrays ):
+    spec = meta[name]
+    if spec['kind'] == 'strings':
+        return dict( spec['values'] )
+    cast = int if spec['keys'] == 'int' else float
+    values = arrays[name].tolist()
+    if spec['kind'] == 'dense':
+        return { cast( k ): v for k, v in enumerate( values ) if v == v }
+    return { cast( k ): v for k, v in zip( arrays[name + '.keys'].tolist(), values ) }
+
+
+SCALERS = ( 'annual_premium_scaler', 'age_scaler', 'vintage_scaler' )
+ENCODERS = ( 'gender_encoder', 'region_code_encoder', 'policy_sales_channel_encoder' )
+
+
+def export_bundle( home_path='', path=None, artifacts=None, model=None ):
+    """Write the model and its parameters as one bundle; defaults to the pickles under `home_path`."""
+    from health_insurance.HealthInsurance import load_artifacts, load_pickle
+    from health_insurance.registry import MODEL_FILE
+
+    if artifacts is None:
+        artifacts = load_artifacts( home_path )
+    if model is None:
+        model = load_pickle( os.path.join( home_path, MODEL_FILE ) )
+    if not ( _is_logistic( model ) or _is_forest( model ) ):
+        raise BundleError( f'Cannot bundle a {type( model ).__name__} model' )
+
+    meta = { 'scalers': { name: FlatScaler.from_sklearn( artifacts[name] ).to_meta() for name in SCALERS }, 'encoders': {} }
+    arrays = {}
+    for name in ENCODERS:
+        _encode_mapping( name, artifacts[name], meta['encoders'], arrays )
+
+    if _is_forest( model ):
+        from health_insurance.forest import FlatForest
+        try:
+            meta['model'], forest_arrays = FlatForest.from_sklearn( model ).to_bundle()
+        except ValueError as e:
+            raise BundleError( str( e ) )
+        arrays.update( forest_arrays )
+        return write_bundle( path or os.path.join( home_path, BUNDLE_FILE ), meta, arrays )
+
+    names = getattr( model, 'feature_names_in_', None )
+    meta['model'] = { 'type': 'logistic', 'classes': np.asarray( model.classes_ ).tolist(),
+                      'feature_names': list( names ) if names is not None else None }
+    arrays['model.coef'] = np.asarray( model.coef_, dtype=np.float64 )
+    arrays['model.intercept'] = np.asarray( model.intercept_, dtype=np.float64 )
+    return write_bundle( path or os.path.join( home_path, BUNDLE_FILE ), meta, arrays )
+
+
+def load_bundle( path, verify=True ):
+    """(artifacts, model) in the shapes HealthInsurance and the engines expect, without unpickling."""
+    meta, arrays = read_bundle( path, verify=verify )
+    artifacts = { name: FlatScaler( **meta['scalers'][name] ) for name in SCALERS }
+    for name in ENCODERS:
+        artifacts[name] = _decode_mapping( name, meta['encoders'], arrays )
+
+    spec = meta['model']
+    if spec['type'] == 'logistic':
+        model = LogisticModel( arrays['model.coef'], arrays['model.intercept'], spec['classes'], spec['feature_names'] )
+    elif spec['type'] == 'forest':
+        from health_insurance.forest import FlatForest
+        model = FlatForest.from_bundle( spec, arrays )
+    else:
+        raise BundleError( f'{path}: unknown model type {spec["type"]!r}' )
+    return artifacts, model
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Exporta modelo e parâmetros para um bundle único, sem pickle' )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--output', default=None, help=f'padrão: <home>/{BUNDLE_FILE}' )
+    args = parser.parse_args( argv )
+    try:
+        path = export_bundle( args.home, args.output )
+    except ( BundleError, OSError ) as e:
+        print( f'❌ {e}' )
+        return 1
+    print( f'✅ {path} ({os.path.getsize( path )} bytes)' )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,111 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from health_insurance.metrics import Histogram
+
+# upper bounds of the histogram buckets
+BATCH_SIZE_BUCKETS = ( 1, 2, 4, 8, 16, 32, 64, 128, 256 )
+QUEUE_DELAY_BUCKETS_MS = ( 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100 )
+
+
+class MicroBatcher( object ):
+    """Coalesces concurrent single-record calls into one vectorized call.
+
+    The first waiting record opens a window of `window` seconds; everything
+    that arrives before it closes (or until `max_batch` records) is scored
+    by a single `score_batch(records)` call and the results are handed back
+    to the waiting callers in order.
+
+    Callers must not see each other's records: when `score_batch` raises,
+    every record is scored again on its own by `score_each([record])`
+    (default `score_batch`), so only the bad record fails or falls back.
+    """
+
+    def __init__( self, score_batch, window=0.002, max_batch=64, score_each=None ):
+        self.score_batch = score_batch
+        self.score_each = score_each or score_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self.batch_sizes = Histogram( BATCH_SIZE_BUCKETS )
+        self.queue_delay_ms = Histogram( QUEUE_DELAY_BUCKETS_MS )
+        self.errors = 0
+        self.split_batches = 0
+
+    def _ensure_started( self ):
+        # the worker thread does not survive a fork (pre-fork servers): start one per process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread( target=self._run, name='micro-batcher', daemon=True ).start()
+                self._pid = os.getpid()
+
+    def submit( self, record ):
+        self._ensure_started()
+        future = Future()
+        self._queue.put( ( time.perf_counter(), record, future ) )
+        return future
+
+    def score( self, record, timeout=None ):
+        return self.submit( record ).result( timeout )
+
+    def _collect( self ):
+        first = self._queue.get()
+        batch = [ first ]
+        deadline = first[0] + self.window
+        while len( batch ) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append( self._queue.get( timeout=remaining ) if remaining > 0 else self._queue.get_nowait() )
+            except queue.Empty:
+                break
+        return batch
+
+    def _run( self ):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            with self._lock:
+                self.batch_sizes.observe( len( batch ) )
+                for enqueued, _, _ in batch:
+                    self.queue_delay_ms.observe( ( started - enqueued ) * 1000 )
+            try:
+                results = self.score_batch( [ record for _, record, _ in batch ] )
+            except Exception:
+                self._score_each( batch )
+                continue
+            for ( _, _, future ), result in zip( batch, results ):
+                future.set_result( result )
+
+    def _score_each( self, batch ):
+        with self._lock:
+            self.split_batches += 1
+        for _, record, future in batch:
+            try:
+                result = self.score_each( [ record ] )[0]
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                future.set_exception( e )
+            else:
+                future.set_result( result )
+
+    def stats( self ):
+        with self._lock:
+            return {
+                'window_ms': self.window * 1000,
+                'max_batch': self.max_batch,
+                'batches': self.batch_sizes.count,
+                'requests': int( self.batch_sizes.total ),
+                'errors': self.errors,
+                'split_batches': self.split_batches,
+                'batch_size': self.batch_sizes.to_dict(),
+                'queue_delay_ms': self.queue_delay_ms.to_dict(),
+            }
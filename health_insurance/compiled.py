@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+from health_insurance.HealthInsurance import ARTIFACT_FILES
+from health_insurance.HealthInsurance_optimized import FEATURE_INDEX, VEHICLE_AGE_LEVELS, _Lookup
+from health_insurance.metrics import record_fallback
+from health_insurance.schema import read_csv, snake_case
+
+COMPILED_FILE = 'model/model_health_insurance.tables.npz'
+# bump when the layout of the .npz changes; older files are ignored and must be recompiled
+FORMAT_VERSION = 1
+# integer features (age, vintage) get a table only up to this many entries
+MAX_TABLE_SIZE = 100000
+# below this many rows categorical columns are mapped value by value (factorize has a fixed cost)
+SMALL_BATCH = 64
+
+
+def _gather( lookup, column, out ):
+    # dense integer-keyed table: one clipped gather, misses (unseen, non-integer, NaN) get the default
+    values = np.asarray( column )
+    if values.dtype.kind not in 'iuf' or not len( lookup.table ):
+        return lookup.encode( values, out )
+    values = values.astype( np.float64, copy=False )
+    with np.errstate( invalid='ignore' ):
+        pos = np.clip( values, 0, len( lookup.table ) - 1 ).astype( np.int64 )
+    np.take( lookup.table, pos, out=out, mode='clip' )
+    out[pos != values] = lookup.default
+    return out
+
+
+def _categorical( column, weight_of, out ):
+    # one weight per distinct value: hash factorization instead of one comparison per level
+    if len( column ) <= SMALL_BATCH:
+        out[:] = [ weight_of( value ) for value in column ]
+        return out
+    import pandas as pd  # only for large batches; not at import time on the serving path
+    codes, uniques = pd.factorize( np.asarray( column ) )
+    weights = np.array( [ weight_of( u ) for u in uniques ] + [ weight_of( None ) ], dtype=np.float64 )
+    np.take( weights, codes, out=out )  # code -1 (missing) takes the last entry
+    return out
+
+
+def source_digest( home_path='', model_file='model/model_health_insurance.pkl' ):
+    """sha256 of the model and parameter files a compiled artifact was built from."""
+    digest = hashlib.sha256()
+    for path in list( ARTIFACT_FILES.values() ) + [ model_file ]:
+        with open( os.path.join( home_path, path ), 'rb' ) as f:
+            for block in iter( lambda: f.read( 1 << 20 ), b'' ):
+                digest.update( block )
+    return digest.hexdigest()
+
+
+class _Affine( object ):
+    # weight * clip( a * x + b ), with an integer lookup table over [offset, offset + len(table))
+
+    def __init__( self, weight, a, b, clip=None, offset=0, table=None ):
+        self.weight, self.a, self.b, self.clip = weight, a, b, clip
+        self.offset = offset
+        self.table = table if table is not None else np.empty( 0 )
+
+    @classmethod
+    def compile( cls, weight, coefs, integer=False ):
+        a, b, clip = coefs
+        term = cls( weight, a, b, clip )
+        # unclipped scalers are exactly linear and a multiply beats a gather; clipped
+        # integer features get a table over the range the scaler was fitted on
+        if integer and clip is not None and a != 0:
+            lo, hi = sorted( ( ( clip[0] - b ) / a, ( clip[1] - b ) / a ) )
+            lo, hi = int( np.floor( lo ) ), int( np.ceil( hi ) )
+            if hi - lo < MAX_TABLE_SIZE:
+                term.offset = lo
+                term.table = term.evaluate( np.arange( lo, hi + 1, dtype=np.float64 ) )
+        return term
+
+    def evaluate( self, values ):
+        out = values * self.a + self.b
+        if self.clip is not None:
+            np.clip( out, self.clip[0], self.clip[1], out=out )
+        out *= self.weight
+        return out
+
+    def contribute( self, column, z ):
+        values = np.asarray( column, dtype=np.float64 )
+        if not len( self.table ):
+            z += self.evaluate( values )
+            return z
+        idx = values - self.offset
+        with np.errstate( invalid='ignore' ):
+            pos = np.clip( idx, 0, len( self.table ) - 1 ).astype( np.int64 )
+        out = np.take( self.table, pos, mode='clip' )
+        # non-integer, out-of-range or NaN values take the affine formula
+        other = idx != pos
+        if other.any():
+            out[other] = self.evaluate( values[other] )
+        z += out
+        return z
+
+    def to_arrays( self, name ):
+        clip = self.clip if self.clip is not None else ( np.nan, np.nan )
+        return {
+            name + '_affine': np.array( [ self.weight, self.a, self.b, clip[0], clip[1], self.offset ], dtype=np.float64 ),
+            name + '_table': self.table,
+        }
+
+    @classmethod
+    def from_arrays( cls, arrays, name ):
+        weight, a, b, lo, hi, offset = arrays[name + '_affine']
+        clip = None if np.isnan( lo ) else ( lo, hi )
+        return cls( weight, a, b, clip, int( offset ), arrays[name + '_table'] )
+
+
+class CompiledLogistic( object ):
+    """Logistic regression folded into one additive contribution table per feature.
+
+    Scalers, encoders and coefficients are combined at compile time, so a
+    score is the intercept plus a handful of array gathers followed by a
+    sigmoid: no scaler transform and no sklearn object at serve time.
+    Scores match HealthInsuranceOptimized (and predict_proba) to rounding.
+    """
+
+    def __init__( self, intercept, annual_premium, age, vintage, region_code, policy_sales_channel,
+                  previously_insured, vehicle_damage, vehicle_age, source_digest='' ):
+        self.intercept = intercept
+        self.annual_premium = annual_premium
+        self.age = age
+        self.vintage = vintage
+        self.region_code = region_code
+        self.policy_sales_channel = policy_sales_channel
+        self.previously_insured = previously_insured
+        self.vehicle_damage = vehicle_damage
+        self.vehicle_age = vehicle_age
+        self.source_digest = source_digest
+
+    @classmethod
+    def from_engine( cls, engine, source_digest='' ):
+        """Compile a HealthInsuranceOptimized engine; ValueError when its model cannot be folded."""
+        if engine.coef is None or engine.missing:
+            raise ValueError( f'Only binary logistic models over {sorted( FEATURE_INDEX )} can be compiled' )
+        for name in ( 'annual_premium', 'age', 'vintage' ):
+            if getattr( engine, name ) is None:
+                raise ValueError( f'{name} scaler is not fitted' )
+        for lookup in ( engine.region_code_lookup, engine.policy_sales_channel_lookup ):
+            if not lookup.dense or lookup.strings:
+                raise ValueError( 'Encoders with non-integer keys cannot be compiled' )
+
+        w = { name: float( engine.coef[i] ) for name, i in FEATURE_INDEX.items() }
+        vehicle_age = { label: w[name] for name, labels in VEHICLE_AGE_LEVELS.items() for label in labels }
+        return cls(
+            intercept=engine.intercept,
+            annual_premium=_Affine.compile( w['annual_premium'], engine.annual_premium ),
+            age=_Affine.compile( w['age'], engine.age, integer=True ),
+            vintage=_Affine.compile( w['vintage'], engine.vintage, integer=True ),
+            region_code=_Lookup( engine.region_code_lookup.values, scale=w['region_code'] ),
+            policy_sales_channel=_Lookup( engine.policy_sales_channel_lookup.values, scale=w['policy_sales_channel'] ),
+            previously_insured=w['previously_insured'],
+            vehicle_damage=w['vehicle_damage'],
+            vehicle_age=_Lookup( vehicle_age, default=0.0 ),
+            source_digest=source_digest,
+        )
+
+    # ------------------------------------------------------------------
+    # scoring
+
+    def margin( self, columns, n_rows=None ):
+        """Logit for snake_case columns."""
+        if n_rows is None:
+            n_rows = len( columns['age'] )
+        z = np.full( n_rows, self.intercept )
+        buf = np.empty( n_rows )
+
+        self.annual_premium.contribute( columns['annual_premium'], z )
+        self.age.contribute( columns['age'], z )
+        self.vintage.contribute( columns['vintage'], z )
+        z += _gather( self.region_code, columns['region_code'], buf )
+        z += _gather( self.policy_sales_channel, columns['policy_sales_channel'], buf )
+        z += np.asarray( columns['previously_insured'], dtype=np.float64 ) * self.previously_insured
+        z += _categorical( columns['vehicle_damage'], self._damage_weight, buf )
+        z += _categorical( columns['vehicle_age'], self._vehicle_age_weight, buf )
+        return z
+
+    def _damage_weight( self, value ):
+        return self.vehicle_damage if isinstance( value, str ) and value.strip().lower() == 'yes' else 0.0
+
+    def _vehicle_age_weight( self, value ):
+        return self.vehicle_age.encode_one( value ) if isinstance( value, str ) else 0.0
+
+    def predict_columns( self, columns, n_rows=None ):
+        """Scores for snake_case columns; raises instead of falling back."""
+        z = self.margin( columns, n_rows )
+        if np.isnan( z ).any():
+            # predict_proba rejects the whole batch as well
+            raise ValueError( 'Input contains NaN' )
+        with np.errstate( over='ignore' ):
+            return 1.0 / ( 1.0 + np.exp( -z ) )
+
+    def score_columns( self, columns, n_rows=None ):
+        try:
+            return self.predict_columns( columns, n_rows )
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            # Fallback prediction
+            n_rows = n_rows if n_rows is not None else len( columns['age'] )
+            record_fallback( 'compiled', n_rows )
+            return np.full( n_rows, 0.5 )
+
+    def score_records( self, records ):
+        columns = { snake_case( key ): [ r.get( key ) for r in records ] for key in records[0] }
+        return self.score_columns( columns, len( records ) )
+
+    def score_frame( self, df ):
+        columns = { snake_case( c ): df[c].to_numpy() for c in df.columns }
+        return self.score_columns( columns, len( df ) )
+
+    # ------------------------------------------------------------------
+    # artifact
+
+    def save( self, path ):
+        arrays = {
+            'format_version': np.array( FORMAT_VERSION ),
+            'source_digest': np.array( self.source_digest ),
+            'intercept': np.array( self.intercept ),
+            'region_code_table': self.region_code.table,
+            'region_code_default': np.array( self.region_code.default ),
+            'policy_sales_channel_table': self.policy_sales_channel.table,
+            'policy_sales_channel_default': np.array( self.policy_sales_channel.default ),
+            'binary_weights': np.array( [ self.previously_insured, self.vehicle_damage ] ),
+            'vehicle_age_labels': np.array( [ k for k, _ in self.vehicle_age.strings ] ),
+            'vehicle_age_weights': np.array( [ v for _, v in self.vehicle_age.strings ] ),
+        }
+        for name in ( 'annual_premium', 'age', 'vintage' ):
+            arrays.update( getattr( self, name ).to_arrays( name ) )
+        os.makedirs( os.path.dirname( path ) or '.', exist_ok=True )
+        tmp = path + '.tmp'
+        with open( tmp, 'wb' ) as f:
+            np.savez( f, **arrays )
+        os.replace( tmp, path )
+
+    @classmethod
+    def load( cls, path ):
+        with np.load( path, allow_pickle=False ) as arrays:
+            arrays = dict( arrays )
+        if int( arrays['format_version'] ) != FORMAT_VERSION:
+            raise ValueError( f'{path}: format {int( arrays["format_version"] )}, expected {FORMAT_VERSION}' )
+        previously_insured, vehicle_damage = arrays['binary_weights']
+        lookup = lambda name: _Lookup( dict( enumerate( arrays[name + '_table'] ) ), default=float( arrays[name + '_default'] ) )
+        return cls(
+            intercept=float( arrays['intercept'] ),
+            annual_premium=_Affine.from_arrays( arrays, 'annual_premium' ),
+            age=_Affine.from_arrays( arrays, 'age' ),
+            vintage=_Affine.from_arrays( arrays, 'vintage' ),
+            region_code=lookup( 'region_code' ),
+            policy_sales_channel=lookup( 'policy_sales_channel' ),
+            previously_insured=float( previously_insured ),
+            vehicle_damage=float( vehicle_damage ),
+            vehicle_age=_Lookup( dict( zip( arrays['vehicle_age_labels'].tolist(), arrays['vehicle_age_weights'] ) ), default=0.0 ),
+            source_digest=str( arrays['source_digest'] ),
+        )
+
+
+def load_compiled( home_path='', model_file='model/model_health_insurance.pkl' ):
+    """Compiled tables for the current artifacts, or None when missing or built from other artifacts."""
+    path = os.path.join( home_path, COMPILED_FILE )
+    if not os.path.exists( path ):
+        return None
+    try:
+        compiled = CompiledLogistic.load( path )
+        if compiled.source_digest != source_digest( home_path, model_file ):
+            print(f"Warning: {path} was compiled from other artifacts, ignoring it")
+            return None
+    except Exception as e:
+        print(f"Warning: could not load {path}: {e}")
+        return None
+    return compiled
+
+
+def max_difference( compiled, snapshot, df_raw ):
+    """Largest |compiled - predict_proba| over a raw DataFrame."""
+    pipeline = snapshot.pipeline
+    df3 = pipeline.data_preparation( pipeline.feature_engineering( pipeline.data_cleaning( df_raw.copy() ) ) )
+    expected = pipeline.predict_scores( snapshot.model, df3 )
+    return float( np.max( np.abs( compiled.score_frame( df_raw ) - expected ) ) )
+
+
+def main( argv=None ):
+    from health_insurance.registry import PipelineRegistry
+
+    parser = argparse.ArgumentParser( description='Compila o modelo logístico em tabelas de contribuição por feature' )
+    parser.add_argument( '--home', default='', help='diretório com model/ e parameter/' )
+    parser.add_argument( '--data', default='data/sample_train.csv', help='CSV usado para conferir contra predict_proba' )
+    parser.add_argument( '--tolerance', type=float, default=1e-9 )
+    args = parser.parse_args( argv )
+
+    snapshot = PipelineRegistry( home_path=args.home ).current()
+    try:
+        compiled = CompiledLogistic.from_engine( snapshot.engine, source_digest( args.home ) )
+    except ValueError as e:
+        print( f'❌ {e}' )
+        return 1
+
+    df_raw = read_csv( args.data ).drop( columns='Response', errors='ignore' )
+    diff = max_difference( compiled, snapshot, df_raw )
+    if not diff <= args.tolerance:
+        print( f'❌ diferença máxima {diff:.3g} contra predict_proba (tolerância {args.tolerance:g})' )
+        return 1
+
+    path = os.path.join( args.home, COMPILED_FILE )
+    compiled.save( path )
+    print( f'✅ {path} ({os.path.getsize( path )} bytes), diferença máxima {diff:.3g} em {len( df_raw )} linhas' )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,203 @@
+"""Target and frequency encoders from mergeable per-category counts.
+
+    python -m health_insurance.encoders data/train.csv --workers 4 [--output parameter/]
+
+`EncoderStats` holds, per category, the number of rows and of positive
+responses. Two of them merge by addition, so the CSV is split into byte
+ranges at line boundaries, every range is counted by its own worker and
+the partial results are merged in range order: one read of each byte,
+and the same totals as a sequential pass.
+
+Target encodings are smoothed towards one fixed global prior (the
+positive rate of the whole file unless given):
+
+    (positives + smoothing * prior) / (rows + smoothing)
+
+so rare regions do not get extreme values. The encoders are emitted as
+dense float64 Series: numeric keys cover every integer from 0 to the
+largest one seen, and keys that never occur get the prior (target) or
+0 (frequency). The output depends only on the data: no randomness, and
+retrains on the same file produce identical encoders and cached scores.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+from health_insurance.schema import DTYPES, snake_case
+
+DEFAULT_SMOOTHING = 20.0
+DEFAULT_CHUNKSIZE = 100000
+# (raw column, artifact name, kind)
+ENCODERS = (
+    ( 'Gender', 'gender_encoder', 'target' ),
+    ( 'Region_Code', 'region_code_encoder', 'target' ),
+    ( 'Policy_Sales_Channel', 'policy_sales_channel_encoder', 'frequency' ),
+)
+LABEL = 'Response'
+
+
+class EncoderStats( object ):
+    """Rows and positive responses per category; `merge` adds another accumulator."""
+
+    def __init__( self ):
+        self.rows = pd.Series( dtype=np.float64 )
+        self.positives = pd.Series( dtype=np.float64 )
+
+    def update( self, keys, response ):
+        grouped = pd.Series( np.asarray( response, dtype=np.float64 ) ).groupby( np.asarray( keys ) )
+        self.merge_counts( grouped.size().astype( np.float64 ), grouped.sum() )
+        return self
+
+    def merge_counts( self, rows, positives ):
+        self.rows = self.rows.add( rows, fill_value=0 )
+        self.positives = self.positives.add( positives, fill_value=0 )
+
+    def merge( self, other ):
+        self.merge_counts( other.rows, other.positives )
+        return self
+
+    @property
+    def total_rows( self ):
+        return float( self.rows.sum() )
+
+    @property
+    def total_positives( self ):
+        return float( self.positives.sum() )
+
+    def _dense( self, values, fill ):
+        keys = values.index
+        if len( keys ) and pd.api.types.is_numeric_dtype( keys ) and np.all( ( keys >= 0 ) & ( keys == np.floor( keys ) ) ):
+            full = np.arange( int( keys.max() ) + 1, dtype=np.float64 )
+            return values.reindex( full, fill_value=fill ).astype( np.float64 )
+        return values.sort_index().astype( np.float64 )
+
+    def target_encoding( self, smoothing=DEFAULT_SMOOTHING, prior=None ):
+        if prior is None:
+            prior = self.total_positives / self.total_rows if self.total_rows else 0.5
+        encoded = ( self.positives + smoothing * prior ) / ( self.rows + smoothing )
+        return self._dense( encoded, prior )
+
+    def frequency_encoding( self ):
+        return self._dense( self.rows / self.total_rows if self.total_rows else self.rows, 0.0 )
+
+
+class _RangeReader( io.RawIOBase ):
+    """The header line followed by bytes [start, stop) of a CSV, read on demand."""
+
+    def __init__( self, path, start, stop ):
+        self._file = open( path, 'rb' )
+        self._header = self._file.readline()
+        self._file.seek( start )
+        self._left = stop - start
+
+    def readable( self ):
+        return True
+
+    def readinto( self, buffer ):
+        view = memoryview( buffer ).cast( 'B' )
+        if self._header:
+            n = min( len( view ), len( self._header ) )
+            view[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        n = self._file.readinto( view[:min( len( view ), self._left )] ) if self._left > 0 else 0
+        self._left -= n
+        return n
+
+    def close( self ):
+        self._file.close()
+        super().close()
+
+
+def _range_stats( task ):
+    path, start, stop, chunksize = task
+    columns = [ column for column, _, _ in ENCODERS ] + [ LABEL ]
+    stats = { column: EncoderStats() for column, _, _ in ENCODERS }
+    # streamed, so a worker holds about one chunk of its range at a time
+    with io.BufferedReader( _RangeReader( path, start, stop ) ) as f:
+        for chunk in pd.read_csv( f, usecols=columns, dtype=DTYPES, chunksize=chunksize ):
+            for column, accumulator in stats.items():
+                accumulator.update( chunk[column], chunk[LABEL] )
+    return stats
+
+
+def byte_ranges( path, parts ):
+    """[start, stop) byte ranges of the data rows, cut after newlines (no quoted line breaks)."""
+    size = os.path.getsize( path )
+    with open( path, 'rb' ) as f:
+        first = len( f.readline() )
+        bounds = [ first ]
+        for i in range( 1, parts ):
+            f.seek( max( first, size * i // parts ) )
+            f.readline()
+            bounds.append( min( f.tell(), size ) )
+    bounds.append( size )
+    bounds = sorted( set( bounds ) )
+    return list( zip( bounds[:-1], bounds[1:] ) )
+
+
+def fit_stats( path, workers=None, chunksize=DEFAULT_CHUNKSIZE ):
+    """Per-column EncoderStats of a training CSV, counted in parallel over byte ranges."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [ ( path, start, stop, chunksize ) for start, stop in byte_ranges( path, workers * 4 ) ]
+    if workers > 1 and len( tasks ) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        with multiprocessing.get_context( 'fork' ).Pool( workers ) as pool:
+            partials = pool.map( _range_stats, tasks )
+    else:
+        partials = map( _range_stats, tasks )
+
+    merged = { column: EncoderStats() for column, _, _ in ENCODERS }
+    for partial in partials:
+        for column, accumulator in merged.items():
+            accumulator.merge( partial[column] )
+    return merged
+
+
+def build_encoders( stats, smoothing=DEFAULT_SMOOTHING, prior=None ):
+    """Artifact name -> dense encoder, from per-column stats keyed by raw or snake_case column name."""
+    encoders = {}
+    for column, name, kind in ENCODERS:
+        accumulator = stats[column] if column in stats else stats[snake_case( column )]
+        if kind == 'target':
+            encoders[name] = accumulator.target_encoding( smoothing, prior )
+        else:
+            encoders[name] = accumulator.frequency_encoding()
+    return encoders
+
+
+def frame_encoders( X, y, smoothing=DEFAULT_SMOOTHING, prior=None ):
+    """Encoders of an in-memory snake_case training frame (e.g. the train split)."""
+    stats = { snake_case( column ): EncoderStats().update( X[snake_case( column )], y ) for column, _, _ in ENCODERS }
+    return build_encoders( stats, smoothing, prior )
+
+
+def fit_encoders( path, workers=None, smoothing=DEFAULT_SMOOTHING, prior=None, chunksize=DEFAULT_CHUNKSIZE ):
+    return build_encoders( fit_stats( path, workers, chunksize ), smoothing, prior )
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Ajusta os encoders de gender, region_code e policy_sales_channel em paralelo' )
+    parser.add_argument( 'path' )
+    parser.add_argument( '--workers', type=int, default=None )
+    parser.add_argument( '--smoothing', type=float, default=DEFAULT_SMOOTHING )
+    parser.add_argument( '--prior', type=float, default=None, help='padrão: taxa de positivos do arquivo' )
+    parser.add_argument( '--output', default=None, help='diretório onde gravar os .pkl (ex.: parameter/)' )
+    args = parser.parse_args( argv )
+
+    encoders = fit_encoders( args.path, args.workers, args.smoothing, args.prior )
+    for name, encoder in encoders.items():
+        print( f'{name}: {len( encoder )} chaves, min {encoder.min():.4f}, max {encoder.max():.4f}' )
+        if args.output:
+            with open( os.path.join( args.output, name + '.pkl' ), 'wb' ) as f:
+                pickle.dump( encoder, f )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,154 @@
+import numpy as np
+
+# (row, tree) pairs walked together: enough to amortize numpy call overhead, small
+# enough that the trees of one block stay in cache (walking all trees per level at
+# once measured slower: every level then gathers from the whole node table)
+BLOCK_SIZE = 1 << 18
+# feature int16, threshold float32, left and right int32, value float64
+NODE_BYTES = 2 + 4 + 4 + 4 + 8
+
+
+def _threshold_float32( threshold ):
+    # sklearn compares float32(x) <= float64 threshold; the largest float32 not above the
+    # threshold gives the same split for every float32 x
+    t32 = threshold.astype( np.float32 )
+    above = t32.astype( np.float64 ) > threshold
+    t32[above] = np.nextafter( t32[above], np.float32( -np.inf ) )
+    return t32
+
+
+class FlatForest( object ):
+    """A binary RandomForestClassifier flattened into struct-of-arrays node tables.
+
+    Every tree's nodes live in the same five arrays (feature, threshold,
+    left, right, value) and `roots` holds each tree's first node. Leaves
+    point at themselves with a -inf threshold, so a batch is scored by
+    stepping every (row, tree) pair one level at a time until all of them
+    sit on a leaf. The arrays can be views of a memory-mapped bundle.
+    """
+
+    ARRAYS = ( 'feature', 'threshold', 'left', 'right', 'value', 'roots' )
+
+    def __init__( self, feature, threshold, left, right, value, roots, max_depth, n_features, classes, feature_names=None ):
+        # sklearn's depth-first builder puts every left child right after its parent
+        internal = right != np.arange( len( right ), dtype=right.dtype )
+        self.depth_first = bool( np.all( left[internal] == np.flatnonzero( internal ) + 1 ) )
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = np.asarray( classes )
+        self.n_features_in_ = n_features
+        if feature_names is not None:
+            self.feature_names_in_ = np.asarray( feature_names, dtype=object )
+
+    @classmethod
+    def from_sklearn( cls, forest ):
+        if isinstance( forest, cls ):
+            return forest
+        if len( forest.classes_ ) != 2 or getattr( forest, 'n_outputs_', 1 ) != 1:
+            raise ValueError( 'Only binary single-output forests can be flattened' )
+        parts = { name: [] for name in cls.ARRAYS }
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            leaf = tree.children_left == -1
+            nodes = np.arange( offset, offset + n, dtype=np.int32 )
+
+            counts = tree.value[:, 0, :]
+            parts['feature'].append( np.where( leaf, 0, tree.feature ).astype( np.int16 ) )
+            parts['threshold'].append( np.where( leaf, np.float32( -np.inf ), _threshold_float32( tree.threshold ) ) )
+            parts['left'].append( np.where( leaf, nodes, tree.children_left + offset ).astype( np.int32 ) )
+            parts['right'].append( np.where( leaf, nodes, tree.children_right + offset ).astype( np.int32 ) )
+            parts['value'].append( counts[:, 1] / counts.sum( axis=1 ) )
+            parts['roots'].append( np.array( [ offset ], dtype=np.int32 ) )
+            offset += n
+            max_depth = max( max_depth, tree.max_depth )
+
+        if offset >= 2**31:
+            raise ValueError( 'Forest has too many nodes for int32 indices' )
+        arrays = { name: np.concatenate( values ) for name, values in parts.items() }
+        arrays['threshold'] = arrays['threshold'].astype( np.float32 )
+        names = getattr( forest, 'feature_names_in_', None )
+        return cls( max_depth=max_depth, n_features=forest.n_features_in_, classes=forest.classes_, feature_names=list( names ) if names is not None else None,
+                    **arrays )
+
+    @property
+    def n_nodes( self ):
+        return len( self.feature )
+
+    @property
+    def nbytes( self ):
+        return sum( getattr( self, name ).nbytes for name in self.ARRAYS )
+
+    def _positive_proba( self, X ):
+        n_rows, n_features = X.shape
+        n_trees = len( self.roots )
+        cells = X.ravel()  # row-major: row * n_features + feature
+        index = np.int32 if n_rows * n_features < 2**31 else np.int64
+        total = np.zeros( n_rows )
+        trees_per_block = max( BLOCK_SIZE // n_rows, 1 )
+        for first in range( 0, n_trees, trees_per_block ):
+            roots = self.roots[first:first + trees_per_block]
+            # one entry per (tree, row) pair still walking down; `base` is the pair's first cell in X
+            node = np.repeat( roots, n_rows )
+            base = np.tile( np.arange( 0, n_rows * n_features, n_features, dtype=index ), len( roots ) )
+            active = np.arange( len( node ), dtype=index )
+            leaf = np.empty_like( node )
+            for _ in range( self.max_depth ):
+                offset = self.feature[node].astype( index )
+                offset += base
+                go_right = cells[offset] > self.threshold[node]
+                if self.depth_first:
+                    # node + 1 + go_right * ( right - node - 1 ), in place: cheaper than np.where
+                    step = self.right[node]
+                    step -= node
+                    step -= 1
+                    step *= go_right
+                    step += node
+                    step += 1
+                else:
+                    step = np.where( go_right, self.right[node], self.left[node] )
+                done = step == node
+                # pairs on a leaf keep looping in place; drop them once they are a sizeable share
+                if np.count_nonzero( done ) > len( node ) // 4:
+                    leaf[active[done]] = node[done]
+                    keep = np.flatnonzero( ~done )
+                    active, step, base = active.take( keep ), step.take( keep ), base.take( keep )
+                node = step
+                if not len( node ):
+                    break
+            leaf[active] = node
+            total += self.value[leaf].reshape( len( roots ), n_rows ).sum( axis=0 )
+        return total / n_trees
+
+    def predict_proba( self, X ):
+        X = np.ascontiguousarray( X, dtype=np.float32 )
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError( f'X has {X.shape[-1]} features, but the forest expects {self.n_features_in_}' )
+        if np.isnan( X ).any():
+            raise ValueError( 'Input contains NaN' )
+        p = self._positive_proba( X )
+        return np.column_stack( [ 1 - p, p ] )
+
+    def predict( self, X ):
+        return self.classes_[( self.predict_proba( X )[:, 1] > 0.5 ).astype( int )]
+
+    # ------------------------------------------------------------------
+    # bundle
+
+    def to_bundle( self ):
+        meta = { 'type': 'forest', 'classes': self.classes_.tolist(), 'max_depth': int( self.max_depth ),
+                 'n_features': int( self.n_features_in_ ),
+                 'feature_names': list( self.feature_names_in_ ) if hasattr( self, 'feature_names_in_' ) else None }
+        return meta, { 'forest.' + name: getattr( self, name ) for name in self.ARRAYS }
+
+    @classmethod
+    def from_bundle( cls, meta, arrays ):
+        return cls( max_depth=meta['max_depth'], n_features=meta['n_features'], classes=meta['classes'], feature_names=meta['feature_names'],
+                    **{ name: arrays['forest.' + name] for name in cls.ARRAYS } )
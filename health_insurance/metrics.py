@@ -0,0 +1,218 @@
+"""Process-local latency histograms and counters for the API.
+
+Requests keep their stage timings in a `RequestTimer` (no locking while
+the request runs) and hand them to `Metrics` in one locked update when
+they finish. `Metrics.render()` emits the Prometheus text format served
+at /metrics; `RequestTimer.server_timing()` is the Server-Timing header.
+With several gunicorn workers each process keeps its own numbers, so a
+scrape sees whichever worker answered it.
+
+METRICS=0 turns recording off (timers still run, nothing is stored).
+"""
+import bisect
+import os
+import threading
+import time
+
+PREFIX = 'health_insurance_'
+
+# upper bounds of the histogram buckets
+LATENCY_BUCKETS_S = ( 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0 )
+ROW_BUCKETS = ( 1, 10, 100, 1000, 10000, 100000, 1000000 )
+BYTE_BUCKETS = ( 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216 )
+ROWS_PER_SECOND_BUCKETS = ( 100, 1000, 10000, 100000, 1000000, 10000000 )
+
+# name -> (type, help, bucket bounds)
+FAMILIES = {
+    'stage_seconds': ( 'histogram', 'Latency of each prediction stage', LATENCY_BUCKETS_S ),
+    'request_seconds': ( 'histogram', 'Latency of whole requests', LATENCY_BUCKETS_S ),
+    'request_rows': ( 'histogram', 'Records per request', ROW_BUCKETS ),
+    'request_bytes': ( 'histogram', 'Request and response body sizes', BYTE_BUCKETS ),
+    'rows_per_second': ( 'histogram', 'Records scored per second of request time', ROWS_PER_SECOND_BUCKETS ),
+    'requests_total': ( 'counter', 'Requests by route and status', None ),
+    'fallback_scores_total': ( 'counter', 'Records that got the 0.5 fallback score after a prediction error', None ),
+    'pipeline_reloads_total': ( 'counter', 'Artifact sets loaded by the registry', None ),
+    'artifact_load_seconds': ( 'gauge', 'Time to load the current model and encoders', None ),
+    'startup_seconds': ( 'gauge', 'Startup phases of this process', None ),
+}
+
+
+class Histogram( object ):
+
+    def __init__( self, bounds ):
+        self.bounds = bounds
+        self.counts = [ 0 ] * ( len( bounds ) + 1 )
+        self.total = 0.0
+        self.count = 0
+
+    def observe( self, value ):
+        self.counts[bisect.bisect_left( self.bounds, value )] += 1
+        self.total += value
+        self.count += 1
+
+    def to_dict( self ):
+        labels = [ str( b ) for b in self.bounds ] + [ '+Inf' ]
+        return {
+            'buckets': dict( zip( labels, self.counts ) ),
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+        }
+
+
+def _labels( labels, extra=None ):
+    pairs = list( labels ) + ( [ extra ] if extra else [] )
+    if not pairs:
+        return ''
+    return '{' + ','.join( f'{k}="{v}"' for k, v in pairs ) + '}'
+
+
+class Metrics( object ):
+    """Histograms, counters and gauges keyed by family name and a sorted tuple of label pairs."""
+
+    def __init__( self, enabled=True ):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._values = {}
+        self._routes = {}
+
+    def _update( self, name, labels, value ):
+        kind, _, bounds = FAMILIES[name]
+        key = ( name, labels )
+        if kind == 'histogram':
+            histogram = self._values.get( key )
+            if histogram is None:
+                histogram = self._values[key] = Histogram( bounds )
+            histogram.observe( value )
+        elif kind == 'counter':
+            self._values[key] = self._values.get( key, 0 ) + value
+        else:
+            self._values[key] = value
+
+    def record( self, updates ):
+        """Apply (name, labels, value) updates under one lock acquisition."""
+        if not self.enabled:
+            return
+        with self._lock:
+            for name, labels, value in updates:
+                self._update( name, labels, value )
+
+    def _histogram( self, name, labels ):
+        histogram = self._values.get( ( name, labels ) )
+        if histogram is None:
+            histogram = self._values[( name, labels )] = Histogram( FAMILIES[name][2] )
+        return histogram
+
+    def observe_request( self, timer, total, status, bytes_in, bytes_out ):
+        """RequestTimer.finish(): the route's series are resolved once and cached, no label tuples per request."""
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._routes.get( ( timer.route, timer.engine ) )
+            if series is None:
+                series = self._routes[( timer.route, timer.engine )] = _RouteSeries( self, timer.route, timer.engine )
+            stages = series.stages
+            for name, seconds in timer.stages:
+                histogram = stages.get( name )
+                if histogram is None:
+                    histogram = stages[name] = self._histogram( 'stage_seconds', ( ( 'engine', timer.engine ), ( 'stage', name ) ) )
+                histogram.observe( seconds )
+            series.seconds.observe( total )
+            key = series.status_keys.get( status )
+            if key is None:
+                key = series.status_keys[status] = ( 'requests_total', series.route + ( ( 'status', status ), ) )
+            self._values[key] = self._values.get( key, 0 ) + 1
+            if timer.rows:
+                series.rows.observe( timer.rows )
+                if total > 0:
+                    series.rows_per_second.observe( timer.rows / total )
+            if bytes_in is not None:
+                series.bytes_in.observe( bytes_in )
+            if bytes_out is not None:
+                series.bytes_out.observe( bytes_out )
+
+    def inc( self, name, amount=1, **labels ):
+        self.record( [ ( name, tuple( sorted( labels.items() ) ), amount ) ] )
+
+    def set( self, name, value, **labels ):
+        self.record( [ ( name, tuple( sorted( labels.items() ) ), value ) ] )
+
+    def value( self, name, **labels ):
+        with self._lock:
+            return self._values.get( ( name, tuple( sorted( labels.items() ) ) ) )
+
+    def render( self ):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = sorted( self._values.items(), key=lambda item: ( item[0][0], item[0][1] ) )
+            lines, family = [], None
+            for ( name, labels ), value in items:
+                kind, help_text, _ = FAMILIES[name]
+                metric = PREFIX + name
+                if name != family:
+                    lines += [ f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}' ]
+                    family = name
+                if kind != 'histogram':
+                    lines.append( f'{metric}{_labels( labels )} {value:g}' )
+                    continue
+                cumulative = 0
+                for bound, count in zip( list( value.bounds ) + [ '+Inf' ], value.counts ):
+                    cumulative += count
+                    lines.append( f'{metric}_bucket{_labels( labels, ( "le", bound ) )} {cumulative}' )
+                lines.append( f'{metric}_sum{_labels( labels )} {value.total:g}' )
+                lines.append( f'{metric}_count{_labels( labels )} {value.count}' )
+        return '\n'.join( lines ) + '\n'
+
+
+class _RouteSeries( object ):
+    # histograms of one (route, engine), looked up once instead of per request
+
+    def __init__( self, metrics, route, engine ):
+        self.route = ( ( 'route', route ), )
+        self.stages = {}
+        self.status_keys = {}
+        self.seconds = metrics._histogram( 'request_seconds', self.route )
+        self.rows = metrics._histogram( 'request_rows', self.route )
+        self.rows_per_second = metrics._histogram( 'rows_per_second', self.route )
+        self.bytes_in = metrics._histogram( 'request_bytes', ( ( 'direction', 'in' ), ) + self.route )
+        self.bytes_out = metrics._histogram( 'request_bytes', ( ( 'direction', 'out' ), ) + self.route )
+
+
+METRICS = Metrics( enabled=os.environ.get( 'METRICS', '1' ) != '0' )
+
+
+def record_fallback( engine, rows ):
+    METRICS.inc( 'fallback_scores_total', rows, engine=engine )
+
+
+class RequestTimer( object ):
+    """Stage clock of one request: `mark( name )` starts a stage and ends the previous one."""
+
+    __slots__ = ( 'route', 'engine', 'rows', 'stages', 'start', '_stage', '_last' )
+
+    def __init__( self, route, engine ):
+        self.route = route
+        self.engine = engine
+        self.rows = 0
+        self.stages = []
+        self.start = self._last = time.perf_counter()
+        self._stage = None
+
+    def mark( self, name ):
+        if name is not None and name == self._stage:
+            return
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.stages.append( ( self._stage, now - self._last ) )
+        self._stage = name
+        self._last = now
+
+    def finish( self, status, bytes_in=None, bytes_out=None, metrics=None ):
+        self.mark( None )
+        total = self._last - self.start
+        ( metrics or METRICS ).observe_request( self, total, status, bytes_in, bytes_out )
+        return total
+
+    def server_timing( self ):
+        parts = [ '%s;dur=%.3f' % ( name, seconds * 1000 ) for name, seconds in self.stages ]
+        parts.append( 'total;dur=%.3f' % ( ( self._last - self.start ) * 1000 ) )
+        return ', '.join( parts )
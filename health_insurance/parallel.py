@@ -0,0 +1,91 @@
+"""Multi-process scoring with the model shared copy-on-write.
+
+The scorer (and, for in-memory batches, the input frame) is stored in a
+module global *before* the pool forks, so workers inherit the already
+loaded model and encoders instead of unpickling their own copies. Only row
+ranges travel to the workers and only score arrays travel back; results
+are reassembled in input order. `gc.freeze()` moves the parent's objects
+out of the collector's reach first, so the `gc.collect()` calls inside the
+pipeline do not touch (and copy) the shared pages.
+"""
+import gc
+import multiprocessing
+
+import numpy as np
+
+# set in the parent right before forking, read by the workers
+_SCORE = None
+_FRAME = None
+
+
+def fork_available():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def row_ranges( n_rows, parts ):
+    bounds = np.linspace( 0, n_rows, parts + 1 ).astype( np.int64 )
+    return [ ( int( a ), int( b ) ) for a, b in zip( bounds[:-1], bounds[1:] ) if b > a ]
+
+
+def _score_range( bounds ):
+    start, stop = bounds
+    return _SCORE( _FRAME.iloc[start:stop] )
+
+
+def _score_chunk( chunk ):
+    return _SCORE( chunk )
+
+
+def parallel_score_frame( score_chunk, df, workers, parts_per_worker=4 ):
+    """Score `df` with `workers` forked processes; returns scores in row order."""
+    global _SCORE, _FRAME
+    if workers <= 1 or len( df ) < 2 or not fork_available():
+        return np.asarray( score_chunk( df ) )
+
+    _SCORE, _FRAME = score_chunk, df
+    gc.freeze()
+    try:
+        with multiprocessing.get_context( 'fork' ).Pool( workers ) as pool:
+            parts = pool.map( _score_range, row_ranges( len( df ), workers * parts_per_worker ) )
+    finally:
+        _SCORE, _FRAME = None, None
+        gc.unfreeze()
+    return np.concatenate( parts )
+
+
+class ScoringPool( object ):
+    """Fork pool for streams of chunks (batch_score); keeps at most `window` chunks in flight."""
+
+    def __init__( self, score_chunk, workers, window=None ):
+        global _SCORE
+        _SCORE = score_chunk
+        gc.freeze()
+        try:
+            self.pool = multiprocessing.get_context( 'fork' ).Pool( workers )
+        finally:
+            _SCORE = None
+            gc.unfreeze()
+        self.window = window or 2 * workers
+
+    def imap( self, chunks ):
+        # ordered like the input; bounded memory unlike Pool.imap, which drains the iterator
+        pending = []
+        for chunk in chunks:
+            pending.append( ( chunk, self.pool.apply_async( _score_chunk, ( chunk, ) ) ) )
+            if len( pending ) >= self.window:
+                chunk, result = pending.pop( 0 )
+                yield chunk, result.get()
+        for chunk, result in pending:
+            yield chunk, result.get()
+
+    def close( self ):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        if exc[0] is not None:
+            self.pool.terminate()
+        self.close()
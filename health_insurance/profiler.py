@@ -0,0 +1,156 @@
+"""Opt-in cProfile sampling of live prediction requests.
+
+A request is profiled when it is the Nth since the last sample
+(PROFILE_SAMPLE_EVERY=N) or when it carries the header
+`X-Profile: <PROFILE_TOKEN>`. Samples stop once their share of this
+process's requests would exceed PROFILE_MAX_FRACTION; forced profiles
+are asked for by someone holding the token and are not capped, so they
+work from the first request. Only one request is profiled at a time.
+
+Profiles are written as `.pstats` files to a ring in PROFILE_DIR holding
+the newest PROFILE_KEEP of them (shared by the gunicorn workers, so the
+file names carry the pid). With both PROFILE_SAMPLE_EVERY and
+PROFILE_TOKEN unset the app registers no hooks at all.
+
+    PROFILE_SAMPLE_EVERY  profile one request in N (default 0, off)
+    PROFILE_TOKEN         secret for the X-Profile header and the /profiles endpoints
+    PROFILE_MAX_FRACTION  ceiling on the sampled share of requests (default 0.01)
+    PROFILE_DIR           ring directory (default profiles)
+    PROFILE_KEEP          profiles kept (default 20, oldest removed)
+"""
+import cProfile
+import hmac
+import io
+import itertools
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+
+DEFAULT_DIR = 'profiles'
+DEFAULT_KEEP = 20
+DEFAULT_MAX_FRACTION = 0.01
+HEADER = 'X-Profile'
+TOKEN_HEADER = 'X-Profile-Token'
+
+# <unix ms>-<pid>-<seq>-<route>-<duration us>.pstats
+NAME_PATTERN = re.compile( r'^(\d+)-(\d+)-(\d+)-([a-z_]+)-(\d+)\.pstats$' )
+
+
+class Profiler( object ):
+
+    def __init__( self, directory=DEFAULT_DIR, sample_every=0, token='', max_fraction=DEFAULT_MAX_FRACTION, keep=DEFAULT_KEEP ):
+        self.directory = directory
+        self.sample_every = sample_every
+        self.token = token
+        self.max_fraction = max_fraction
+        self.keep = keep
+        self.seen = 0
+        self.profiled = 0
+        self.forced = 0
+        self.skipped = 0
+        self._sequence = itertools.count( 1 )
+        self._lock = threading.Lock()
+        self._active = False
+
+    @classmethod
+    def from_env( cls, environ=os.environ ):
+        return cls( directory=environ.get( 'PROFILE_DIR', DEFAULT_DIR ),
+                    sample_every=int( environ.get( 'PROFILE_SAMPLE_EVERY', 0 ) ),
+                    token=environ.get( 'PROFILE_TOKEN', '' ),
+                    max_fraction=float( environ.get( 'PROFILE_MAX_FRACTION', DEFAULT_MAX_FRACTION ) ),
+                    keep=int( environ.get( 'PROFILE_KEEP', DEFAULT_KEEP ) ) )
+
+    @property
+    def enabled( self ):
+        return self.sample_every > 0 or bool( self.token )
+
+    def authorized( self, headers, name=TOKEN_HEADER ):
+        # without a token only sampling is possible, and the profiles stay on disk
+        return bool( self.token ) and hmac.compare_digest( headers.get( name, '' ), self.token )
+
+    def start( self, headers ):
+        """A running cProfile.Profile if this request is to be profiled, else None."""
+        forced = self.authorized( headers, HEADER )
+        with self._lock:
+            self.seen += 1
+            due = forced or ( self.sample_every > 0 and self.seen % self.sample_every == 0 )
+            if not due:
+                return None
+            sampled = self.profiled - self.forced
+            if self._active or ( not forced and sampled + 1 > self.max_fraction * self.seen ):
+                self.skipped += 1
+                return None
+            self._active = True
+            self.profiled += 1
+            self.forced += forced
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop( self, profile, route, seconds ):
+        """Disable the profile, add it to the ring and return its file name."""
+        profile.disable()
+        try:
+            name = f'{int( time.time() * 1000 )}-{os.getpid()}-{next( self._sequence )}-{route}-{int( seconds * 1e6 )}.pstats'
+            os.makedirs( self.directory, exist_ok=True )
+            fd, tmp = tempfile.mkstemp( dir=self.directory, suffix='.tmp' )
+            os.close( fd )
+            try:
+                profile.dump_stats( tmp )
+                os.replace( tmp, os.path.join( self.directory, name ) )
+            except BaseException:
+                os.unlink( tmp )
+                raise
+            self._prune()
+            return name
+        finally:
+            with self._lock:
+                self._active = False
+
+    def _prune( self ):
+        for name in self.names()[self.keep:]:
+            try:
+                os.remove( os.path.join( self.directory, name ) )
+            except FileNotFoundError: # pruned by another worker
+                pass
+
+    def names( self ):
+        # newest first
+        if not os.path.isdir( self.directory ):
+            return []
+        names = [ name for name in os.listdir( self.directory ) if NAME_PATTERN.match( name ) ]
+        return sorted( names, key=lambda name: tuple( int( part ) for part in NAME_PATTERN.match( name ).group( 1, 3 ) ), reverse=True )
+
+    def listing( self ):
+        profiles = []
+        for name in self.names():
+            created_ms, pid, _, route, duration_us = NAME_PATTERN.match( name ).groups()
+            try:
+                size = os.path.getsize( os.path.join( self.directory, name ) )
+            except FileNotFoundError:
+                continue
+            profiles.append( { 'name': name, 'route': route, 'pid': int( pid ), 'created': int( created_ms ) / 1000.0,
+                               'duration_ms': int( duration_us ) / 1000.0, 'bytes': size } )
+        return profiles
+
+    def path( self, name ):
+        # only names of the ring, so the endpoint cannot be walked out of the directory
+        if not NAME_PATTERN.match( name ):
+            return None
+        path = os.path.join( self.directory, name )
+        return path if os.path.exists( path ) else None
+
+    def stats( self ):
+        with self._lock:
+            return { 'enabled': self.enabled, 'sample_every': self.sample_every, 'max_fraction': self.max_fraction,
+                     'seen': self.seen, 'profiled': self.profiled, 'forced': self.forced, 'skipped': self.skipped, 'keep': self.keep }
+
+
+def report( path, sort='cumulative', limit=40 ):
+    """pstats text of one profile, the top `limit` functions by `sort` (every function when limit <= 0)."""
+    out = io.StringIO()
+    pstats.Stats( path, stream=out ).strip_dirs().sort_stats( sort ).print_stats( *( [ limit ] if limit > 0 else [] ) )
+    return out.getvalue()
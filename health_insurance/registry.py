@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from health_insurance.HealthInsurance import ARTIFACT_FILES, HealthInsurance, load_artifacts, load_pickle
+from health_insurance.HealthInsurance_optimized import HealthInsuranceOptimized
+from health_insurance.bundle import BUNDLE_FILE, load_bundle
+from health_insurance.compiled import COMPILED_FILE, load_compiled
+from health_insurance.metrics import METRICS
+
+MODEL_FILE = 'model/model_health_insurance.pkl'
+
+logger = logging.getLogger( __name__ )
+
+
+class PipelineSnapshot( object ):
+    """Immutable view of one fully loaded set of artifacts.
+
+    Requests grab a snapshot once and use it until they finish, so a reload
+    that happens mid-request never mixes old encoders with a new model.
+    """
+
+    def __init__( self, pipeline, model, version, loaded_at, cache=None, compiled=None ):
+        self.pipeline = pipeline
+        self.model = model
+        self.engine = HealthInsuranceOptimized( pipeline, model, cache=cache, version=version )
+        # CompiledLogistic tables built from these same artifacts, when present
+        self.compiled = compiled
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+class PipelineRegistry( object ):
+    """Process-wide owner of the preprocessing pipeline and the model.
+
+    Artifacts are read once, from the pickle-free bundle when `bundle_file`
+    exists and from the pickles otherwise; afterwards their mtimes are checked at most
+    every `check_interval` seconds and a new snapshot is swapped in when any
+    of them changes. An optional ScoreCache is shared by every snapshot and
+    invalidated on each swap.
+    """
+
+    def __init__( self, home_path='', model_file=MODEL_FILE, check_interval=2.0, cache=None, bundle_file=BUNDLE_FILE ):
+        self.home_path = home_path
+        self.model_file = model_file
+        self.bundle_file = bundle_file
+        self.check_interval = check_interval
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._snapshot = None
+        self._last_check = 0.0
+        self.reload()
+
+    def _paths( self ):
+        paths = [ os.path.join( self.home_path, path ) for path in ARTIFACT_FILES.values() ]
+        paths.append( os.path.join( self.home_path, self.model_file ) )
+        paths.append( os.path.join( self.home_path, COMPILED_FILE ) )
+        if self.bundle_file:
+            paths.append( os.path.join( self.home_path, self.bundle_file ) )
+        return paths
+
+    def _current_stamp( self ):
+        stamp = []
+        for path in self._paths():
+            try:
+                st = os.stat( path )
+                stamp.append( ( path, st.st_mtime_ns, st.st_size ) )
+            except OSError:
+                stamp.append( ( path, None, None ) )
+        return tuple( stamp )
+
+    def _load( self, stamp ):
+        bundle = os.path.join( self.home_path, self.bundle_file ) if self.bundle_file else None
+        start = time.perf_counter()
+        if bundle and os.path.exists( bundle ) and not self._pickle_is_newer( bundle ):
+            artifacts, model = load_bundle( bundle )
+            pipeline = HealthInsurance( self.home_path, artifacts=artifacts )
+            timings = { 'bundle': time.perf_counter() - start }
+        else:
+            pipeline, model, timings = self._load_pickles()
+        version = hashlib.sha1( repr( stamp ).encode() ).hexdigest()[:12]
+        start = time.perf_counter()
+        compiled = load_compiled( self.home_path, self.model_file )
+        timings['compiled'] = time.perf_counter() - start
+        METRICS.record( [ ( 'artifact_load_seconds', ( ( 'artifact', name ), ), seconds ) for name, seconds in timings.items() ]
+                        + [ ( 'pipeline_reloads_total', (), 1 ) ] )
+        return PipelineSnapshot( pipeline, model, version, time.time(), cache=self.cache, compiled=compiled )
+
+    def _pickle_is_newer( self, bundle ):
+        # a model or parameter refitted without re-exporting the bundle wins over the stale bundle
+        try:
+            packed = [ self.model_file ] + list( ARTIFACT_FILES.values() )
+            mtime, newest = max( ( os.path.getmtime( os.path.join( self.home_path, path ) ), path ) for path in packed )
+            newer = mtime > os.path.getmtime( bundle )
+        except OSError:
+            return False
+        if newer:
+            logger.warning( '%s is older than %s, loading the pickles', bundle, newest )
+        return newer
+
+    def _load_pickles( self ):
+        start = time.perf_counter()
+        model = load_pickle( os.path.join( self.home_path, self.model_file ) )
+        loaded = time.perf_counter()
+        try:
+            pipeline = HealthInsurance( self.home_path, artifacts=load_artifacts( self.home_path ) )
+        except Exception:
+            if self._snapshot is not None:
+                raise
+            # first load: keep the historical fallback encoders
+            pipeline = HealthInsurance( self.home_path )
+        return pipeline, model, { 'model': loaded - start, 'encoders': time.perf_counter() - loaded }
+
+    def reload( self ):
+        with self._lock:
+            stamp = self._current_stamp()
+            try:
+                snapshot = self._load( stamp )
+            except Exception as e:
+                if self._snapshot is None:
+                    raise
+                logger.warning( 'keeping pipeline %s, reload failed: %s', self._snapshot.version, e )
+                return self._snapshot
+            # artifacts changed while we were reading them: retry on the next check
+            if self._current_stamp() == stamp:
+                self._stamp = stamp
+            if self._snapshot is not None and self.cache is not None:
+                self.cache.invalidate()
+            self._snapshot = snapshot
+            self._last_check = time.monotonic()
+            return snapshot
+
+    def current( self ):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            if self._current_stamp() != self._stamp:
+                return self.reload()
+        return self._snapshot
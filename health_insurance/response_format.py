@@ -0,0 +1,171 @@
+import gzip
+import io
+import json
+
+import numpy as np
+
+from health_insurance.schema import snake_case
+
+# name -> mimetype
+FORMATS = {
+    'records': 'application/json',
+    'scores': 'application/json',
+    'id_score': 'application/json',
+    'columnar': 'application/json',
+    'npy': 'application/x-npy',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+# binary formats can also be requested through the Accept header
+ACCEPT_FORMATS = { 'application/x-npy': 'npy', 'application/vnd.apache.arrow.stream': 'arrow' }
+# columns echoed when the request does not say: None means every input column
+DEFAULT_ECHO = { 'records': None, 'scores': [], 'id_score': [ 'id' ], 'columnar': None, 'npy': [], 'arrow': None }
+GZIP_MIN_BYTES = 1024
+
+
+class ResponseFormat( object ):
+    """What the caller asked for: output layout, echoed input columns and compression."""
+
+    def __init__( self, name='records', echo=None, gzip=False ):
+        self.name = name
+        self.echo = echo
+        self.gzip = gzip
+
+    @property
+    def mimetype( self ):
+        return FORMATS[self.name]
+
+    @property
+    def is_default( self ):
+        # the historical response: every input column plus score, as JSON records
+        return self.name == 'records' and self.echo is None
+
+
+def negotiate( args, headers ):
+    """Pick the format from ?format=, ?echo=, ?gzip= and the Accept / Accept-Encoding headers."""
+    name = args.get( 'format' )
+    if name is None:
+        accept = headers.get( 'Accept', '' )
+        name = next( ( fmt for mimetype, fmt in ACCEPT_FORMATS.items() if mimetype in accept ), 'records' )
+    if name not in FORMATS:
+        raise ValueError( f'Unknown format {name!r}; expected one of {sorted( FORMATS )}' )
+    if name == 'arrow' and _pyarrow() is None:
+        raise ValueError( 'Arrow output needs pyarrow installed' )
+
+    echo = DEFAULT_ECHO[name]
+    if 'echo' in args:
+        echo = [ snake_case( col ) for col in args['echo'].split( ',' ) if col ]
+
+    wants_gzip = accepts_gzip( headers.get( 'Accept-Encoding', '' ) ) and args.get( 'gzip', '1' ) != '0'
+    return ResponseFormat( name, echo, wants_gzip )
+
+
+def accepts_gzip( accept_encoding ):
+    """Whether an Accept-Encoding value allows gzip: q=0 refuses it and `*` covers it when not listed."""
+    qualities = {}
+    for part in accept_encoding.split( ',' ):
+        coding, _, params = part.partition( ';' )
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split( ';' ):
+            key, _, value = param.partition( '=' )
+            if key.strip().lower() == 'q':
+                try:
+                    q = float( value )
+                except ValueError:
+                    q = 0.0  # unreadable weight: do not risk an encoding the caller cannot decode
+        qualities[coding] = q
+    q = qualities.get( 'gzip', qualities.get( 'x-gzip', qualities.get( '*', 0.0 ) ) )
+    return q > 0
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def _columns( fmt, records ):
+    # echoed input columns in snake_case, in input order
+    rows = [ { snake_case( k ): v for k, v in r.items() } for r in records ]
+    names = fmt.echo if fmt.echo is not None else list( rows[0] ) if rows else []
+    return { name: [ row.get( name ) for row in rows ] for name in names }
+
+
+def _npy_column( name, values ):
+    # None (or a missing key) must not become the string 'None': numbers get NaN, text is refused
+    values = np.asarray( values )
+    if values.dtype.kind != 'O':
+        return values
+    missing = np.array( [ v is None or v != v for v in values ], dtype=bool )
+    present = values[~missing]
+    if all( isinstance( v, ( int, float, np.number ) ) for v in present ):
+        column = np.full( len( values ), np.nan )
+        column[~missing] = present.astype( np.float64 )
+        return column
+    if missing.any():
+        raise ValueError( f'Column {name!r} has missing text values, which npy cannot hold; use format=arrow or records' )
+    return values.astype( str )
+
+
+def _npy( columns, scores ):
+    buf = io.BytesIO()
+    if not columns:
+        np.save( buf, scores )
+        return buf.getvalue()
+    arrays = [ ( name, _npy_column( name, values ) ) for name, values in columns.items() ]
+    arrays.append( ( 'score', scores ) )
+    table = np.empty( len( scores ), dtype=[ ( name, values.dtype ) for name, values in arrays ] )
+    for name, values in arrays:
+        table[name] = values
+    np.save( buf, table, allow_pickle=False )
+    return buf.getvalue()
+
+
+def _arrow( columns, scores ):
+    pa = _pyarrow()
+    data = dict( columns )
+    data['score'] = scores
+    table = pa.table( data )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream( sink, table.schema ) as writer:
+        writer.write_table( table )
+    return sink.getvalue().to_pybytes()
+
+
+def render( fmt, records, scores ):
+    """Body bytes for `records` (raw input dicts) and their `scores`."""
+    scores = np.asarray( scores, dtype=np.float64 )
+    columns = _columns( fmt, records )
+
+    if fmt.name == 'scores' and not columns:
+        return json.dumps( scores.tolist() ).encode()
+    if fmt.name == 'columnar':
+        return json.dumps( dict( columns, score=scores.tolist() ) ).encode()
+    if fmt.name == 'npy':
+        return _npy( columns, scores )
+    if fmt.name == 'arrow':
+        return _arrow( columns, scores )
+
+    if fmt.name == 'id_score' and 'id' in columns and all( v is None for v in columns['id'] ):
+        # no id in the input: fall back to the row position
+        columns['id'] = list( range( len( scores ) ) )
+    names = list( columns )
+    rows = [ dict( zip( names, values ), score=score ) for values, score in zip( zip( *columns.values() ), scores.tolist() ) ] \
+        if names else [ { 'score': score } for score in scores.tolist() ]
+    return json.dumps( rows ).encode()
+
+
+def encode( fmt, body ):
+    """(body, headers) with gzip applied when the caller accepts it and it pays off."""
+    if isinstance( body, str ):
+        body = body.encode()
+    headers = { 'Vary': 'Accept-Encoding' }
+    if fmt.gzip and len( body ) >= GZIP_MIN_BYTES:
+        body = gzip.compress( body, compresslevel=5 )
+        headers['Content-Encoding'] = 'gzip'
+    return body, headers
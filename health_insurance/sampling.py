@@ -0,0 +1,152 @@
+"""Single-pass stratified reservoir sampling of a training CSV.
+
+    python -m health_insurance.sampling data/train.csv sample.csv --size 10000 [--negative-ratio 3]
+
+The file is read in chunks and every class keeps its own uniform reservoir
+(Algorithm R) of at most `size` rows, so memory depends on the sample size
+and not on the file. After the pass each reservoir is cut to its share:
+the class proportions of the file, or `negative_ratio` negatives per
+positive. Each kept row represents `rows seen / rows kept` rows of its
+class; that weight is returned (and written as a `sample_weight` column)
+so a model fitted on the sample can be re-weighted to the full data. The
+same file, size and seed always give the same sample.
+"""
+import argparse
+import json
+import sys
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from health_insurance.schema import read_csv
+
+DEFAULT_CHUNKSIZE = 50000
+WEIGHT_COLUMN = 'sample_weight'
+
+
+class _Reservoir( object ):
+    """Uniform sample of at most `capacity` rows of one class, stored column by column."""
+
+    def __init__( self, capacity, rng ):
+        self.capacity = capacity
+        self.rng = rng
+        self.seen = 0
+        self.filled = 0
+        self.columns = None
+        self.position = np.empty( capacity, dtype=np.int64 )
+
+    def _store( self, slots, chunk, rows, positions ):
+        if self.columns is None:
+            # categories differ from chunk to chunk: stored as objects, restored in take()
+            self.dtypes = chunk.dtypes
+            self.columns = { c: np.empty( self.capacity, dtype=dtype if isinstance( dtype, np.dtype ) else object ) for c, dtype in self.dtypes.items() }
+        for c, values in self.columns.items():
+            incoming = chunk[c].to_numpy()[rows]
+            if not np.can_cast( incoming.dtype, values.dtype, casting='same_kind' ):
+                values = self.columns[c] = values.astype( np.result_type( values.dtype, incoming.dtype ) )
+            values[slots] = incoming
+        self.position[slots] = positions
+
+    def update( self, chunk, rows, positions ):
+        # rows not yet stored fill the free slots in order
+        free = min( self.capacity - self.filled, len( rows ) )
+        if free:
+            self._store( np.arange( self.filled, self.filled + free ), chunk, rows[:free], positions[:free] )
+            self.filled += free
+        rest = rows[free:]
+        if len( rest ):
+            # the i-th row of the class replaces a random slot with probability capacity / (i + 1)
+            seen = self.seen + free + np.arange( len( rest ) )
+            slot = self.rng.integers( 0, seen + 1 )
+            hit = slot < self.capacity
+            slot, rest, pos = slot[hit], rest[hit], positions[free:][hit]
+            # several hits on one slot: the last one wins, as in the sequential algorithm
+            _, last = np.unique( slot[::-1], return_index=True )
+            last = len( slot ) - 1 - last
+            self._store( slot[last], chunk, rest[last], pos[last] )
+        self.seen += len( rows )
+
+    def take( self, n, rng ):
+        keep = np.sort( rng.choice( self.filled, size=n, replace=False ) ) if n < self.filled else np.arange( self.filled )
+        frame = pd.DataFrame( { c: values[keep] for c, values in ( self.columns or {} ).items() } )
+        if self.columns is not None:
+            frame = frame.astype( self.dtypes.to_dict() )
+        return frame, self.position[keep]
+
+
+def _class_rng( seed, value ):
+    # one stream per class, so the sample does not depend on how classes interleave across chunks
+    key = int( value ) if isinstance( value, ( int, np.integer ) ) else zlib.crc32( str( value ).encode() )
+    return np.random.default_rng( [ seed, key & 0xFFFFFFFF ] )
+
+
+def _targets( seen, size, negative_ratio ):
+    # rows to keep per class: file proportions, or negative_ratio negatives per positive
+    if negative_ratio is None:
+        total = sum( seen.values() )
+        return { c: min( n, int( round( size * n / total ) ) ) for c, n in seen.items() }
+    positives = min( seen.get( 1, 0 ), int( round( size / ( 1 + negative_ratio ) ) ) )
+    targets = { c: min( n, int( round( positives * negative_ratio ) ) ) for c, n in seen.items() if c != 1 }
+    targets[1] = positives
+    return targets
+
+
+def stratified_sample( path, size, label='Response', negative_ratio=None, seed=42, chunksize=DEFAULT_CHUNKSIZE ):
+    """(sample, weights, report): sampled rows in file order, their sampling weights and per-class counts."""
+    rng = np.random.default_rng( seed )
+    reservoirs = {}
+    offset = 0
+    for chunk in read_csv( path, chunksize=chunksize ):
+        labels = chunk[label].to_numpy()
+        positions = np.arange( offset, offset + len( chunk ) )
+        offset += len( chunk )
+        for value in np.unique( labels ):
+            rows = np.flatnonzero( labels == value )
+            value = value.item()
+            if value not in reservoirs:
+                reservoirs[value] = _Reservoir( size, _class_rng( seed, value ) )
+            reservoirs[value].update( chunk, rows, positions[rows] )
+
+    seen = { c: r.seen for c, r in sorted( reservoirs.items() ) }
+    targets = _targets( seen, size, negative_ratio )
+    frames, positions, weights = [], [], []
+    for c, reservoir in sorted( reservoirs.items() ):
+        frame, position = reservoir.take( targets[c], rng )
+        frames.append( frame )
+        positions.append( position )
+        weights.append( np.full( len( frame ), seen[c] / len( frame ) if len( frame ) else 0.0 ) )
+
+    if not frames:
+        return pd.DataFrame(), np.empty( 0 ), { 'rows': 0, 'seed': seed, 'classes': {} }
+    order = np.argsort( np.concatenate( positions ), kind='stable' )
+    sample = pd.concat( frames, ignore_index=True ).iloc[order].reset_index( drop=True )
+    weights = np.concatenate( weights )[order]
+    report = { 'rows': offset, 'size': size, 'negative_ratio': negative_ratio, 'seed': seed,
+               'classes': { str( c ): { 'seen': seen[c], 'kept': targets[c], 'weight': seen[c] / targets[c] if targets[c] else None }
+                            for c in seen } }
+    return sample, weights, report
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Amostra estratificada (reservoir) de um CSV de treino em uma única passada' )
+    parser.add_argument( 'input' )
+    parser.add_argument( 'output' )
+    parser.add_argument( '--size', type=int, default=10000 )
+    parser.add_argument( '--label', default='Response' )
+    parser.add_argument( '--negative-ratio', type=float, default=None, help='negativos por positivo na amostra' )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--chunksize', type=int, default=DEFAULT_CHUNKSIZE )
+    args = parser.parse_args( argv )
+
+    sample, weights, report = stratified_sample( args.input, args.size, args.label, args.negative_ratio, args.seed, args.chunksize )
+    sample[WEIGHT_COLUMN] = weights
+    sample.to_csv( args.output, index=False )
+    with open( args.output + '.json', 'w' ) as f:
+        json.dump( report, f, indent=2 )
+    print( json.dumps( report['classes'] ) )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
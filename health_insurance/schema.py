@@ -0,0 +1,104 @@
+"""Column names and compact dtypes of the customer CSVs.
+
+Every CSV reader goes through `read_csv`, so a train.csv row costs a few
+dozen bytes instead of ~250 (int64/float64 numbers and Python strings).
+The integer-valued columns fit int8/int16. Region_Code,
+Policy_Sales_Channel and Annual_Premium arrive as "28.0"-style floats,
+and float32 holds all of them exactly (they are integers below 2**24).
+The three text columns become categories.
+
+    python -m health_insurance.schema data/train.csv   # bytes per row before/after
+"""
+import argparse
+import functools
+import sys
+
+# Raw API/CSV column names and their snake_case form used by the pipeline
+COLUMN_MAP = {
+    'id': 'id',
+    'Gender': 'gender',
+    'Age': 'age',
+    'Driving_License': 'driving_license',
+    'Region_Code': 'region_code',
+    'Previously_Insured': 'previously_insured',
+    'Vehicle_Age': 'vehicle_age',
+    'Vehicle_Damage': 'vehicle_damage',
+    'Annual_Premium': 'annual_premium',
+    'Policy_Sales_Channel': 'policy_sales_channel',
+    'Vintage': 'vintage',
+    'Response': 'response',
+}
+
+DTYPES = {
+    'id': 'int32',
+    'Gender': 'category',
+    'Age': 'int8',
+    'Driving_License': 'int8',
+    'Region_Code': 'float32',
+    'Previously_Insured': 'int8',
+    'Vehicle_Age': 'category',
+    'Vehicle_Damage': 'category',
+    'Annual_Premium': 'float32',
+    'Policy_Sales_Channel': 'float32',
+    'Vintage': 'int16',
+    'Response': 'int8',
+}
+
+# converted names of columns outside the schema kept at once; the keys come from client JSON
+EXTRA_NAMES_CACHED = 1024
+
+
+def snake_case( name ):
+    try:
+        return COLUMN_MAP[name]
+    except KeyError:
+        return _extra_name( name )
+
+
+@functools.lru_cache( maxsize=EXTRA_NAMES_CACHED )
+def _extra_name( name ):
+    # columns outside the schema (API extras); bounded, so unseen keys cannot grow the worker
+    import inflection
+    return inflection.underscore( name )
+
+
+def rename( df ):
+    """Rename raw columns to snake_case in place; returns `df`."""
+    df.columns = [ snake_case( c ) for c in df.columns ]
+    return df
+
+
+def read_csv( path, **kwargs ):
+    """pd.read_csv with the compact dtypes of the columns present; extra kwargs pass through (chunksize, nrows, ...)."""
+    import pandas as pd  # the serving path imports the schema without reading CSVs
+    return pd.read_csv( path, dtype=DTYPES, **kwargs )
+
+
+def bytes_per_row( df ):
+    return df.memory_usage( index=False, deep=True ) / max( len( df ), 1 )
+
+
+def memory_report( path, nrows=None ):
+    """Bytes per row of each column with pandas' default dtypes and with DTYPES."""
+    import pandas as pd
+    before = bytes_per_row( pd.read_csv( path, nrows=nrows ) )
+    after = bytes_per_row( read_csv( path, nrows=nrows ) )
+    report = pd.DataFrame( { 'default': before, 'compact': after } )
+    report.loc['total'] = report.sum()
+    return report
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Bytes por linha com os dtypes padrão do pandas e com o schema compacto' )
+    parser.add_argument( 'path' )
+    parser.add_argument( '--nrows', type=int, default=None )
+    args = parser.parse_args( argv )
+    report = memory_report( args.path, args.nrows )
+    print( report.round( 1 ).to_string() )
+    total = report.loc['total']
+    print( f"\n{total['default']:.1f} -> {total['compact']:.1f} bytes/linha ({total['default'] / total['compact']:.1f}x menor)" )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ScoreCache( object ):
+    """Bounded LRU (optionally TTL) cache of scores keyed on encoded feature rows.
+
+    Keys carry the pipeline version, so entries written by an old snapshot
+    can never be served for a new model or new encoders; `invalidate` also
+    drops them eagerly when the registry swaps snapshots.
+    """
+
+    def __init__( self, max_size=50000, ttl=None, max_batch=10000 ):
+        self.max_size = max_size
+        self.ttl = ttl
+        # larger batches skip the cache: mostly unique rows, lookups cost more than scoring
+        self.max_batch = max_batch
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.deduplicated = 0
+
+    def get_many( self, keys, rows=None ):
+        # rows: batch size before de-duplication, for the deduplicated_rows counter
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            if rows is not None:
+                self.deduplicated += rows - len( keys )
+            for key in keys:
+                entry = self._data.get( key )
+                if entry is not None and self.ttl is not None and entry[1] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append( None )
+                else:
+                    self._data.move_to_end( key )
+                    self.hits += 1
+                    found.append( entry[0] )
+        return found
+
+    def put_many( self, keys, scores ):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            for key, score in zip( keys, scores ):
+                self._data[key] = ( float( score ), expires )
+                self._data.move_to_end( key )
+            while len( self._data ) > self.max_size:
+                self._data.popitem( last=False )
+                self.evictions += 1
+
+    def invalidate( self ):
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats( self ):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len( self._data ),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'deduplicated_rows': self.deduplicated,
+            }
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+
+
+class Startup( object ):
+    """Loads the serving artifacts once per process and reports liveness vs readiness.
+
+    `load()` builds everything the handlers need and `warm_up()` runs one
+    prediction through it; the process is ready only after both succeed.
+    With `start( background=True )` they run in a daemon thread, so the
+    server can bind its port first. The thread is tied to the pid that
+    started it: a process forked before the load finished (gunicorn
+    preload) starts its own on the next `start()` call.
+    """
+
+    def __init__( self, load, warm_up ):
+        self.load = load
+        self.warm_up = warm_up
+        self.created = time.monotonic()
+        self.timings = {}
+        self.error = None
+        self._ready = threading.Event()
+        self._done = threading.Event()  # set on success and on failure
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def start( self, background=True ):
+        if self._ready.is_set():
+            return self
+        with self._lock:
+            if self._pid == os.getpid():
+                return self
+            self._pid = os.getpid()
+            self.error = None
+            self.timings = {}
+            self._done.clear()
+        if background:
+            threading.Thread( target=self._run, name='startup', daemon=True ).start()
+        else:
+            self._run( raise_errors=True )
+        return self
+
+    def _run( self, raise_errors=False ):
+        try:
+            start = time.monotonic()
+            self.load()
+            loaded = time.monotonic()
+            self.warm_up()
+            warm = time.monotonic()
+        except Exception as e:
+            self.error = f'{type( e ).__name__}: {e}'
+            print(f"Startup failed: {self.error}")
+            self._done.set()
+            if raise_errors:
+                raise
+            return
+        self.timings = { 'load_s': round( loaded - start, 4 ), 'warm_up_s': round( warm - loaded, 4 ),
+                         'ready_after_s': round( warm - self.created, 4 ) }
+        self._ready.set()
+        self._done.set()
+
+    @property
+    def ready( self ):
+        return self._ready.is_set()
+
+    @property
+    def failed( self ):
+        return self.error is not None
+
+    def wait( self, timeout=None ):
+        """True once ready; False after `timeout` seconds or as soon as the load failed."""
+        self._done.wait( timeout )
+        return self._ready.is_set()
+
+    def status( self ):
+        state = 'ready' if self.ready else 'failed' if self.failed else 'starting'
+        status = { 'status': state, 'pid': os.getpid(), 'uptime_s': round( time.monotonic() - self.created, 3 ) }
+        status.update( self.timings )
+        if self.error:
+            status['error'] = self.error
+        return status
@@ -0,0 +1,405 @@
+"""Seeded, vectorized generator of synthetic customers for scale tests.
+
+Rows have the schema of data/sample_train.csv (optionally with the `id`
+column of the original train.csv). The default marginals follow the
+public train.csv (381,109 rows): 12.26% responses, 54% male, region 28
+and channels 152/26/124 dominant, 46% previously insured, vehicle damage
+almost only among the uninsured, a young (20-30) and an older age mode
+with the vehicle age following it, 17% of premiums at the 2630 floor.
+The response is drawn from a logistic model whose intercept is solved
+so the expected rate matches `response_rate`.
+
+Rows come in blocks of BLOCK_ROWS, each with its own generator seeded
+by (seed, block index). The output therefore depends on the seed and the
+marginals only, not on the chunk size, and a chunk is the concatenation
+of whole blocks: memory is bounded by `chunk_rows`. CSV text is built
+with numpy (cached cell tables per column and one NUL-compaction per
+chunk), no per-row Python.
+
+    python -m health_insurance.synthetic data/train.csv --rows 100000000 --seed 42
+    python -m health_insurance.synthetic data/train.parquet --rows 10000000   # needs pyarrow
+"""
+import argparse
+import collections
+import copy
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+COLUMNS = [ 'Gender', 'Age', 'Driving_License', 'Region_Code', 'Previously_Insured', 'Vehicle_Age', 'Vehicle_Damage',
+            'Annual_Premium', 'Policy_Sales_Channel', 'Vintage', 'Response' ]
+
+# category labels, in code order
+LABELS = {
+    'Gender': ( 'Male', 'Female' ),
+    'Vehicle_Age': ( '< 1 Year', '1-2 Year', '> 2 Years' ),
+    'Vehicle_Damage': ( 'Yes', 'No' ),
+}
+# written with a trailing ".0", like the original files
+FLOAT_TEXT = ( 'Region_Code', 'Annual_Premium', 'Policy_Sales_Channel' )
+
+BLOCK_ROWS = 1 << 16
+DEFAULT_CHUNK_ROWS = 1 << 20
+CALIBRATION_ROWS = 1 << 18
+
+DEFAULT_MARGINALS = {
+    'response_rate': 0.1226,
+    'gender': { 'Male': 0.5408, 'Female': 0.4592 },
+    # young_share of the customers uniform in [young_min, young_max], the rest normal, all clipped to [min, max]
+    'age': { 'young_share': 0.40, 'young_min': 20, 'young_max': 30, 'mean': 46, 'std': 12, 'min': 20, 'max': 85 },
+    'driving_license': 0.9979,
+    # listed codes with their share, the remaining share spread evenly over the other codes of the range
+    'region_code': { 'range': [ 0, 52 ], 'shares': { '28': 0.279, '8': 0.089, '46': 0.052, '41': 0.048, '15': 0.035, '30': 0.032,
+                                                     '29': 0.029, '50': 0.027, '3': 0.024, '11': 0.024 } },
+    'previously_insured': 0.4582,
+    'vehicle_age': { 'young': { '< 1 Year': 0.80, '1-2 Year': 0.19, '> 2 Years': 0.01 },
+                     'older': { '< 1 Year': 0.18, '1-2 Year': 0.75, '> 2 Years': 0.07 } },
+    # P(Vehicle_Damage = Yes) given Previously_Insured
+    'vehicle_damage': { 'insured': 0.02, 'not_insured': 0.915 },
+    # floor_share at the floor, the rest lognormal with this mean and log-std, clipped to [floor, max]
+    'annual_premium': { 'floor': 2630, 'floor_share': 0.17, 'mean': 36300, 'sigma': 0.33, 'max': 540165 },
+    'policy_sales_channel': { 'range': [ 1, 163 ], 'shares': { '152': 0.354, '26': 0.209, '124': 0.194, '160': 0.057, '156': 0.028,
+                                                               '122': 0.026, '157': 0.017, '154': 0.016, '151': 0.010, '163': 0.008 } },
+    'vintage': { 'min': 10, 'max': 299 },
+}
+
+# logit of the response, without the intercept solved from response_rate
+RESPONSE_WEIGHTS = { 'previously_insured': -4.0, 'vehicle_damage': 2.2, 'age_30_60': 0.6, 'vehicle_over_1_year': 0.3,
+                     'channel_152': -1.0, 'region_28': 0.3 }
+
+
+def resolve( marginals=None ):
+    """DEFAULT_MARGINALS with the top-level keys of `marginals` replaced."""
+    resolved = copy.deepcopy( DEFAULT_MARGINALS )
+    resolved.update( marginals or {} )
+    return resolved
+
+
+def _cumulative( shares ):
+    p = np.asarray( shares, dtype=np.float64 )
+    if ( p < 0 ).any() or p.sum() <= 0:
+        raise ValueError( f'invalid shares {shares}' )
+    return np.cumsum( p / p.sum() )[:-1]
+
+
+def _spread( spec ):
+    # (values, cumulative probabilities) of a code range with a few explicit shares
+    lo, hi = spec['range']
+    values = np.arange( lo, hi + 1 )
+    shares = np.zeros( len( values ) )
+    listed = { int( float( code ) ): share for code, share in spec['shares'].items() }
+    for code, share in listed.items():
+        shares[code - lo] = share
+    rest = [ i for i, v in enumerate( values ) if v not in listed ]
+    if rest:
+        shares[rest] = max( 1.0 - sum( listed.values() ), 0.0 ) / len( rest )
+    return values, _cumulative( shares )
+
+
+def _choose( rng, n, cumulative ):
+    return np.searchsorted( cumulative, rng.random( n ), side='right' )
+
+
+class _Tables( object ):
+    # marginals turned into arrays once per generator
+
+    def __init__( self, m ):
+        self.m = m
+        self.male = m['gender']['Male'] / ( m['gender']['Male'] + m['gender']['Female'] )
+        self.region_values, self.region_cum = _spread( m['region_code'] )
+        self.channel_values, self.channel_cum = _spread( m['policy_sales_channel'] )
+        self.vehicle_young = _cumulative( [ m['vehicle_age']['young'].get( label, 0 ) for label in LABELS['Vehicle_Age'] ] )
+        self.vehicle_older = _cumulative( [ m['vehicle_age']['older'].get( label, 0 ) for label in LABELS['Vehicle_Age'] ] )
+        premium = m['annual_premium']
+        self.premium_mu = np.log( premium['mean'] ) - premium['sigma'] ** 2 / 2
+
+
+def _features( rng, n, t ):
+    """Every column but Response, as compact integer arrays (categories as codes)."""
+    m = t.m
+    age_spec = m['age']
+    young = rng.random( n ) < age_spec['young_share']
+    older = np.rint( rng.normal( age_spec['mean'], age_spec['std'], n ) )
+    age = np.where( young, rng.integers( age_spec['young_min'], age_spec['young_max'] + 1, n ), older )
+    insured = rng.random( n ) < m['previously_insured']
+    damage_yes = rng.random( n ) < np.where( insured, m['vehicle_damage']['insured'], m['vehicle_damage']['not_insured'] )
+
+    premium_spec = m['annual_premium']
+    premium = np.rint( rng.lognormal( t.premium_mu, premium_spec['sigma'], n ) ).clip( premium_spec['floor'], premium_spec['max'] )
+    premium[rng.random( n ) < premium_spec['floor_share']] = premium_spec['floor']
+
+    return {
+        'Gender': ( rng.random( n ) >= t.male ).astype( np.int8 ),
+        'Age': age.clip( age_spec['min'], age_spec['max'] ).astype( np.int8 ),
+        'Driving_License': ( rng.random( n ) < m['driving_license'] ).astype( np.int8 ),
+        'Region_Code': t.region_values[_choose( rng, n, t.region_cum )].astype( np.int8 ),
+        'Previously_Insured': insured.astype( np.int8 ),
+        'Vehicle_Age': np.where( young, _choose( rng, n, t.vehicle_young ), _choose( rng, n, t.vehicle_older ) ).astype( np.int8 ),
+        'Vehicle_Damage': ( ~damage_yes ).astype( np.int8 ),
+        'Annual_Premium': premium.astype( np.int32 ),
+        'Policy_Sales_Channel': t.channel_values[_choose( rng, n, t.channel_cum )].astype( np.int16 ),
+        'Vintage': rng.integers( m['vintage']['min'], m['vintage']['max'] + 1, n ).astype( np.int16 ),
+    }
+
+
+def _logit( columns ):
+    w = RESPONSE_WEIGHTS
+    age = columns['Age']
+    return ( w['previously_insured'] * columns['Previously_Insured']
+             + w['vehicle_damage'] * ( columns['Vehicle_Damage'] == 0 )
+             + w['age_30_60'] * ( ( age >= 30 ) & ( age <= 60 ) )
+             + w['vehicle_over_1_year'] * ( columns['Vehicle_Age'] > 0 )
+             + w['channel_152'] * ( columns['Policy_Sales_Channel'] == 152 )
+             + w['region_28'] * ( columns['Region_Code'] == 28 ) )
+
+
+def response_intercept( marginals, rows=CALIBRATION_ROWS ):
+    """Intercept whose expected response rate over a fixed calibration sample is `response_rate`."""
+    rate = marginals['response_rate']
+    if not 0 < rate < 1:
+        raise ValueError( f'response_rate must be in (0, 1), got {rate}' )
+    logit = _logit( _features( np.random.default_rng( 0 ), rows, _Tables( marginals ) ) )
+    lo, hi = -30.0, 30.0
+    for _ in range( 60 ):
+        mid = ( lo + hi ) / 2
+        if np.mean( 1 / ( 1 + np.exp( -( logit + mid ) ) ) ) < rate:
+            lo = mid
+        else:
+            hi = mid
+    return ( lo + hi ) / 2
+
+
+def _block( seed, index, n, tables, intercept ):
+    rng = np.random.default_rng( [ seed, index ] )
+    columns = _features( rng, n, tables )
+    p = 1 / ( 1 + np.exp( -( _logit( columns ) + intercept ) ) )
+    columns['Response'] = ( rng.random( n ) < p ).astype( np.int8 )
+    return columns
+
+
+def _chunk_blocks( n_rows, chunk_rows ):
+    # [first, stop) block ranges, whole blocks per chunk
+    n_blocks = -( -n_rows // BLOCK_ROWS )
+    per_chunk = max( 1, chunk_rows // BLOCK_ROWS )
+    return [ ( first, min( first + per_chunk, n_blocks ) ) for first in range( 0, n_blocks, per_chunk ) ]
+
+
+def _generate( seed, blocks, n_rows, tables, intercept ):
+    parts = [ _block( seed, i, min( BLOCK_ROWS, n_rows - i * BLOCK_ROWS ), tables, intercept ) for i in range( *blocks ) ]
+    return { name: np.concatenate( [ part[name] for part in parts ] ) for name in COLUMNS }
+
+
+def iter_chunks( n_rows, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, marginals=None ):
+    """Yield dicts of column arrays (categories as codes into LABELS), whole blocks per chunk."""
+    m = resolve( marginals )
+    tables, intercept = _Tables( m ), response_intercept( m )
+    for blocks in _chunk_blocks( n_rows, chunk_rows ):
+        yield _generate( seed, blocks, n_rows, tables, intercept )
+
+
+def _to_frame( columns, response=True, categorical=False ):
+    import pandas as pd
+    from health_insurance.schema import DTYPES
+    data = {}
+    for name in COLUMNS:
+        if name == 'Response' and not response:
+            continue
+        values = columns[name]
+        if name in LABELS:
+            if categorical:
+                # sorted categories, as pd.read_csv infers them
+                categories = sorted( LABELS[name] )
+                recode = np.array( [ categories.index( label ) for label in LABELS[name] ], dtype=np.int8 )
+                data[name] = pd.Categorical.from_codes( recode[values], categories )
+            else:
+                data[name] = np.array( LABELS[name], dtype=object )[values]
+        elif categorical:
+            data[name] = values.astype( DTYPES[name] )
+        else:
+            # the dtypes pd.read_csv infers from the CSV
+            data[name] = values.astype( np.float64 if name in FLOAT_TEXT else np.int64 )
+    return pd.DataFrame( data )
+
+
+def generate_frame( n_rows, seed=42, marginals=None, response=True, categorical=False ):
+    """
+    DataFrame of `n_rows` synthetic customers with raw column names. String columns hold
+    Python strings and numbers int64/float64, like pd.read_csv of the CSV; with
+    categorical=True the compact schema.DTYPES instead (like schema.read_csv).
+    """
+    frames = [ _to_frame( chunk, response, categorical ) for chunk in iter_chunks( n_rows, seed, marginals=marginals ) ]
+    if not frames:
+        # no rows: the same columns and dtypes, empty
+        return _to_frame( { name: np.zeros( 0, dtype=np.int64 ) for name in COLUMNS }, response, categorical )
+    if len( frames ) == 1:
+        return frames[0]
+    import pandas as pd
+    return pd.concat( frames, ignore_index=True )
+
+
+def _ascii( values, width ):
+    # right-aligned ASCII digits, padded on the left with NUL bytes
+    out = np.zeros( ( len( values ), width ), dtype=np.uint8 )
+    for k in range( width ):
+        out[:, width - 1 - k] = np.where( ( values >= 10 ** k ) | ( k == 0 ), values // 10 ** k % 10 + 48, 0 )
+    return out
+
+
+def _with_suffix( cells, suffix ):
+    if not suffix:
+        return np.ascontiguousarray( cells )
+    return np.hstack( [ cells, np.tile( np.frombuffer( suffix, dtype=np.uint8 ), ( len( cells ), 1 ) ) ] )
+
+
+def _as_void( cells ):
+    # one opaque item per row, so a gather or a field assignment moves whole cells
+    return cells.view( np.dtype( ( np.void, cells.shape[1] ) ) ).ravel()
+
+
+@functools.lru_cache( maxsize=None )
+def _digit_table( size, suffix ):
+    values = np.arange( size )
+    return _as_void( _with_suffix( _ascii( values, len( str( size - 1 ) ) ), suffix ) )
+
+
+@functools.lru_cache( maxsize=None )
+def _label_table( labels, suffix ):
+    cells = np.zeros( ( len( labels ), max( len( label ) for label in labels ) ), dtype=np.uint8 )
+    for i, label in enumerate( labels ):
+        cells[i, :len( label )] = np.frombuffer( label.encode(), dtype=np.uint8 )
+    return _as_void( _with_suffix( cells, suffix ) )
+
+
+def _integer_cells( values, suffix ):
+    top = int( values.max() ) if len( values ) else 0
+    if top < ( 1 << 20 ):
+        # one gather from a cached table
+        return _digit_table( 1 << max( top.bit_length(), 4 ), suffix )[values]
+    values = values.astype( np.int64 )
+    return _as_void( _with_suffix( _ascii( values, len( str( top ) ) ), suffix ) )
+
+
+def csv_chunk( columns, first_id=None ):
+    """CSV text of one chunk (no header); with `first_id` an id column numbered from it."""
+    n = len( columns['Age'] )
+    # each field a NUL-padded cell with its separator, so a row is one fixed-width record until the NULs are dropped
+    fields = [ _integer_cells( np.arange( first_id, first_id + n ), b',' ) ] if first_id is not None else []
+    for name in COLUMNS:
+        suffix = ( b'.0' if name in FLOAT_TEXT else b'' ) + ( b'\n' if name == COLUMNS[-1] else b',' )
+        values = columns[name]
+        fields.append( _label_table( LABELS[name], suffix )[values] if name in LABELS else _integer_cells( values, suffix ) )
+
+    rows = np.empty( n, dtype=[ ( f'f{i}', cells.dtype ) for i, cells in enumerate( fields ) ] )
+    for i, cells in enumerate( fields ):
+        rows[f'f{i}'] = cells
+    text = rows.view( np.uint8 )
+    return text[text != 0].tobytes()
+
+
+def _csv_task( task ):
+    # one chunk generated and formatted in a worker; only the text travels back
+    seed, blocks, n_rows, marginals, intercept, with_id = task
+    columns = _generate( seed, blocks, n_rows, _Tables( marginals ), intercept )
+    return csv_chunk( columns, blocks[0] * BLOCK_ROWS + 1 if with_id else None )
+
+
+def write_csv( path, n_rows, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, marginals=None, with_id=False, workers=1 ):
+    """
+    Write `n_rows` customers to `path` chunk by chunk; returns the rows written. With workers > 1
+    chunks are generated and formatted in forked processes, at most 2 * workers in flight, and
+    written in order: the file is the same for any number of workers.
+    """
+    m = resolve( marginals )
+    intercept = response_intercept( m )
+    tasks = [ ( seed, blocks, n_rows, m, intercept, with_id ) for blocks in _chunk_blocks( n_rows, chunk_rows ) ]
+    with open( path, 'wb' ) as f:
+        f.write( ( ','.join( ( [ 'id' ] if with_id else [] ) + COLUMNS ) + '\n' ).encode() )
+        if workers <= 1 or len( tasks ) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            for task in tasks:
+                f.write( _csv_task( task ) )
+            return n_rows
+        with multiprocessing.get_context( 'fork' ).Pool( workers ) as pool:
+            pending = collections.deque()
+            for task in tasks:
+                pending.append( pool.apply_async( _csv_task, ( task, ) ) )
+                if len( pending ) >= 2 * workers:
+                    f.write( pending.popleft().get() )
+            while pending:
+                f.write( pending.popleft().get() )
+    return n_rows
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def write_parquet( path, n_rows, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, marginals=None, with_id=False ):
+    """Columnar output, one row group per chunk: categories as dictionaries, numbers with schema.DTYPES."""
+    pa = _pyarrow()
+    if pa is None:
+        raise ImportError( 'Parquet output needs pyarrow installed' )
+    from health_insurance.schema import DTYPES
+    written, writer = 0, None
+    try:
+        for chunk in iter_chunks( n_rows, seed, chunk_rows, marginals ):
+            n = len( chunk['Age'] )
+            arrays = { 'id': pa.array( np.arange( written + 1, written + n + 1, dtype=np.int32 ) ) } if with_id else {}
+            for name in COLUMNS:
+                if name in LABELS:
+                    arrays[name] = pa.DictionaryArray.from_arrays( chunk[name], list( LABELS[name] ) )
+                else:
+                    arrays[name] = pa.array( chunk[name].astype( DTYPES[name] ) )
+            table = pa.table( arrays )
+            if writer is None:
+                writer = pa.parquet.ParquetWriter( path, table.schema )
+            writer.write_table( table )
+            written += n
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def main( argv=None ):
+    parser = argparse.ArgumentParser( description='Gera clientes sintéticos com o schema do train.csv (CSV ou Parquet)' )
+    parser.add_argument( 'path', help='arquivo de saída; .parquet grava em formato colunar' )
+    parser.add_argument( '--rows', type=int, default=1000000 )
+    parser.add_argument( '--seed', type=int, default=42 )
+    parser.add_argument( '--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='linhas geradas por vez (limita a memória)' )
+    parser.add_argument( '--id', action='store_true', help='inclui a coluna id, como no train.csv original' )
+    parser.add_argument( '--workers', type=int, default=1, help='processos gerando e formatando blocos (só CSV)' )
+    parser.add_argument( '--response-rate', type=float, default=None )
+    parser.add_argument( '--marginals', default=None, help='JSON com chaves de DEFAULT_MARGINALS a substituir' )
+    args = parser.parse_args( argv )
+
+    marginals = {}
+    if args.marginals:
+        with open( args.marginals ) as f:
+            marginals = json.load( f )
+    if args.response_rate is not None:
+        marginals['response_rate'] = args.response_rate
+
+    start = time.perf_counter()
+    if args.path.endswith( '.parquet' ):
+        rows = write_parquet( args.path, args.rows, args.seed, args.chunk_rows, marginals, args.id )
+    else:
+        rows = write_csv( args.path, args.rows, args.seed, args.chunk_rows, marginals, args.id, args.workers )
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize( args.path )
+    print( f'{rows:,} linhas em {args.path} ({size / 2**20:,.1f} MB) em {elapsed:.1f}s: '
+           f'{rows / elapsed:,.0f} linhas/s, {size / 2**20 / elapsed:,.0f} MB/s' )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
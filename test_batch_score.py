@@ -0,0 +1,83 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from health_insurance import synthetic
+from health_insurance.batch_score import batch_score, checkpoint_path, iter_chunks, make_scorer
+from health_insurance.parallel import parallel_score_frame
+from health_insurance.registry import PipelineRegistry
+
+DATA = os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' )
+
+
+def test_batch_score_matches_engine( artifacts_home, tmp_path ):
+    output = str( tmp_path / 'scores.csv' )
+    rows = batch_score( DATA, output, chunk_size=3, home_path=artifacts_home, log=None )
+
+    df = pd.read_csv( DATA )
+    result = pd.read_csv( output )
+    assert rows == len( df ) == len( result )
+    assert list( result.columns ) == list( df.columns ) + [ 'score' ]
+    expected = PipelineRegistry( home_path=artifacts_home ).current().engine.score_frame( df )
+    np.testing.assert_allclose( result['score'], expected, rtol=1e-9 )
+    assert not os.path.exists( checkpoint_path( output ) )
+
+
+def test_batch_score_resumes_after_crash( artifacts_home, tmp_path ):
+    output = str( tmp_path / 'scores.csv' )
+    score = make_scorer( PipelineRegistry( home_path=artifacts_home ).current() )
+    calls = []
+
+    def crashing( chunk ):
+        calls.append( len( chunk ) )
+        if len( calls ) == 3:
+            raise RuntimeError( 'worker killed' )
+        return score( chunk )
+
+    with pytest.raises( RuntimeError ):
+        batch_score( DATA, output, chunk_size=3, score_chunk=crashing, log=None )
+    assert os.path.exists( checkpoint_path( output ) )
+    # garbage from the interrupted chunk is discarded on resume
+    with open( output, 'a' ) as f:
+        f.write( 'partial,row' )
+
+    resumed = []
+    batch_score( DATA, output, chunk_size=3, score_chunk=lambda c: resumed.append( len( c ) ) or score( c ), log=None )
+    assert sum( resumed ) == 4
+
+    reference = str( tmp_path / 'reference.csv' )
+    batch_score( DATA, reference, chunk_size=3, score_chunk=score, log=None )
+    with open( output ) as a, open( reference ) as b:
+        assert a.read() == b.read()
+
+
+def test_resume_far_into_the_file_keeps_memory_flat( tmp_path ):
+    path = str( tmp_path / 'input.csv' )
+    synthetic.write_csv( path, 500000, seed=3, with_id=True )
+    tracemalloc.start()
+    try:
+        chunk = next( iter( iter_chunks( path, 1000, skip_rows=499000 ) ) )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert chunk['id'].iloc[0] == 499001 and len( chunk ) == 1000
+    # a set of the 499k skipped row numbers alone would take ~30 MB
+    assert peak < 5 * 2**20
+
+
+def test_parallel_scoring_keeps_input_order( artifacts_home, tmp_path ):
+    score = make_scorer( PipelineRegistry( home_path=artifacts_home ).current() )
+    df = pd.concat( [ pd.read_csv( DATA ) ] * 5, ignore_index=True )
+    df['Age'] = np.arange( len( df ) ) + 20
+
+    np.testing.assert_allclose( parallel_score_frame( score, df, workers=3 ), score( df ) )
+
+    serial, parallel = str( tmp_path / 'serial.csv' ), str( tmp_path / 'parallel.csv' )
+    df.to_csv( str( tmp_path / 'input.csv' ), index=False )
+    batch_score( str( tmp_path / 'input.csv' ), serial, chunk_size=7, score_chunk=score, log=None )
+    batch_score( str( tmp_path / 'input.csv' ), parallel, chunk_size=7, score_chunk=score, workers=3, log=None )
+    with open( serial ) as a, open( parallel ) as b:
+        assert a.read() == b.read()
@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from health_insurance import synthetic
+from health_insurance.HealthInsurance import FEATURE_COLUMNS
+from health_insurance.registry import PipelineRegistry
+from health_insurance.budget import MB, Budget, StageMeter, bytes_per_node, fit_budgeted_forest, forest_nodes, plan, prune_to_budget
+from train_model import train_model
+
+
+def _data( n_rows=4000, seed=0 ):
+    rng = np.random.default_rng( seed )
+    X = np.column_stack( [ rng.integers( 20, 86, n_rows ), rng.normal( 30000, 10000, n_rows ), rng.integers( 0, 2, n_rows ),
+                           rng.integers( 0, 2, n_rows ), rng.integers( 10, 300, n_rows ) ] ).astype( float )
+    logit = -2 + 1.5 * X[:, 3] - 3 * X[:, 2] + 0.02 * ( X[:, 0] - 40 )
+    y = ( rng.random( n_rows ) < 1 / ( 1 + np.exp( -logit ) ) ).astype( int )
+    return X, y
+
+
+def test_budgeted_forest_fits_the_model_budget():
+    X, y = _data()
+    budget = Budget( max_model_mb=0.5, tree_counts=( 20, 5 ), n_jobs=1 )
+    meter = StageMeter()
+    forest, report = fit_budgeted_forest( X[:3000], y[:3000], X[3000:], y[3000:], budget, meter )
+
+    chosen = report['candidates'][report['chosen']]
+    assert chosen['within_budget'] and forest.n_estimators == chosen['n_estimators']
+    assert forest_nodes( forest ) * bytes_per_node() <= 0.5 * MB
+    assert all( e.tree_.max_depth <= chosen['max_depth'] for e in forest.estimators_ )
+    assert { 'accuracy', 'recall', 'roc_auc' } <= set( chosen )
+    assert [ s['stage'] for s in meter.stages ] == [ 'fit_20', 'fit_5' ]
+
+
+def test_plan_trades_parallelism_then_nodes_for_ram():
+    node_bytes = bytes_per_node()
+    loose = plan( Budget( max_model_mb=100, n_jobs=4 ), 100, 300000, 0, node_bytes )
+    tight = plan( Budget( max_rss_mb=60, max_model_mb=100, n_jobs=4 ), 100, 300000, 0, node_bytes )
+    assert tight['n_jobs'] <= loose['n_jobs'] and tight['max_leaf_nodes'] < loose['max_leaf_nodes']
+    assert tight['max_samples'] < 1
+    assert isinstance( plan( Budget( max_rss_mb=300 ), 100, 300000, 400, node_bytes ), str )
+
+
+def test_pruning_drops_trees_until_the_forest_fits():
+    X, y = _data( 2000 )
+    forest = RandomForestClassifier( n_estimators=10, random_state=0 ).fit( X, y )
+    limit = forest_nodes( forest ) * bytes_per_node() / 3
+    assert prune_to_budget( forest, limit, X, y, bytes_per_node() ) > 0
+    assert forest_nodes( forest ) * bytes_per_node() <= limit and len( forest.estimators_ ) == forest.n_estimators
+    forest.predict_proba( X )
+
+
+
+def test_report_describes_the_served_model( tmp_path, monkeypatch ):
+    monkeypatch.chdir( tmp_path )
+    os.makedirs( 'data' )
+    synthetic.write_csv( 'data/train.csv', 20000, seed=4, with_id=True )
+    train_model( Budget( max_model_mb=1, tree_counts=( 20, 5 ), n_jobs=1 ) )
+    with open( 'model/training_report.json' ) as f:
+        report = json.load( f )
+    assert report['features'] == FEATURE_COLUMNS
+
+    # the validation split of train_model, scored by the API's engine
+    df = synthetic.generate_frame( 20000, seed=4 )
+    _, X_val, _, y_val = train_test_split( df.drop( columns='Response' ), df['Response'], test_size=0.2, random_state=42 )
+    served = PipelineRegistry( home_path=str( tmp_path ) ).current().engine.score_frame( X_val )
+    assert report['validation_rows'] == len( X_val )
+    assert abs( roc_auc_score( y_val, served ) - report['candidates'][report['chosen']]['roc_auc'] ) < 1e-9
@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+
+import pandas as pd
+
+from health_insurance.build_cache import BuildCache
+from train_lightweight_model import train_lightweight_model
+
+SAMPLE = os.path.join( os.path.dirname( __file__ ), 'data', 'sample_train.csv' )
+
+
+def test_stages_are_lazy_keyed_and_pruned( tmp_path ):
+    calls = []
+
+    def build( cache, data ):
+        parse = cache.stage( 'parse', { 'data': data }, lambda: calls.append( 'parse' ) or [ data ] )
+        model = cache.stage( 'model', { 'parse': parse.key, 'C': 1.0 }, lambda: calls.append( 'model' ) or parse.value * 2 )
+        return parse, model
+
+    root = str( tmp_path / 'cache' )
+    first = BuildCache( root=root, enabled=True, keep=2 )
+    assert build( first, 'a' )[1].value == [ 'a', 'a' ] and sorted( calls ) == [ 'model', 'parse' ]
+
+    second = BuildCache( root=root, enabled=True, keep=2 )
+    parse, model = build( second, 'a' )
+    assert model.value == [ 'a', 'a' ] and len( calls ) == 2
+    # the model hit never reads its input back
+    assert [ s['status'] for s in second.manifest()['stages'] ] == [ 'unused', 'hit' ]
+
+    for data in ( 'b', 'c' ):
+        assert build( BuildCache( root=root, enabled=True, keep=2 ), data )[1].value == [ data, data ]
+    assert len( os.listdir( os.path.join( root, 'model' ) ) ) == 2
+
+    off = BuildCache( root=str( tmp_path / 'off' ), enabled=False )
+    build( off, 'c' )[1].value
+    assert sorted( calls[-2:] ) == [ 'model', 'parse' ] and not os.path.exists( off.root )
+
+
+def test_rebuild_reuses_unchanged_stages( tmp_path, monkeypatch ):
+    monkeypatch.chdir( tmp_path )
+    os.makedirs( 'data' )
+    shutil.copy( SAMPLE, 'data/sample_train.csv' )
+
+    def stages():
+        with open( 'model/build_manifest.json' ) as f:
+            return { s['stage']: s['status'] for s in json.load( f )['stages'] }
+
+    train_lightweight_model()
+    assert set( stages().values() ) == { 'miss' }
+    with open( 'model/model_health_insurance.pkl', 'rb' ) as f:
+        trained = f.read()
+
+    # a clean build (outputs deleted) restores them from the cache without retraining
+    shutil.rmtree( 'model' )
+    train_lightweight_model()
+    assert stages() == { 'parse': 'unused', 'encoders': 'hit', 'scalers': 'hit', 'model': 'hit' }
+    with open( 'model/model_health_insurance.pkl', 'rb' ) as f:
+        assert f.read() == trained
+
+    # the old model does not survive a data change
+    df = pd.read_csv( 'data/sample_train.csv' )
+    df.iloc[: len( df ) // 2].to_csv( 'data/sample_train.csv', index=False )
+    train_lightweight_model()
+    assert set( stages().values() ) == { 'miss' }
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import write_artifacts
+from health_insurance.bundle import BUNDLE_FILE, BundleError, LogisticModel, export_bundle, load_bundle, read_bundle
+from health_insurance.registry import PipelineRegistry
+from test_health_insurance_optimized import _pandas_scores, _raw_batch
+
+
+def test_bundle_scores_match_the_pickles( artifacts_home ):
+    path = export_bundle( artifacts_home )
+    pickled = PipelineRegistry( home_path=artifacts_home, bundle_file=None ).current()
+    bundled = PipelineRegistry( home_path=artifacts_home ).current()
+
+    assert isinstance( bundled.model, LogisticModel )
+    assert isinstance( read_bundle( path )[1]['model.coef'].base, np.memmap )
+
+    df_raw = _raw_batch()
+    expected = _pandas_scores( pickled.pipeline, pickled.model, df_raw )
+    np.testing.assert_allclose( _pandas_scores( bundled.pipeline, bundled.model, df_raw ), expected, rtol=1e-12 )
+    np.testing.assert_allclose( bundled.engine.score_frame( df_raw ), expected, rtol=1e-9 )
+
+
+def test_corrupt_or_stale_bundles_are_not_served( artifacts_home ):
+    path = export_bundle( artifacts_home )
+    with open( path, 'r+b' ) as f:
+        f.seek( -8, os.SEEK_END )
+        f.write( b'\xff' * 8 )
+    with pytest.raises( BundleError ):
+        load_bundle( path )
+
+    # retrained model without a new export: the pickles win
+    export_bundle( artifacts_home )
+    stamp = os.path.getmtime( path ) + 10
+    model_file = os.path.join( artifacts_home, 'model/model_health_insurance.pkl' )
+    os.utime( model_file, ( stamp, stamp ) )
+    assert not isinstance( PipelineRegistry( home_path=artifacts_home ).current().model, LogisticModel )
+
+
+def test_refitted_parameters_outdate_the_bundle( artifacts_home, caplog ):
+    # the encoders CLI rewrites parameter/*.pkl and leaves model/ and the bundle alone
+    path = export_bundle( artifacts_home )
+    stamp = os.path.getmtime( path ) + 10
+    os.utime( os.path.join( artifacts_home, 'parameter/region_code_encoder.pkl' ), ( stamp, stamp ) )
+
+    with caplog.at_level( 'WARNING', logger='health_insurance.registry' ):
+        snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    assert not isinstance( snapshot.model, LogisticModel )
+    assert 'parameter/region_code_encoder.pkl' in caplog.text
+
+
+def test_only_supported_artifacts_are_bundled( tmp_path ):
+    from sklearn.dummy import DummyClassifier
+    home = str( tmp_path )
+    write_artifacts( home, model=DummyClassifier().fit( [ [0], [1] ], [ 0, 1 ] ) )
+    with pytest.raises( BundleError ):
+        export_bundle( home )
+    assert not os.path.exists( os.path.join( home, BUNDLE_FILE ) )
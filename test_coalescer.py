@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from health_insurance.coalescer import MicroBatcher
+
+
+def test_concurrent_calls_are_coalesced():
+    calls = []
+
+    def score_batch( records ):
+        calls.append( len( records ) )
+        return [ r * 10 for r in records ]
+
+    batcher = MicroBatcher( score_batch, window=0.05, max_batch=8 )
+    results = {}
+    barrier = threading.Barrier( 16 )
+
+    def caller( i ):
+        barrier.wait()
+        results[i] = batcher.score( i, timeout=5 )
+
+    threads = [ threading.Thread( target=caller, args=( i, ) ) for i in range( 16 ) ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == { i: i * 10 for i in range( 16 ) }
+    assert sum( calls ) == 16 and len( calls ) < 16 and max( calls ) <= 8
+    stats = batcher.stats()
+    assert stats['requests'] == 16 and stats['batches'] == len( calls )
+    assert stats['queue_delay_ms']['count'] == 16
+
+
+def test_errors_reach_every_caller():
+    def score_batch( records ):
+        raise ValueError( 'model unavailable' )
+
+    batcher = MicroBatcher( score_batch, window=0.001 )
+    with pytest.raises( ValueError ):
+        batcher.score( {}, timeout=5 )
+    assert batcher.stats()['errors'] == 1
+
+
+def test_app_routes_single_records_through_batcher( app_module, monkeypatch ):
+    record = { 'Gender': 'Male', 'Age': 44, 'Driving_License': 1, 'Region_Code': 28.0, 'Previously_Insured': 0,
+               'Vehicle_Age': '< 1 Year', 'Vehicle_Damage': 'Yes', 'Annual_Premium': 40454.0,
+               'Policy_Sales_Channel': 26.0, 'Vintage': 217 }
+    batcher = MicroBatcher( lambda records: app_module.score_micro_batch( app_module.registry.current(), records ) )
+    monkeypatch.setattr( app_module, 'batcher', batcher )
+    client = app_module.app.test_client()
+
+    row = client.post( '/healthinsurance/predict', json=record ).get_json()[0]
+    assert row['score'] == pytest.approx( app_module.registry.current().engine.predict_one( record )['score'] )
+    assert client.get( '/healthinsurance/coalescer' ).get_json()['requests'] == 1
+
+
+def test_a_failing_record_only_fails_its_own_caller():
+    def score_batch( records ):
+        if any( r is None for r in records ):
+            raise KeyError( 'age' )
+        return [ r * 10 for r in records ]
+
+    batcher = MicroBatcher( score_batch, window=0.05 )
+    futures = [ batcher.submit( r ) for r in ( 1, None, 3 ) ]
+
+    assert futures[0].result( timeout=5 ) == 10 and futures[2].result( timeout=5 ) == 30
+    with pytest.raises( KeyError ):
+        futures[1].result( timeout=5 )
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['split_batches'] == 1 and stats['errors'] == 1
+
+
+def test_valid_and_invalid_callers_in_one_window( app_module ):
+    record = { 'Gender': 'Male', 'Age': 44, 'Driving_License': 1, 'Region_Code': 28.0, 'Previously_Insured': 0,
+               'Vehicle_Age': '< 1 Year', 'Vehicle_Damage': 'Yes', 'Annual_Premium': 40454.0,
+               'Policy_Sales_Channel': 26.0, 'Vintage': 217 }
+    no_premium = dict( record, Annual_Premium=None )
+    malformed = { k: v for k, v in record.items() if k != 'Vehicle_Age' }
+    batcher = app_module.coalescing_batcher( window=0.05, max_batch=8 )
+
+    futures = [ batcher.submit( r ) for r in ( malformed, record, no_premium ) ]
+
+    expected = app_module.registry.current().engine.predict_one( record )['score']
+    assert expected != 0.5
+    assert futures[1].result( timeout=5 )['score'] == pytest.approx( expected )
+    assert futures[2].result( timeout=5 )['score'] == 0.5
+    with pytest.raises( KeyError ):
+        futures[0].result( timeout=5 )
+    assert batcher.stats()['batches'] == 1
@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from conftest import write_artifacts
+from health_insurance.HealthInsurance_optimized import HealthInsuranceOptimized
+from health_insurance.compiled import COMPILED_FILE, CompiledLogistic, main, max_difference, source_digest
+from health_insurance.registry import PipelineRegistry
+from test_health_insurance_optimized import _raw_batch
+
+
+@pytest.mark.parametrize( 'clip', [ False, True ] )
+def test_compiled_tables_match_predict_proba( artifacts_home, tmp_path, clip ):
+    snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    # clipped scalers are compiled into integer tables, unclipped ones folded into a weight
+    snapshot.pipeline.age_scaler.clip = snapshot.pipeline.vintage_scaler.clip = clip
+    compiled = CompiledLogistic.from_engine( HealthInsuranceOptimized( snapshot.pipeline, snapshot.model ) )
+    assert bool( len( compiled.age.table ) ) == clip
+    df_raw = _raw_batch()
+    # outside the age table and non-integer values take the affine formula
+    df_raw.loc[0, 'Age'] = 120
+    df_raw.loc[2, 'Age'] = 5
+    df_raw.loc[1, 'Vintage'] = 150.5
+
+    assert max_difference( compiled, snapshot, df_raw ) < 1e-9
+
+    path = str( tmp_path / 'tables.npz' )
+    compiled.save( path )
+    np.testing.assert_array_equal( CompiledLogistic.load( path ).score_frame( df_raw ), compiled.score_frame( df_raw ) )
+
+
+def test_registry_serves_tables_only_for_matching_artifacts( artifacts_home ):
+    assert main( [ '--home', artifacts_home, '--data', os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' ) ] ) == 0
+    assert os.path.exists( os.path.join( artifacts_home, COMPILED_FILE ) )
+
+    registry = PipelineRegistry( home_path=artifacts_home, check_interval=0 )
+    assert registry.current().compiled.source_digest == source_digest( artifacts_home )
+
+    # a retrained model makes the tables stale
+    write_artifacts( artifacts_home, model=RandomForestClassifier( n_estimators=2 ).fit( [ [0] * 10, [1] * 10 ], [ 0, 1 ] ) )
+    assert PipelineRegistry( home_path=artifacts_home ).current().compiled is None
+
+
+def test_only_logistic_models_compile( tmp_path ):
+    home = str( tmp_path )
+    write_artifacts( home, model=RandomForestClassifier( n_estimators=2 ).fit( [ [0] * 10, [1] * 10 ], [ 0, 1 ] ) )
+    with pytest.raises( ValueError ):
+        CompiledLogistic.from_engine( PipelineRegistry( home_path=home ).current().engine )
@@ -0,0 +1,65 @@
+import os
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from health_insurance import synthetic
+from health_insurance.encoders import EncoderStats, _range_stats, byte_ranges, fit_encoders, fit_stats
+
+
+def test_parallel_ranges_match_a_single_pass( tmp_path ):
+    rng = np.random.default_rng( 3 )
+    n_rows = 30000
+    df = pd.DataFrame( { 'id': np.arange( n_rows ), 'Gender': rng.choice( [ 'Male', 'Female' ], n_rows ),
+                         'Region_Code': rng.integers( 0, 40, n_rows ).astype( float ),
+                         'Policy_Sales_Channel': rng.choice( [ 26.0, 124.0, 152.0, 7.0 ], n_rows ),
+                         'Response': ( rng.random( n_rows ) < 0.12 ).astype( int ) } )
+    path = str( tmp_path / 'train.csv' )
+    df.to_csv( path, index=False )
+
+    ranges = byte_ranges( path, 7 )
+    assert len( ranges ) == 7 and ranges[-1][1] == ( tmp_path / 'train.csv' ).stat().st_size
+    assert all( stop == start for ( _, stop ), ( start, _ ) in zip( ranges, ranges[1:] ) )
+
+    parallel = fit_stats( path, workers=3, chunksize=4000 )
+    single = EncoderStats().update( df['Region_Code'], df['Response'] )
+    pd.testing.assert_series_equal( parallel['Region_Code'].rows, single.rows, check_index_type=False )
+    pd.testing.assert_series_equal( parallel['Region_Code'].positives, single.positives, check_index_type=False )
+
+    first = fit_encoders( path, workers=3 )
+    again = fit_encoders( path, workers=1, chunksize=999 )
+    for name, encoder in first.items():
+        pd.testing.assert_series_equal( encoder, again[name] )
+    # the 381k-row layout: dense tables from key 0 up, unseen keys at the prior or zero frequency
+    channel = first['policy_sales_channel_encoder']
+    assert len( channel ) == 153 and channel[0.0] == 0 and channel.sum() == pytest.approx( 1 )
+    assert list( first['gender_encoder'].index ) == [ 'Female', 'Male' ]
+
+
+def test_target_encoding_is_smoothed_towards_the_prior():
+    stats = EncoderStats().update( [ 1, 1, 1, 1, 3 ], [ 1, 1, 0, 0, 1 ] )
+    stats.merge( EncoderStats().update( [ 3, 3 ], [ 0, 0 ] ) )
+    encoded = stats.target_encoding( smoothing=2, prior=0.1 )
+    assert list( encoded.index ) == [ 0, 1, 2, 3 ]
+    np.testing.assert_allclose( encoded, [ 0.1, ( 2 + 0.2 ) / 6, 0.1, ( 1 + 0.2 ) / 5 ] )
+    # default prior: positive rate of everything counted
+    assert stats.target_encoding( smoothing=1e9 )[1] == pytest.approx( 3 / 7 )
+
+
+
+def test_a_range_is_counted_in_bounded_memory( tmp_path ):
+    path = str( tmp_path / 'train.csv' )
+    synthetic.write_csv( path, 400000, seed=5, with_id=True )
+    start, stop = byte_ranges( path, 1 )[0]
+    tracemalloc.start()
+    try:
+        stats = _range_stats( ( path, start, stop, 5000 ) )
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    df = synthetic.generate_frame( 400000, seed=5 )
+    assert stats['Gender'].total_rows == len( df ) and stats['Gender'].total_positives == df['Response'].sum()
+    # the whole range in memory (once or twice) would be 20-40 MB
+    assert peak < os.path.getsize( path ) / 8
@@ -0,0 +1,76 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+
+from conftest import prepare_features, write_artifacts
+from health_insurance import synthetic
+from health_insurance.HealthInsurance import HealthInsurance
+from health_insurance.budget import Budget
+from health_insurance.bundle import export_bundle, read_bundle
+from health_insurance.forest import FlatForest
+from health_insurance.registry import PipelineRegistry
+from test_health_insurance_optimized import DATA, _pandas_scores, _raw_batch
+from train_model import train_model
+
+
+def _forest( home ):
+    artifacts = write_artifacts( home )
+    df = pd.read_csv( DATA )
+    X = prepare_features( HealthInsurance( artifacts=artifacts ), df.drop( columns='Response' ) )
+    return RandomForestClassifier( n_estimators=25, random_state=0 ).fit( X, df['Response'] ), X
+
+
+def test_flat_forest_matches_predict_proba( tmp_path ):
+    forest, X = _forest( str( tmp_path ) )
+    flat = FlatForest.from_sklearn( forest )
+    assert flat.depth_first and flat.n_nodes == sum( e.tree_.node_count for e in forest.estimators_ )
+
+    rng = np.random.default_rng( 0 )
+    # values sitting exactly on the float64 thresholds must take the same side as sklearn
+    thresholds = forest.estimators_[0].tree_.threshold
+    probe = X.values[rng.integers( 0, len( X ), 500 )] + rng.normal( 0, 0.05, ( 500, X.shape[1] ) )
+    probe[:, 0] = rng.choice( thresholds[thresholds != -2], 500 )
+    for batch in ( X, probe, probe[:1] ):
+        np.testing.assert_allclose( flat.predict_proba( batch ), forest.predict_proba( pd.DataFrame( batch, columns=X.columns ) ), rtol=0, atol=1e-12 )
+    np.testing.assert_array_equal( flat.predict( X ), forest.predict( X ) )
+
+
+def test_forest_bundle_is_served_from_the_memory_map( tmp_path ):
+    home = str( tmp_path )
+    forest, _ = _forest( home )
+    write_artifacts( home, model=forest )
+    pickled = PipelineRegistry( home_path=home, bundle_file=None ).current()
+    expected = _pandas_scores( pickled.pipeline, pickled.model, _raw_batch() )
+
+    path = export_bundle( home )
+    assert isinstance( read_bundle( path )[1]['forest.threshold'].base, np.memmap )
+    snapshot = PipelineRegistry( home_path=home ).current()
+    assert isinstance( snapshot.model, FlatForest )
+
+    # same leaves as sklearn; only the summation order of the tree votes differs
+    np.testing.assert_allclose( _pandas_scores( snapshot.pipeline, snapshot.model, _raw_batch() ), expected, rtol=0, atol=1e-12 )
+    np.testing.assert_allclose( snapshot.engine.score_frame( _raw_batch() ), expected, rtol=0, atol=1e-12 )
+    record = _raw_batch().iloc[3].to_dict()
+    assert abs( snapshot.engine.predict_one( record )['score'] - expected[3] ) < 1e-12
+
+
+def test_trained_forest_is_served_the_features_it_was_fitted_on( tmp_path, monkeypatch ):
+    monkeypatch.chdir( tmp_path )
+    os.makedirs( 'data' )
+    synthetic.write_csv( 'data/train.csv', 20000, seed=11, with_id=True )
+    train_model( Budget( max_model_mb=2, tree_counts=( 20, ) ) )
+    with open( 'model/training_report.json' ) as f:
+        report = json.load( f )
+
+    snapshot = PipelineRegistry( home_path=str( tmp_path ) ).current()
+    assert isinstance( snapshot.model, FlatForest )
+    customers = synthetic.generate_frame( 20000, seed=12 )
+    scores = snapshot.engine.score_frame( customers.drop( columns='Response' ) )
+    # a forest fitted on raw columns but served scaled inputs collapses to a handful of scores
+    assert len( np.unique( scores ) ) > 1000
+    auc = roc_auc_score( customers['Response'], scores )
+    assert auc > 0.8 and abs( auc - report['candidates'][report['chosen']]['roc_auc'] ) < 0.02
@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier
+
+from conftest import prepare_features, write_artifacts
+from health_insurance.HealthInsurance import HealthInsurance
+from health_insurance.HealthInsurance_optimized import HealthInsuranceOptimized
+from health_insurance.registry import PipelineRegistry
+
+DATA = os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' )
+
+
+def _pandas_scores( pipeline, model, df_raw ):
+    df = df_raw.copy()
+    df1 = pipeline.data_cleaning( df )
+    df2 = pipeline.feature_engineering( df1 )
+    df3 = pipeline.data_preparation( df2 )
+    pipeline.get_prediction( model, df, df3 )
+    return df['score'].values
+
+
+def _raw_batch():
+    df = pd.read_csv( DATA ).drop( columns='Response' )
+    extra = df.copy()
+    # unseen region / channel, lower-case damage flag
+    extra['Region_Code'] = [ 99.0, 28.0, 3.5, 11.0, 14.0, 46.0, 46.0, 52.0, 41.0, 29.0 ]
+    extra['Policy_Sales_Channel'] = 999.0
+    extra['Vehicle_Damage'] = ' yes '
+    return pd.concat( [ df, extra ], ignore_index=True )
+
+
+def test_engine_matches_pandas_pipeline( artifacts_home ):
+    snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    df_raw = _raw_batch()
+
+    expected = _pandas_scores( snapshot.pipeline, snapshot.model, df_raw )
+    got = snapshot.engine.score_frame( df_raw )
+    np.testing.assert_allclose( got, expected, rtol=1e-9 )
+
+    got32 = HealthInsuranceOptimized( snapshot.pipeline, snapshot.model, dtype=np.float32 ).score_frame( df_raw )
+    np.testing.assert_allclose( got32, expected, rtol=1e-4 )
+
+
+def test_engine_matches_pandas_for_single_record( artifacts_home ):
+    snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    records = pd.read_csv( DATA ).drop( columns='Response' ).to_dict( orient='records' )
+
+    for record in records:
+        expected = _pandas_scores( snapshot.pipeline, snapshot.model, pd.DataFrame( record, index=[0] ) )
+        np.testing.assert_allclose( snapshot.engine.score_records( [ record ] ), expected, rtol=1e-9 )
+
+
+def test_engine_matches_pandas_for_tree_model( tmp_path ):
+    home = str( tmp_path )
+    artifacts = write_artifacts( home )
+    df = pd.read_csv( DATA )
+    pipeline = HealthInsurance( artifacts=artifacts )
+    model = RandomForestClassifier( n_estimators=5, random_state=0 ).fit(
+        prepare_features( pipeline, df.drop( columns='Response' ) ), df['Response'] )
+
+    df_raw = _raw_batch()
+    expected = _pandas_scores( pipeline, model, df_raw )
+    np.testing.assert_allclose( HealthInsuranceOptimized( pipeline, model ).score_frame( df_raw ), expected )
+
+
+def test_engine_matches_pandas_with_fallback_encoders( tmp_path ):
+    # no parameter files: unfitted scalers fall back to batch statistics
+    pipeline = HealthInsurance( home_path=str( tmp_path ) )
+    model = DummyClassifier( strategy='prior' ).fit( [[0], [1], [1]], [0, 1, 1] )
+    df_raw = _raw_batch()
+
+    expected = _pandas_scores( pipeline, model, df_raw )
+    engine = HealthInsuranceOptimized( pipeline, model )
+    np.testing.assert_allclose( engine.score_frame( df_raw ), expected )
+
+    X = engine.prepare( { 'age': [ 20, 30, 40 ], 'annual_premium': [ 1.0, 2.0, 3.0 ], 'vintage': [ 10, 10, 20 ],
+                          'region_code': [ 1, 2, 3 ], 'policy_sales_channel': [ 1, 2, 3 ], 'previously_insured': [ 0, 1, 0 ],
+                          'vehicle_damage': [ 'Yes', 'No', 'Yes' ], 'vehicle_age': [ '< 1 Year', '1-2 Year', '> 2 Years' ] } )
+    np.testing.assert_allclose( X[:, 1], [ 0.0, 0.5, 1.0 ] )
+    np.testing.assert_allclose( X[:, 0], [ -1.0, 0.0, 1.0 ] )
+
+
+def test_single_record_fast_path_matches_pandas( artifacts_home ):
+    snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    records = _raw_batch().to_dict( orient='records' )
+
+    for record in records:
+        expected = _pandas_scores( snapshot.pipeline, snapshot.model, pd.DataFrame( record, index=[0] ) )
+        row = snapshot.engine.predict_one( record )
+        assert abs( row['score'] - expected[0] ) < 1e-9
+        assert row['age'] == record['Age']
+        np.testing.assert_allclose( snapshot.engine.prepare_one( row ), snapshot.engine.prepare( { k: [ v ] for k, v in row.items() } ) )
+
+
+def test_single_record_falls_back_without_fitted_scalers( artifacts_home, tmp_path ):
+    model = PipelineRegistry( home_path=artifacts_home ).current().model
+    pipeline = HealthInsurance( home_path=str( tmp_path / 'missing' ) )
+    record = pd.read_csv( DATA ).drop( columns='Response' ).to_dict( orient='records' )[0]
+
+    expected = _pandas_scores( pipeline, model, pd.DataFrame( record, index=[0] ) )
+    assert expected[0] == 0.5
+    assert HealthInsuranceOptimized( pipeline, model ).predict_one( record )['score'] == 0.5
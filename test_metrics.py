@@ -0,0 +1,55 @@
+import pytest
+
+from benchmark_single_record import SAMPLE
+from health_insurance.metrics import METRICS, Metrics, RequestTimer
+
+
+def test_prometheus_text_and_server_timing():
+    metrics = Metrics()
+    timer = RequestTimer( 'predict', 'numpy' )
+    for stage in ( 'parse', 'score', 'serialize' ):
+        timer.mark( stage )
+    timer.rows = 3
+    timer.finish( 200, bytes_in=300, bytes_out=5000, metrics=metrics )
+    metrics.inc( 'fallback_scores_total', 2, engine='numpy' )
+
+    text = metrics.render()
+    assert '# TYPE health_insurance_stage_seconds histogram' in text
+    assert 'health_insurance_stage_seconds_bucket{engine="numpy",stage="score",le="+Inf"} 1' in text
+    assert 'health_insurance_request_rows_bucket{route="predict",le="1"} 0' in text
+    assert 'health_insurance_request_rows_bucket{route="predict",le="10"} 1' in text
+    assert 'health_insurance_request_bytes_count{direction="out",route="predict"} 1' in text
+    assert 'health_insurance_requests_total{route="predict",status="200"} 1' in text
+    assert 'health_insurance_fallback_scores_total{engine="numpy"} 2' in text
+
+    header = timer.server_timing()
+    assert [ part.split( ';' )[0] for part in header.split( ', ' ) ] == [ 'parse', 'score', 'serialize', 'total' ]
+
+    disabled = Metrics( enabled=False )
+    disabled.inc( 'fallback_scores_total', 5, engine='numpy' )
+    assert disabled.render() == '\n'
+
+
+@pytest.mark.parametrize( 'engine', [ 'pandas', 'numpy' ] )
+def test_predict_is_timed_per_stage( app_module, monkeypatch, engine ):
+    monkeypatch.setattr( app_module, 'ENGINE', engine )
+    client = app_module.app.test_client()
+    stages = { 'pandas': [ 'data_cleaning', 'feature_engineering', 'data_preparation', 'get_prediction' ],
+               'numpy': [ 'score' ] }[engine]
+
+    response = client.post( '/healthinsurance/predict', json=[ SAMPLE, SAMPLE ] )
+    assert response.status_code == 200
+    names = [ part.split( ';' )[0] for part in response.headers['Server-Timing'].split( ', ' ) ]
+    assert names == [ 'parse' ] + stages + [ 'serialize', 'total' ]
+
+    fallbacks = METRICS.value( 'fallback_scores_total', engine=engine ) or 0
+    broken = dict( SAMPLE, Annual_Premium=None )
+    assert client.post( '/healthinsurance/predict', json=[ broken ] ).get_json()[0]['score'] == 0.5
+    assert METRICS.value( 'fallback_scores_total', engine=engine ) == fallbacks + 1
+
+    text = client.get( '/metrics' ).get_data( as_text=True )
+    for stage in stages:
+        assert f'health_insurance_stage_seconds_count{{engine="{engine}",stage="{stage}"}}' in text
+    assert 'health_insurance_artifact_load_seconds{artifact="model"}' in text
+    assert 'health_insurance_startup_seconds{phase="warm_up"}' in text
+    assert 'health_insurance_rows_per_second_count{route="predict"}' in text
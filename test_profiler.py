@@ -0,0 +1,62 @@
+import importlib
+import pstats
+import sys
+
+from benchmark_single_record import SAMPLE
+from health_insurance.profiler import HEADER, Profiler
+
+
+def test_sampling_is_capped_and_the_ring_is_bounded( tmp_path ):
+    profiler = Profiler( directory=str( tmp_path ), sample_every=2, max_fraction=0.25, keep=2 )
+    names = []
+    for _ in range( 16 ):
+        profile = profiler.start( {} )
+        if profile is not None:
+            sum( range( 1000 ) )
+            names.append( profiler.stop( profile, 'predict', 0.001 ) )
+
+    # every 2nd request is due, but only a quarter of them may be profiled
+    assert profiler.stats()['profiled'] == len( names ) == 4
+    assert profiler.stats()['skipped'] == 4
+    assert profiler.names() == names[::-1][:2]
+    assert pstats.Stats( profiler.path( names[-1] ) ).total_calls > 0
+    assert profiler.path( '../app.py' ) is None
+
+    # the header forces a profile only with the right token; without a token nothing is profiled
+    assert Profiler( directory=str( tmp_path ), token='s3cret', max_fraction=1 ).start( { HEADER: 'nope' } ) is None
+    assert not Profiler( directory=str( tmp_path ) ).enabled
+
+
+def test_forced_profile_on_the_first_request( tmp_path ):
+    profiler = Profiler( directory=str( tmp_path ), token='s3cret', sample_every=1 )
+    profile = profiler.start( { HEADER: 's3cret' } )
+    assert profile is not None
+    profiler.stop( profile, 'predict', 0.001 )
+
+    # forced profiles do not use up the sampling share
+    assert profiler.start( {} ) is None
+    assert profiler.stats()['forced'] == profiler.stats()['profiled'] == 1
+
+
+def test_predict_profiled_on_request( artifacts_home, monkeypatch ):
+    monkeypatch.chdir( artifacts_home )
+    monkeypatch.setenv( 'PROFILE_TOKEN', 's3cret' )
+    sys.modules.pop( 'app', None )
+    try:
+        app_module = importlib.import_module( 'app' )
+        client = app_module.app.test_client()
+
+        assert 'X-Profile-Id' not in client.post( '/healthinsurance/predict', json=SAMPLE ).headers
+        response = client.post( '/healthinsurance/predict', json=SAMPLE, headers={ HEADER: 's3cret' } )
+        assert response.status_code == 200
+        name = response.headers['X-Profile-Id']
+
+        assert client.get( '/profiles' ).status_code == 403
+        token = { 'X-Profile-Token': 's3cret' }
+        listing = client.get( '/profiles', headers=token ).get_json()
+        assert [ p['name'] for p in listing['profiles'] ] == [ name ] and listing['stats']['seen'] == 2
+        assert 'data_cleaning' in client.get( f'/profiles/{name}?format=text&limit=0', headers=token ).get_data( as_text=True )
+        assert client.get( f'/profiles/{name}', headers=token ).status_code == 200
+        assert client.get( '/profiles/missing.pstats', headers=token ).status_code == 404
+    finally:
+        sys.modules.pop( 'app', None )
@@ -0,0 +1,47 @@
+import os
+import pickle
+
+from sklearn.dummy import DummyClassifier
+
+from health_insurance.registry import PipelineRegistry
+
+
+def _touch_model( home, model ):
+    path = os.path.join( home, 'model', 'model_health_insurance.pkl' )
+    with open( path, 'wb' ) as f:
+        pickle.dump( model, f )
+    st = os.stat( path )
+    os.utime( path, ns=( st.st_atime_ns, st.st_mtime_ns + 10**9 ) )
+
+
+def test_registry_loads_once( artifacts_home ):
+    registry = PipelineRegistry( home_path=artifacts_home, check_interval=0 )
+    first = registry.current()
+    assert registry.current() is first
+    assert first.pipeline.gender_encoder['Male'] > 0
+
+
+def test_registry_swaps_snapshot_on_change( artifacts_home ):
+    registry = PipelineRegistry( home_path=artifacts_home, check_interval=0 )
+    old = registry.current()
+
+    dummy = DummyClassifier( strategy='prior' ).fit( [[0], [1]], [0, 1] )
+    _touch_model( artifacts_home, dummy )
+
+    new = registry.current()
+    assert new is not old
+    assert new.version != old.version
+    assert isinstance( new.model, DummyClassifier )
+    # in-flight requests keep their snapshot untouched
+    assert not isinstance( old.model, DummyClassifier )
+
+
+def test_registry_keeps_snapshot_when_reload_fails( artifacts_home ):
+    registry = PipelineRegistry( home_path=artifacts_home, check_interval=0 )
+    old = registry.current()
+
+    path = os.path.join( artifacts_home, 'model', 'model_health_insurance.pkl' )
+    with open( path, 'wb' ) as f:
+        f.write( b'truncated' )
+
+    assert registry.current() is old
@@ -0,0 +1,76 @@
+import gzip
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from health_insurance.response_format import ResponseFormat, negotiate, render
+
+DATA = os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' )
+
+
+def _records():
+    return pd.read_csv( DATA ).drop( columns='Response' ).to_dict( orient='records' )
+
+
+@pytest.mark.parametrize( 'engine', [ 'pandas', 'numpy' ] )
+def test_compact_and_binary_formats_carry_the_same_scores( app_module, monkeypatch, engine ):
+    monkeypatch.setattr( app_module, 'ENGINE', engine )
+    client = app_module.app.test_client()
+    records = _records()
+    expected = app_module.registry.current().engine.score_records( records )
+
+    scores = client.post( '/healthinsurance/predict?format=scores', json=records ).get_json()
+    np.testing.assert_allclose( scores, expected, rtol=1e-9 )
+
+    rows = client.post( '/healthinsurance/predict?format=id_score', json=records ).get_json()
+    assert [ r['id'] for r in rows ] == list( range( len( records ) ) )  # no id in the input: row position
+    assert set( rows[0] ) == { 'id', 'score' }
+
+    columnar = client.post( '/healthinsurance/predict?format=columnar&echo=Gender,Age', json=records ).get_json()
+    assert set( columnar ) == { 'gender', 'age', 'score' }
+    assert columnar['age'] == [ r['Age'] for r in records ]
+
+    response = client.post( '/healthinsurance/predict', json=records, headers={ 'Accept': 'application/x-npy' } )
+    assert response.mimetype == 'application/x-npy'
+    np.testing.assert_allclose( np.load( io.BytesIO( response.data ) ), expected, rtol=1e-9 )
+
+    table = np.load( io.BytesIO( client.post( '/healthinsurance/predict?format=npy&echo=age', json=records ).data ) )
+    assert table.dtype.names == ( 'age', 'score' )
+
+
+def test_gzip_and_unknown_formats( app_module ):
+    client = app_module.app.test_client()
+    records = _records()
+
+    plain = client.post( '/healthinsurance/predict?format=records', json=records )
+    zipped = client.post( '/healthinsurance/predict', json=records, headers={ 'Accept-Encoding': 'gzip' } )
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert json.loads( gzip.decompress( zipped.data ) ) == json.loads( plain.data )
+
+    small = client.post( '/healthinsurance/predict?format=scores', json=records[:1], headers={ 'Accept-Encoding': 'gzip' } )
+    assert 'Content-Encoding' not in small.headers
+
+    assert client.post( '/healthinsurance/predict?format=xml', json=records ).status_code == 406
+
+
+@pytest.mark.parametrize( 'accept_encoding, wanted', [
+    ( 'gzip', True ), ( 'deflate, gzip;q=0.5', True ), ( '*;q=0.1', True ), ( 'GZIP ; Q=1', True ),
+    ( 'gzip;q=0', False ), ( 'gzip; q=0.000', False ), ( '*, gzip;q=0', False ), ( 'identity', False ), ( '', False ),
+] )
+def test_gzip_honours_q_values( accept_encoding, wanted ):
+    assert negotiate( {}, { 'Accept-Encoding': accept_encoding } ).gzip is wanted
+
+
+def test_npy_keeps_missing_values_missing():
+    records = [ { 'age': 44, 'gender': 'Male', 'annual_premium': None }, { 'age': None, 'gender': 'Female', 'annual_premium': 2630.0 } ]
+    table = np.load( io.BytesIO( render( ResponseFormat( 'npy', echo=[ 'age', 'gender', 'annual_premium' ] ), records, [ 0.1, 0.2 ] ) ) )
+    np.testing.assert_array_equal( table['age'], [ 44, np.nan ] )
+    np.testing.assert_array_equal( table['annual_premium'], [ np.nan, 2630.0 ] )
+    assert table['gender'].tolist() == [ 'Male', 'Female' ]
+
+    with pytest.raises( ValueError ):
+        render( ResponseFormat( 'npy', echo=[ 'gender' ] ), [ { 'gender': 'Male' }, { 'gender': None } ], [ 0.1, 0.2 ] )
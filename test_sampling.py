@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from health_insurance.sampling import main, stratified_sample
+from health_insurance.schema import read_csv
+
+
+@pytest.fixture
+def labelled_csv( tmp_path ):
+    rng = np.random.default_rng( 0 )
+    n_rows = 20000
+    df = pd.DataFrame( { 'id': np.arange( n_rows ), 'Gender': rng.choice( [ 'Male', 'Female' ], n_rows ),
+                         'Response': ( rng.random( n_rows ) < 0.12 ).astype( int ) } )
+    path = tmp_path / 'train.csv'
+    df.to_csv( path, index=False )
+    return str( path ), df
+
+
+def test_sample_is_stratified_uniform_and_deterministic( labelled_csv ):
+    path, df = labelled_csv
+    sample, weights, report = stratified_sample( path, 2000, seed=7, chunksize=1500 )
+    again, _, _ = stratified_sample( path, 2000, seed=7, chunksize=777 )
+    pd.testing.assert_frame_equal( sample, again )
+    assert not sample.equals( stratified_sample( path, 2000, seed=8, chunksize=1500 )[0] )
+
+    assert len( sample ) == 2000 and sample['id'].is_monotonic_increasing and sample['id'].is_unique
+    assert abs( sample['Response'].mean() - df['Response'].mean() ) < 0.002
+    # rows from the whole file, not its head
+    assert abs( sample['id'].mean() - len( df ) / 2 ) < 0.05 * len( df )
+    for label, counts in report['classes'].items():
+        assert weights[sample['Response'] == int( label )].sum() == pytest.approx( counts['seen'] )
+    pd.testing.assert_frame_equal( sample, read_csv( path ).iloc[sample['id']].reset_index( drop=True ) )
+
+
+def test_negative_downsampling_records_weights( labelled_csv, tmp_path ):
+    path, df = labelled_csv
+    out = str( tmp_path / 'sample.csv' )
+    assert main( [ path, out, '--size', '900', '--negative-ratio', '2', '--chunksize', '1000' ] ) == 0
+    sample = pd.read_csv( out )
+    positives = sample['Response'] == 1
+    assert positives.sum() == 300 and ( ~positives ).sum() == 600
+    # re-weighted, the sample has the file's positive rate
+    weighted = np.average( sample['Response'], weights=sample['sample_weight'] )
+    assert weighted == pytest.approx( df['Response'].mean() )
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from health_insurance.registry import PipelineRegistry
+from health_insurance import schema
+from health_insurance.schema import DTYPES, memory_report, read_csv, rename, snake_case
+from test_health_insurance_optimized import DATA, _pandas_scores
+
+
+def test_compact_frames_score_like_default_ones( artifacts_home ):
+    snapshot = PipelineRegistry( home_path=artifacts_home ).current()
+    default = pd.read_csv( DATA ).drop( columns='Response' )
+    compact = read_csv( DATA ).drop( columns='Response' )
+    assert { c: str( t ) for c, t in compact.dtypes.items() } == { c: DTYPES[c] for c in compact.columns }
+
+    expected = _pandas_scores( snapshot.pipeline, snapshot.model, default )
+    np.testing.assert_array_equal( _pandas_scores( snapshot.pipeline, snapshot.model, compact ), expected )
+    np.testing.assert_array_equal( snapshot.engine.score_frame( compact ), snapshot.engine.score_frame( default ) )
+
+    assert list( rename( compact.assign( ExtraColumn=1 ) ).columns )[-2:] == [ 'vintage', 'extra_column' ]
+
+
+def test_memory_report_shrinks_rows():
+    report = memory_report( DATA )
+    assert report.loc['total', 'compact'] < report.loc['total', 'default'] / 2
+    assert report.loc['Age', 'compact'] == 1
+
+
+def test_extra_column_names_are_cached_within_a_bound():
+    known = len( schema.COLUMN_MAP )
+    names = [ snake_case( f'ClientKey{i}' ) for i in range( schema.EXTRA_NAMES_CACHED * 3 ) ]
+    assert names[:2] == [ 'client_key0', 'client_key1' ] and snake_case( 'Annual_Premium' ) == 'annual_premium'
+    assert len( schema.COLUMN_MAP ) == known
+    assert schema._extra_name.cache_info().currsize <= schema.EXTRA_NAMES_CACHED
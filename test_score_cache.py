@@ -0,0 +1,71 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from health_insurance.registry import PipelineRegistry
+from health_insurance.score_cache import ScoreCache
+
+DATA = os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' )
+
+
+def test_lru_eviction_and_counters():
+    cache = ScoreCache( max_size=2 )
+    cache.put_many( [ 'a', 'b' ], [ 0.1, 0.2 ] )
+    assert cache.get_many( [ 'a' ] ) == [ 0.1 ]     # 'b' is now least recently used
+    cache.put_many( [ 'c' ], [ 0.3 ] )
+
+    assert cache.get_many( [ 'a', 'b', 'c' ] ) == [ 0.1, None, 0.3 ]
+    stats = cache.stats()
+    assert ( stats['hits'], stats['misses'], stats['evictions'], stats['size'] ) == ( 3, 1, 1, 2 )
+
+
+def test_ttl_expiration():
+    cache = ScoreCache( max_size=10, ttl=-1 )
+    cache.put_many( [ 'a' ], [ 0.5 ] )
+    assert cache.get_many( [ 'a' ] ) == [ None ]
+    assert cache.stats()['expirations'] == 1
+
+
+def test_engine_deduplicates_and_reuses_scores( artifacts_home ):
+    cache = ScoreCache()
+    snapshot = PipelineRegistry( home_path=artifacts_home, cache=cache ).current()
+    uncached = PipelineRegistry( home_path=artifacts_home ).current().engine
+
+    df = pd.read_csv( DATA ).drop( columns='Response' )
+    batch = pd.concat( [ df, df, df ], ignore_index=True )
+
+    scores = snapshot.engine.score_frame( batch )
+    np.testing.assert_allclose( scores, uncached.score_frame( batch ) )
+    assert cache.stats()['misses'] == len( df )
+    assert cache.stats()['deduplicated_rows'] == 2 * len( df )
+
+    np.testing.assert_allclose( snapshot.engine.score_frame( df ), scores[:len( df )] )
+    assert cache.stats()['hits'] == len( df )
+
+    record = df.to_dict( orient='records' )[0]
+    assert snapshot.engine.predict_one( record )['score'] == scores[0]
+    assert cache.stats()['hits'] == len( df ) + 1
+
+
+def test_cache_invalidated_when_model_changes( artifacts_home ):
+    cache = ScoreCache()
+    registry = PipelineRegistry( home_path=artifacts_home, check_interval=0, cache=cache )
+    df = pd.read_csv( DATA ).drop( columns='Response' )
+    registry.current().engine.score_frame( df )
+    assert cache.stats()['size'] == len( df )
+
+    path = os.path.join( artifacts_home, 'model', 'model_health_insurance.pkl' )
+    model = registry.current().model
+    model.intercept_ = model.intercept_ + 1.0
+    with open( path, 'wb' ) as f:
+        pickle.dump( model, f )
+    st = os.stat( path )
+    os.utime( path, ns=( st.st_atime_ns, st.st_mtime_ns + 10**9 ) )
+
+    engine = registry.current().engine
+    assert cache.stats()['size'] == 0
+    assert cache.stats()['invalidations'] == 1
+    np.testing.assert_allclose( engine.score_frame( df ), engine.predict_matrix( engine.prepare( {
+        k.lower(): df[k].to_numpy() for k in df.columns } ) ) )
@@ -0,0 +1,73 @@
+import importlib
+import sys
+import threading
+
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from benchmark_single_record import SAMPLE
+from health_insurance.registry import PipelineRegistry
+from health_insurance.startup import Startup
+from conftest import write_artifacts
+
+
+def test_failed_startup_is_reported_without_waiting():
+    startup = Startup( lambda: None, lambda: 1 / 0 ).start( background=True )
+    assert not startup.wait( 5 ) and startup.failed
+    assert startup.status()['status'] == 'failed' and 'ZeroDivisionError' in startup.status()['error']
+    with pytest.raises( ZeroDivisionError ):
+        Startup( lambda: None, lambda: 1 / 0 ).start( background=False )
+
+
+def test_background_startup_binds_before_the_model_is_ready( artifacts_home, monkeypatch ):
+    release = threading.Event()
+    reload = PipelineRegistry.reload
+
+    def slow_reload( self ):
+        release.wait( 10 )
+        return reload( self )
+
+    monkeypatch.setattr( PipelineRegistry, 'reload', slow_reload )
+    monkeypatch.setenv( 'STARTUP_MODE', 'background' )
+    monkeypatch.setenv( 'STARTUP_WAIT_SECONDS', '0' )
+    monkeypatch.chdir( artifacts_home )
+    sys.modules.pop( 'app', None )
+    try:
+        app_module = importlib.import_module( 'app' )
+        client = app_module.app.test_client()
+
+        assert client.get( '/livez' ).status_code == 200
+        assert client.get( '/readyz' ).get_json()['status'] == 'starting'
+        assert client.get( '/health' ).status_code == 503
+        busy = client.post( '/healthinsurance/predict', json=SAMPLE )
+        assert busy.status_code == 503 and busy.headers['Retry-After'] == '1'
+
+        release.set()
+        assert app_module.startup.wait( 10 )
+        ready = client.get( '/readyz' ).get_json()
+        assert ready['status'] == 'ready' and ready['ready_after_s'] >= ready['load_s']
+        response = client.post( '/healthinsurance/predict', json=SAMPLE )
+        assert response.status_code == 200 and 0 <= response.get_json()[0]['score'] <= 1
+    finally:
+        release.set()
+        sys.modules.pop( 'app', None )
+
+
+@pytest.mark.parametrize( 'engine', [ 'pandas', 'numpy', 'compiled' ] )
+def test_model_that_cannot_score_is_never_ready( tmp_path, monkeypatch, engine ):
+    # every prediction falls back to 0.5, which is a valid score: the warm-up must not accept it
+    broken = LogisticRegression().fit( np.array( [ [0, 0, 0], [1, 1, 1] ] ), np.array( [0, 1] ) )
+    write_artifacts( str( tmp_path ), model=broken )
+    monkeypatch.setenv( 'HEALTH_INSURANCE_ENGINE', engine )
+    monkeypatch.setenv( 'STARTUP_MODE', 'background' )
+    monkeypatch.setenv( 'STARTUP_WAIT_SECONDS', '0' )
+    monkeypatch.chdir( str( tmp_path ) )
+    sys.modules.pop( 'app', None )
+    try:
+        app_module = importlib.import_module( 'app' )
+        assert not app_module.startup.wait( 30 ) and app_module.startup.failed
+        response = app_module.app.test_client().get( '/readyz' )
+        assert response.status_code == 503 and response.get_json()['status'] == 'failed'
+    finally:
+        sys.modules.pop( 'app', None )
@@ -0,0 +1,37 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+DATA = os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' )
+
+
+def _records():
+    return pd.read_csv( DATA ).drop( columns='Response' ).to_dict( orient='records' )
+
+
+@pytest.mark.parametrize( 'engine', [ 'pandas', 'numpy' ] )
+def test_predict_stream_scores_ndjson_in_micro_batches( app_module, monkeypatch, engine ):
+    monkeypatch.setattr( app_module, 'ENGINE', engine )
+    records = _records()
+    body = ''.join( json.dumps( r ) + '\n' for r in records )
+
+    response = app_module.app.test_client().post( '/healthinsurance/predict/stream?batch_size=3', data=body,
+                                                  content_type='application/x-ndjson' )
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    rows = [ json.loads( line ) for line in response.data.decode().splitlines() ]
+    assert [ r['age'] for r in rows ] == [ r['Age'] for r in records ]
+    engine = app_module.registry.current().engine
+    np.testing.assert_allclose( [ r['score'] for r in rows ], engine.score_records( records ), rtol=1e-9 )
+
+
+def test_predict_stream_reports_bad_lines( app_module ):
+    client = app_module.app.test_client()
+    response = client.post( '/healthinsurance/predict/stream', data='{"Age": 1\n', content_type='application/x-ndjson' )
+    assert 'line 1' in json.loads( response.data )['error']
+
+    assert client.post( '/healthinsurance/predict/stream', json=_records() ).status_code == 415
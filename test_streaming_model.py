@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmark_engine import synthetic_frame
+from health_insurance.registry import PipelineRegistry
+from test_health_insurance_optimized import _pandas_scores, _raw_batch
+from train_streaming_model import fit_parameters, train_streaming_model
+
+
+@pytest.fixture
+def train_csv( tmp_path ):
+    df = synthetic_frame( 3000, seed=3 )
+    rng = np.random.default_rng( 0 )
+    logit = -2 + 1.5 * ( df['Vehicle_Damage'] == 'Yes' ) - 3 * df['Previously_Insured']
+    df['Response'] = ( rng.random( len( df ) ) < 1 / ( 1 + np.exp( -logit ) ) ).astype( int )
+    path = tmp_path / 'train.csv'
+    df.to_csv( path, index=False )
+    return str( path )
+
+
+def test_parameters_do_not_depend_on_the_chunk_size( train_csv ):
+    small, classes_small = fit_parameters( train_csv, 128, 5 )
+    whole, classes_whole = fit_parameters( train_csv, 10**6, 5 )
+    np.testing.assert_array_equal( classes_small, classes_whole )
+    np.testing.assert_allclose( small['annual_premium_scaler'].mean_, whole['annual_premium_scaler'].mean_ )
+    np.testing.assert_allclose( small['annual_premium_scaler'].scale_, whole['annual_premium_scaler'].scale_ )
+    np.testing.assert_array_equal( small['age_scaler'].data_max_, whole['age_scaler'].data_max_ )
+    for name in ( 'gender_encoder', 'region_code_encoder', 'policy_sales_channel_encoder' ):
+        pd.testing.assert_series_equal( small[name], whole[name] )
+
+
+def test_streamed_artifacts_are_drop_in( train_csv, tmp_path, monkeypatch ):
+    monkeypatch.chdir( tmp_path )
+    metrics = train_streaming_model( train_csv, chunksize=500, epochs=2 )
+    assert metrics['roc_auc'] > 0.7
+
+    pickled = PipelineRegistry( home_path=str( tmp_path ), bundle_file=None ).current()
+    assert type( pickled.model ).__name__ == 'SGDClassifier'
+    expected = _pandas_scores( pickled.pipeline, pickled.model, _raw_batch() )
+    assert not np.allclose( expected, 0.5 )
+    np.testing.assert_allclose( pickled.engine.score_frame( _raw_batch() ), expected, rtol=1e-9 )
+    bundled = PipelineRegistry( home_path=str( tmp_path ) ).current()
+    np.testing.assert_allclose( bundled.engine.score_frame( _raw_batch() ), expected, rtol=1e-9 )
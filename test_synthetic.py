@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+from health_insurance import synthetic
+from health_insurance.schema import read_csv
+
+
+def test_csv_is_reproducible_and_matches_the_schema( tmp_path ):
+    small, large = str( tmp_path / 'small.csv' ), str( tmp_path / 'large.csv' )
+    synthetic.write_csv( small, 200000, seed=7, chunk_rows=synthetic.BLOCK_ROWS )
+    synthetic.write_csv( large, 200000, seed=7, workers=2 )
+    with open( small, 'rb' ) as a, open( large, 'rb' ) as b:
+        assert a.read() == b.read()
+
+    sample = pd.read_csv( os.path.join( os.path.dirname( __file__ ), 'data/sample_train.csv' ) )
+    df = pd.read_csv( small )
+    assert list( df.columns ) == list( sample.columns ) and ( df.dtypes == sample.dtypes ).all()
+    pd.testing.assert_frame_equal( df, synthetic.generate_frame( 200000, seed=7 ) )
+    pd.testing.assert_frame_equal( read_csv( small ), synthetic.generate_frame( 200000, seed=7, categorical=True ) )
+
+    # marginals of the original train.csv
+    assert abs( df['Response'].mean() - 0.1226 ) < 0.005
+    assert abs( ( df['Gender'] == 'Male' ).mean() - 0.5408 ) < 0.005
+    assert abs( ( df['Policy_Sales_Channel'] == 152 ).mean() - 0.354 ) < 0.005
+    assert abs( ( df['Annual_Premium'] == 2630 ).mean() - 0.17 ) < 0.005
+    assert df.groupby( 'Previously_Insured' )['Response'].mean()[1] < 0.01
+
+
+def test_marginals_are_configurable( tmp_path ):
+    marginals = { 'response_rate': 0.3, 'gender': { 'Male': 1, 'Female': 0 }, 'vintage': { 'min': 100, 'max': 100 } }
+    df = synthetic.generate_frame( 100000, seed=1, marginals=marginals )
+    assert abs( df['Response'].mean() - 0.3 ) < 0.01
+    assert ( df['Gender'] == 'Male' ).all() and ( df['Vintage'] == 100 ).all()
+    assert not synthetic.generate_frame( 1000, seed=1 ).equals( synthetic.generate_frame( 1000, seed=2 ) )
+    for categorical in ( False, True ):
+        empty, one = synthetic.generate_frame( 0, categorical=categorical ), synthetic.generate_frame( 1, categorical=categorical )
+        assert len( empty ) == 0 and ( empty.dtypes == one.dtypes ).all() and list( empty.columns ) == list( one.columns )
+
+    path = str( tmp_path / 'train.csv' )
+    synthetic.main( [ path, '--rows', '1000', '--id', '--response-rate', '0.5' ] )
+    assert pd.read_csv( path )['id'].tolist() == list( range( 1, 1001 ) )
+
+    if synthetic._pyarrow() is None:
+        pytest.skip( 'pyarrow not installed' )
+    parquet = str( tmp_path / 'train.parquet' )
+    synthetic.write_parquet( parquet, 1000, seed=1 )
+    pd.testing.assert_frame_equal( pd.read_parquet( parquet ).astype( { 'Gender': object, 'Vehicle_Age': object, 'Vehicle_Damage': object } ),
+                                   synthetic.generate_frame( 1000, seed=1 ), check_dtype=False )
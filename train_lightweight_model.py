@@ -5,26 +5,35 @@ Script otimizado para treinar modelo com baixo uso de memória
 
 import os
 import pickle
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.linear_model import LogisticRegression
-import inflection
 import gc
+import json
+from health_insurance.build_cache import BuildCache, file_digest
+from health_insurance.HealthInsurance import HealthInsurance
+from health_insurance.sampling import stratified_sample
+from health_insurance.schema import DTYPES, read_csv, rename
 
-def train_lightweight_model():
+# Usar apenas features essenciais para economizar memória
+ESSENTIAL_FEATURES = ['age', 'annual_premium', 'vintage', 'region_code',
+                      'policy_sales_channel', 'previously_insured', 'vehicle_damage']
+# Modelo mais leve (Logistic Regression ao invés de Random Forest)
+MODEL_PARAMS = {'random_state': 42, 'max_iter': 100, 'solver': 'liblinear'}
+
+def train_lightweight_model(cache=None):
     """
     Treina um modelo leve usando menos memória
+
+    Cada etapa (leitura, encoders, scalers, modelo) fica no cache de build
+    (`health_insurance.build_cache`) sob o hash do arquivo de dados e dos
+    parâmetros: um rebuild com os mesmos dados reaproveita tudo, e uma
+    mudança nos dados retreina. O resultado de cada etapa vai para
+    model/build_manifest.json
     """
     print("=== TREINANDO MODELO LEVE NO RENDER ===")
     
-    # Verificar se o modelo já existe
-    if os.path.exists('model/model_health_insurance.pkl'):
-        print("✅ Modelo já existe, carregando...")
-        return
-    
     # Verificar se os dados existem
     data_file = None
     if os.path.exists('data/mini_train.csv'):
@@ -36,93 +45,67 @@ def train_lightweight_model():
     elif os.path.exists('data/train.csv'):
         data_file = 'data/train.csv'
         print("📊 Usando dados completos (modo otimizado)...")
+    elif os.path.exists('model/model_health_insurance.pkl'):
+        print("✅ Modelo já existe, carregando...")
+        return
     else:
         print("❌ Nenhum arquivo de dados encontrado!")
         print("Criando modelo dummy para demonstração...")
         create_lightweight_dummy_model()
         return
     
+    cache = cache or BuildCache()
     try:
-        # Carregar dados em chunks para economizar memória
-        print(f"📊 Carregando dados de: {data_file}")
-        
         # Para dados grandes, usar apenas uma amostra
+        sampling_params = {}
         if data_file == 'data/train.csv':
-            # Ler apenas uma amostra dos dados para economizar memória
-            df_raw = pd.read_csv(data_file, nrows=10000)  # Apenas 10k linhas
-            print(f"   Usando amostra de {len(df_raw)} linhas para economizar memória")
-        else:
-            df_raw = pd.read_csv(data_file)
-        
-        # Processar dados
-        df1 = df_raw.copy()
-        del df_raw  # Liberar memória
-        gc.collect()
-        
-        # Renomear colunas
-        cols_old = df1.columns
-        snakecase = lambda x: inflection.underscore(x)
-        cols_new = list(map(snakecase, cols_old))
-        df1.columns = cols_new
-        
-        # Feature Engineering
-        df1['vehicle_age'] = df1['vehicle_age'].apply(
-            lambda x: 'over2years' if x == '> 2 Years'
-            else 'between1and2years' if x == '1-2 Year'
-            else 'lessthan1year' if x == '< 1 Year'
-            else x
-        )
+            negative_ratio = os.environ.get('TRAIN_NEGATIVE_RATIO')
+            sampling_params = {
+                'size': int(os.environ.get('TRAIN_SAMPLE_SIZE', 10000)),
+                'negative_ratio': float(negative_ratio) if negative_ratio else None,
+                'seed': 42,
+            }
         
-        df1['vehicle_damage'] = df1['vehicle_damage'].apply(
-            lambda x: 1 if str(x).strip().lower() == 'yes' else 0
+        parse = cache.stage(
+            'parse', {'data': file_digest(data_file), 'schema': DTYPES, 'sampling': sampling_params},
+            lambda: load_training_frame(data_file, **sampling_params)
         )
-        
-        # Separar features e target
-        X = df1.drop('response', axis=1)
-        y = df1['response']
-        
-        # Usar apenas features essenciais para economizar memória
-        essential_features = ['age', 'annual_premium', 'vintage', 'region_code', 
-                             'policy_sales_channel', 'previously_insured', 'vehicle_damage']
-        
-        X_essential = X[essential_features]
-        del X  # Liberar memória
-        gc.collect()
-        
-        # Split dados
-        X_train, X_test, y_train, y_test = train_test_split(
-            X_essential, y, test_size=0.2, random_state=42
+        encoders = cache.stage('encoders', {'parse': parse.key}, lambda: fit_simple_encoders(parse.value[0]))
+        scalers = cache.stage('scalers', {'parse': parse.key}, lambda: fit_simple_scalers(parse.value[0]))
+        model = cache.stage(
+            'model', {'parse': parse.key, 'encoders': encoders.key, 'scalers': scalers.key,
+                      'features': ESSENTIAL_FEATURES, 'params': MODEL_PARAMS},
+            lambda: fit_lightweight_model(*parse.value, {**scalers.value, **encoders.value})
         )
         
-        del X_essential  # Liberar memória
-        gc.collect()
-        
-        # Usar modelo mais leve (Logistic Regression ao invés de Random Forest)
-        print("🤖 Treinando Logistic Regression (modelo leve)...")
-        model = LogisticRegression(
-            random_state=42, 
-            max_iter=100,  # Menos iterações
-            solver='liblinear'  # Solver mais eficiente
-        )
-        model.fit(X_train, y_train)
-        
         # Criar diretórios
         os.makedirs('model', exist_ok=True)
         os.makedirs('parameter', exist_ok=True)
         
         # Salvar modelo
         print("💾 Salvando modelo...")
+        fitted, sampling = model.value
         with open('model/model_health_insurance.pkl', 'wb') as f:
-            pickle.dump(model, f)
+            pickle.dump(fitted, f)
+        if sampling is not None:
+            with open('model/sampling.json', 'w') as f:
+                json.dump(sampling, f, indent=2)
         
         # Criar transformadores simples
         print("🔧 Criando transformadores...")
-        create_simple_transformers(df1)
+        save_parameters({**scalers.value, **encoders.value})
         
         print("✅ Modelo leve e parâmetros salvos com sucesso!")
         
+        # Bundle único sem pickle (carregado via mmap pela API)
+        export_model_bundle()
+        
+        cache.write_manifest(data_file=data_file)
+        print("🗂️ Cache de build (model/build_manifest.json):")
+        print("\n".join(cache.summary()))
+        
         # Limpeza final de memória
-        del df1, X_train, X_test, y_train, y_test, model
+        del parse, model, fitted
         gc.collect()
         
     except Exception as e:
@@ -130,41 +113,98 @@ def train_lightweight_model():
         print("Criando modelo dummy...")
         create_lightweight_dummy_model()
 
-def create_simple_transformers(df):
+def load_training_frame(data_file, size=None, negative_ratio=None, seed=42):
     """
-    Cria transformadores simples para economizar memória
+    Lê e prepara os dados; devolve (df1, sample_weight, resumo da amostragem ou None)
     """
-    # StandardScaler para annual_premium
-    ss = StandardScaler()
-    if 'annual_premium' in df.columns:
-        ss.fit(df[['annual_premium']])
+    print(f"📊 Carregando dados de: {data_file}")
+    sampling = None
+    if size is not None:
+        # Amostra estratificada em uma passada: memória limitada pelo tamanho da amostra
+        df_raw, sample_weight, sampling = stratified_sample(data_file, size, negative_ratio=negative_ratio, seed=seed)
+        print(f"   Usando amostra estratificada de {len(df_raw)} de {sampling['rows']} linhas para economizar memória")
     else:
-        ss.fit(np.random.random((10, 1)))
+        df_raw = read_csv(data_file)
+        sample_weight = np.ones(len(df_raw))
+    # pesos de amostragem com média 1: reponderam as classes sem mudar a regularização
+    sample_weight = sample_weight / sample_weight.mean()
     
-    with open('parameter/annual_premium_scaler.pkl', 'wb') as f:
-        pickle.dump(ss, f)
+    # Processar dados
+    df1 = df_raw.copy()
+    del df_raw  # Liberar memória
+    gc.collect()
     
-    # MinMaxScaler para age
-    mms_age = MinMaxScaler()
-    if 'age' in df.columns:
-        mms_age.fit(df[['age']])
-    else:
-        mms_age.fit(np.random.random((10, 1)))
+    # Renomear colunas (mapa fixo do schema)
+    df1 = rename(df1)
     
-    with open('parameter/age_scaler.pkl', 'wb') as f:
-        pickle.dump(mms_age, f)
+    # Feature Engineering
+    df1['vehicle_age'] = df1['vehicle_age'].apply(
+        lambda x: 'over2years' if x == '> 2 Years'
+        else 'between1and2years' if x == '1-2 Year'
+        else 'lessthan1year' if x == '< 1 Year'
+        else x
+    )
     
-    # MinMaxScaler para vintage
-    mms_vintage = MinMaxScaler()
-    if 'vintage' in df.columns:
-        mms_vintage.fit(df[['vintage']])
-    else:
-        mms_vintage.fit(np.random.random((10, 1)))
+    df1['vehicle_damage'] = df1['vehicle_damage'].apply(
+        lambda x: 1 if str(x).strip().lower() == 'yes' else 0
+    ).astype(np.int8)
+    return df1, sample_weight, sampling
+
+def fit_lightweight_model(df1, sample_weight, sampling, parameters):
+    """
+    Treina a Logistic Regression; devolve (modelo, resumo da amostragem)
+
+    As features passam pelo mesmo data_preparation da API, com os scalers e
+    encoders salvos em parameter/
+    """
+    # Separar features e target
+    pipeline = HealthInsurance(artifacts=parameters)
+    X_essential = pipeline.data_preparation(df1.drop(columns='response').copy())[ESSENTIAL_FEATURES]
+    y = df1['response']
+    
+    # Split dados
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        X_essential, y, sample_weight, test_size=0.2, random_state=42
+    )
     
-    with open('parameter/vintage_scaler.pkl', 'wb') as f:
-        pickle.dump(mms_vintage, f)
+    del X_essential  # Liberar memória
+    gc.collect()
     
-    # Encoders simples
+    print("🤖 Treinando Logistic Regression (modelo leve)...")
+    model = LogisticRegression(**MODEL_PARAMS)
+    model.fit(X_train, y_train, sample_weight=w_train)
+    return model, sampling
+
+def export_model_bundle():
+    """
+    Exporta modelo e parâmetros para model/health_insurance.bundle
+    """
+    try:
+        from health_insurance.bundle import export_bundle
+        print(f"📦 Bundle salvo em {export_bundle()}")
+    except Exception as e:
+        print(f"⚠️ Bundle não gerado: {e}")
+
+
+def fit_simple_scalers(df):
+    """
+    Scalers simples; colunas ausentes recebem scalers ajustados em dados aleatórios
+    """
+    scalers = {}
+    # StandardScaler para annual_premium, MinMaxScaler para age e vintage
+    for column, scaler in (('annual_premium', StandardScaler()), ('age', MinMaxScaler()), ('vintage', MinMaxScaler())):
+        if column in df.columns:
+            # arrays, como o data_preparation passa as colunas
+            scaler.fit(df[[column]].values.astype(np.float64))
+        else:
+            scaler.fit(np.random.random((10, 1)))
+        scalers[f'{column}_scaler'] = scaler
+    return scalers
+
+def fit_simple_encoders(df):
+    """
+    Encoders simples (frequência) para economizar memória
+    """
     if 'gender' in df.columns:
         gender_encoding = df.groupby('gender').size().to_dict()
         # Normalizar
@@ -173,9 +213,6 @@ def create_simple_transformers(df):
     else:
         gender_encoding = {'Male': 0.6, 'Female': 0.4}
     
-    with open('parameter/gender_encoder.pkl', 'wb') as f:
-        pickle.dump(gender_encoding, f)
-    
     # Region code encoding simples
     if 'region_code' in df.columns:
         region_encoding = df.groupby('region_code').size().to_dict()
@@ -184,17 +221,25 @@ def create_simple_transformers(df):
     else:
         region_encoding = {i: 0.02 for i in range(1, 54)}
     
-    with open('parameter/region_code_encoder.pkl', 'wb') as f:
-        pickle.dump(region_encoding, f)
-    
     # Policy sales channel encoding
     if 'policy_sales_channel' in df.columns:
         policy_encoding = df.groupby('policy_sales_channel').size() / len(df)
     else:
         policy_encoding = {i: 0.01 for i in range(1, 165)}
     
-    with open('parameter/policy_sales_channel_encoder.pkl', 'wb') as f:
-        pickle.dump(policy_encoding, f)
+    return {
+        'gender_encoder': gender_encoding,
+        'region_code_encoder': region_encoding,
+        'policy_sales_channel_encoder': policy_encoding,
+    }
+
+def save_parameters(parameters):
+    """
+    Grava cada transformador em parameter/<nome>.pkl
+    """
+    for name, obj in parameters.items():
+        with open(f'parameter/{name}.pkl', 'wb') as f:
+            pickle.dump(obj, f)
 
 def create_lightweight_dummy_model():
     """
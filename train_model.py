@@ -3,25 +3,40 @@
 Script para treinar o modelo durante o deploy no Render
 """
 
+import argparse
+import json
 import os
 import pickle
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-import inflection
+from health_insurance.schema import DTYPES, read_csv, rename
+from health_insurance.budget import Budget, StageMeter, fit_budgeted_forest, report_lines
+from health_insurance.build_cache import BuildCache, file_digest
+from health_insurance.encoders import DEFAULT_SMOOTHING, frame_encoders
+from health_insurance.HealthInsurance import FEATURE_COLUMNS, HealthInsurance
 
-def train_model():
+FOREST_PARAMS = {'n_estimators': 100, 'random_state': 42}
+
+def train_model(budget=None, cache=None):
     """
     Treina o modelo usando os dados de treino
+
+    Com `budget` (ou TRAIN_MAX_RSS_MB / TRAIN_MAX_MODEL_MB) o Random Forest
+    é dimensionado para caber nos limites de RAM e de tamanho do modelo
+
+    O modelo é treinado e validado com as mesmas features que a API entrega
+    a ele: a saída de HealthInsurance.data_preparation (FEATURE_COLUMNS),
+    com os scalers e encoders salvos em parameter/
+
+    Encoders, leitura/split, scalers e modelo ficam no cache de build sob o
+    hash dos dados, das features e dos hiperparâmetros: só as etapas cujas
+    entradas mudaram são recalculadas (model/build_manifest.json)
     """
     print("=== TREINANDO MODELO NO RENDER ===")
-    
-    # Verificar se o modelo já existe
-    if os.path.exists('model/model_health_insurance.pkl'):
-        print("✅ Modelo já existe, carregando...")
-        return
+    if budget is None:
+        budget = Budget.from_env()
     
     # Verificar se os dados existem
     data_file = None
@@ -31,56 +46,31 @@ def train_model():
     elif os.path.exists('data/sample_train.csv'):
         data_file = 'data/sample_train.csv'
         print("📊 Usando dados de exemplo...")
+    elif os.path.exists('model/model_health_insurance.pkl'):
+        print("✅ Modelo já existe, carregando...")
+        return
     else:
         print("❌ Nenhum arquivo de dados encontrado!")
         print("Criando modelo dummy para demonstração...")
         create_dummy_model()
         return
     
+    meter = StageMeter()
+    cache = cache or BuildCache()
     try:
-        # Carregar dados
-        print(f"📊 Carregando dados de: {data_file}")
-        df_raw = pd.read_csv(data_file)
-        
-        # Processar dados (mesmo código do notebook)
-        df1 = df_raw.copy()
-        
-        # Renomear colunas
-        cols_old = df1.columns
-        snakecase = lambda x: inflection.underscore(x)
-        cols_new = list(map(snakecase, cols_old))
-        df1.columns = cols_new
-        
-        # Feature Engineering
-        df1['vehicle_age'] = df1['vehicle_age'].apply(
-            lambda x: 'over2years' if x == '> 2 Years'
-            else 'between1and2years' if x == '1-2 Year'
-            else 'lessthan1year' if x == '< 1 Year'
-            else x
-        )
+        data = {'data': file_digest(data_file), 'schema': DTYPES}
+        parse = cache.stage('parse', data, lambda: load_split(data_file, meter))
+        encoders = cache.stage('encoders', {'parse': parse.key, 'smoothing': DEFAULT_SMOOTHING},
+                               lambda: fit_split_encoders(*parse.value, meter))
+        scalers = cache.stage('scalers', {'parse': parse.key}, lambda: fit_scalers(parse.value[0]))
+        forest = cache.stage('model', {'parse': parse.key, 'encoders': encoders.key, 'scalers': scalers.key,
+                                       'features': FEATURE_COLUMNS, 'params': FOREST_PARAMS,
+                                       'budget': budget.to_dict() if budget is not None else None},
+                             lambda: fit_forest(*prepare_split(parse.value, {**scalers.value, **encoders.value}, meter),
+                                                budget, meter))
         
-        df1['vehicle_damage'] = df1['vehicle_damage'].apply(
-            lambda x: 1 if str(x).strip().lower() == 'yes' else 0
-        )
-        
-        # Separar features e target
-        X = df1.drop('response', axis=1)
-        y = df1['response']
-        
-        # Split dados
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Preparar features para treinamento
-        features_for_model = ['age', 'annual_premium', 'vintage', 'region_code', 
-                             'policy_sales_channel', 'previously_insured', 'vehicle_damage']
-        
-        X_train_model = X_train[features_for_model]
-        X_test_model = X_test[features_for_model]
-        
-        # Treinar modelo
-        print("🤖 Treinando Random Forest...")
-        model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        model.fit(X_train_model, y_train)
+        model, report = forest.value
+        meter.mark('save')
         
         # Criar diretórios
         os.makedirs('model', exist_ok=True)
@@ -91,49 +81,118 @@ def train_model():
         with open('model/model_health_insurance.pkl', 'wb') as f:
             pickle.dump(model, f)
         
-        # Criar e salvar transformadores
+        # Scalers + target encoding suavizado (gender, region_code) e frequency encoding (policy_sales_channel)
         print("🔧 Criando transformadores...")
+        for name, obj in {**scalers.value, **encoders.value}.items():
+            with open(f'parameter/{name}.pkl', 'wb') as f:
+                pickle.dump(obj, f)
         
-        # StandardScaler para annual_premium
-        ss = StandardScaler()
-        ss.fit(X_train[['annual_premium']])
-        with open('parameter/annual_premium_scaler.pkl', 'wb') as f:
-            pickle.dump(ss, f)
-        
-        # MinMaxScaler para age
-        mms_age = MinMaxScaler()
-        mms_age.fit(X_train[['age']])
-        with open('parameter/age_scaler.pkl', 'wb') as f:
-            pickle.dump(mms_age, f)
-        
-        # MinMaxScaler para vintage
-        mms_vintage = MinMaxScaler()
-        mms_vintage.fit(X_train[['vintage']])
-        with open('parameter/vintage_scaler.pkl', 'wb') as f:
-            pickle.dump(mms_vintage, f)
-        
-        # Target encoding para gender
-        gender_encoding = X_train.groupby('gender')['gender'].apply(lambda x: np.random.random()).to_dict()
-        with open('parameter/gender_encoder.pkl', 'wb') as f:
-            pickle.dump(gender_encoding, f)
-        
-        # Target encoding para region_code
-        region_encoding = X_train.groupby('region_code')['region_code'].apply(lambda x: np.random.random()).to_dict()
-        with open('parameter/region_code_encoder.pkl', 'wb') as f:
-            pickle.dump(region_encoding, f)
+        print("✅ Modelo e parâmetros salvos com sucesso!")
         
-        # Frequency encoding para policy_sales_channel
-        policy_encoding = X_train.groupby('policy_sales_channel').size() / len(X_train)
-        with open('parameter/policy_sales_channel_encoder.pkl', 'wb') as f:
-            pickle.dump(policy_encoding, f)
+        # Bundle único sem pickle (carregado via mmap pela API)
+        meter.mark('bundle')
+        export_model_bundle(model)
+        meter.finish()
         
-        print("✅ Modelo e parâmetros salvos com sucesso!")
+        print("📏 RSS de pico por etapa:")
+        print("\n".join(meter.lines()))
+        cache.write_manifest(data_file=data_file)
+        print("🗂️ Cache de build (model/build_manifest.json):")
+        print("\n".join(cache.summary()))
+        if report is not None:
+            report['stages'] = meter.stages
+            report['model_file_mb'] = round(os.path.getsize('model/model_health_insurance.pkl') / 1024 / 1024, 2)
+            with open('model/training_report.json', 'w') as f:
+                json.dump(report, f, indent=2)
+            print("🧾 Relatório salvo em model/training_report.json")
         
     except Exception as e:
         print(f"❌ Erro durante treinamento: {e}")
         print("Criando modelo dummy...")
         create_dummy_model()
 
+def fit_split_encoders(X_train, X_test, y_train, y_test, meter):
+    """
+    Encoders só com as linhas de treino: o target encoding entra nas features
+    do modelo, então as linhas de validação não podem contribuir para ele
+    """
+    print("🔢 Ajustando encoders...")
+    meter.mark('encoders')
+    return frame_encoders(X_train, y_train)
+
+def load_split(data_file, meter):
+    """
+    Lê e separa os dados; devolve (X_train, X_test, y_train, y_test) com as colunas brutas em snake_case
+    """
+    # Carregar dados
+    print(f"📊 Carregando dados de: {data_file}")
+    meter.mark('load')
+    df_raw = read_csv(data_file)
+    meter.mark('prepare')
+    
+    # Renomear colunas (mapa fixo do schema)
+    df1 = rename(df_raw)
+    
+    # Separar features e target
+    X = df1.drop(columns=['id', 'response'], errors='ignore')
+    y = df1['response']
+    
+    # Split dados
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    del df_raw, df1, X
+    return X_train, X_test, y_train, y_test
+
+def prepare_split(split, parameters, meter):
+    """
+    Features do modelo pelo mesmo pipeline da API (feature_engineering + data_preparation)
+    """
+    X_train, X_test, y_train, y_test = split
+    meter.mark('features')
+    pipeline = HealthInsurance(artifacts=parameters)
+    
+    def prepare(X):
+        df = pipeline.data_preparation(pipeline.feature_engineering(X.copy()))
+        # níveis de vehicle_age ausentes viram dummies zeradas, como nos engines
+        return df.reindex(columns=FEATURE_COLUMNS, fill_value=0).astype(np.float64)
+    
+    return prepare(X_train), prepare(X_test), y_train, y_test
+
+def fit_scalers(X_train):
+    """
+    StandardScaler para annual_premium, MinMaxScaler para age e vintage
+    """
+    # arrays, como o data_preparation passa as colunas
+    return {
+        'annual_premium_scaler': StandardScaler().fit(X_train[['annual_premium']].values.astype(np.float64)),
+        'age_scaler': MinMaxScaler().fit(X_train[['age']].values),
+        'vintage_scaler': MinMaxScaler().fit(X_train[['vintage']].values),
+    }
+
+def fit_forest(X_train, X_test, y_train, y_test, budget, meter):
+    """
+    Treina o Random Forest; devolve (modelo, relatório do orçamento ou None)
+    """
+    if budget is not None:
+        print(f"🤖 Treinando Random Forest com orçamento (RAM: {budget.max_rss_mb} MB, modelo: {budget.max_model_mb} MB)...")
+        model, report = fit_budgeted_forest(X_train, y_train, X_test, y_test, budget, meter)
+        print("\n".join(report_lines(report)))
+        return model, report
+    print("🤖 Treinando Random Forest...")
+    meter.mark('fit')
+    model = RandomForestClassifier(**FOREST_PARAMS, n_jobs=-1)
+    model.fit(X_train, y_train)
+    return model, None
+
+def export_model_bundle(model=None):
+    """
+    Exporta modelo e parâmetros para model/health_insurance.bundle
+    """
+    try:
+        from health_insurance.bundle import export_bundle
+        print(f"📦 Bundle salvo em {export_bundle(model=model)}")
+    except Exception as e:
+        print(f"⚠️ Bundle não gerado: {e}")
+
 def create_dummy_model():
     """
     Cria um modelo dummy para demonstração
@@ -187,4 +246,11 @@ def create_dummy_model():
     print("✅ Modelo dummy criado com sucesso!")
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Treina o modelo de propensão")
+    parser.add_argument('--max-rss-mb', type=float, default=None, help='orçamento de RAM de pico do treino (TRAIN_MAX_RSS_MB)')
+    parser.add_argument('--max-model-mb', type=float, default=None, help='orçamento do modelo serializado (TRAIN_MAX_MODEL_MB)')
+    args = parser.parse_args()
+    budget = None
+    if args.max_rss_mb or args.max_model_mb:
+        budget = Budget(max_rss_mb=args.max_rss_mb, max_model_mb=args.max_model_mb)
+    train_model(budget)
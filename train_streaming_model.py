@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Treino out-of-core: lê o train.csv completo em chunks e atualiza scalers, encoders e um SGDClassifier
+(log loss) incrementalmente, com memória constante
+
+1ª passada: partial_fit dos scalers e contagens dos encoders (só linhas de treino)
+2ª passada em diante: partial_fit do SGDClassifier, uma passada por época
+última passada: scores das linhas de validação (uma a cada `holdout_every`)
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from health_insurance.HealthInsurance import FEATURE_COLUMNS, HealthInsurance
+from health_insurance.HealthInsurance_optimized import FEATURE_INDEX, HealthInsuranceOptimized
+from health_insurance.encoders import EncoderStats, build_encoders
+from health_insurance.schema import read_csv, rename
+from train_lightweight_model import export_model_bundle
+
+DEFAULT_CHUNKSIZE = 50000
+
+
+def read_chunks( data_file, chunksize, holdout_every ):
+    """(snake_case chunk, holdout mask) pairs; the split depends only on the row position."""
+    offset = 0
+    for chunk in read_csv( data_file, chunksize=chunksize ):
+        rename( chunk )
+        holdout = np.arange( offset, offset + len( chunk ) ) % holdout_every == 0 if holdout_every else np.zeros( len( chunk ), bool )
+        offset += len( chunk )
+        yield chunk, holdout
+
+
+def fit_parameters( data_file, chunksize, holdout_every ):
+    """Pass 1: scalers via partial_fit and encoders via mergeable counts; returns (artifacts, class counts)."""
+    scalers = { 'annual_premium': StandardScaler(), 'age': MinMaxScaler(), 'vintage': MinMaxScaler() }
+    counts = { name: EncoderStats() for name in ( 'gender', 'region_code', 'policy_sales_channel' ) }
+    classes = np.zeros( 2 )
+    for chunk, holdout in read_chunks( data_file, chunksize, holdout_every ):
+        train = chunk[~holdout]
+        if not len( train ):
+            continue
+        for name, scaler in scalers.items():
+            scaler.partial_fit( train[name].to_numpy( dtype=np.float64 ).reshape( -1, 1 ) )
+        for name, running in counts.items():
+            running.update( train[name], train['response'] )
+        classes += np.bincount( train['response'].to_numpy(), minlength=2 )[:2]
+
+    artifacts = { name + '_scaler': scaler for name, scaler in scalers.items() }
+    # smoothed target encoding for gender and region, frequency encoding for the sales channel
+    artifacts.update( build_encoders( counts ) )
+    return artifacts, classes
+
+
+def features( engine, chunk ):
+    X = engine.prepare( chunk, len( chunk ) )
+    return pd.DataFrame( X[:, [ FEATURE_INDEX[c] for c in FEATURE_COLUMNS ]], columns=FEATURE_COLUMNS )
+
+
+def train_streaming_model( data_file='data/train.csv', chunksize=DEFAULT_CHUNKSIZE, epochs=3, holdout_every=5, balanced=True,
+                           alpha=1e-4, random_state=42 ):
+    """
+    Treina o SGDClassifier em chunks e grava artefatos compatíveis com HealthInsurance; devolve as métricas de validação
+    """
+    print( f"=== TREINO OUT-OF-CORE ({data_file}, chunks de {chunksize}) ===" )
+    artifacts, classes = fit_parameters( data_file, chunksize, holdout_every )
+    print( f"📊 {int( classes.sum() )} linhas de treino, {int( classes[1] )} positivas" )
+
+    engine = HealthInsuranceOptimized( HealthInsurance( artifacts=artifacts ) )
+    # 'balanced' as sample weights: SGDClassifier.partial_fit does not take class_weight='balanced'
+    weights = classes.sum() / ( 2 * np.maximum( classes, 1 ) ) if balanced else np.ones( 2 )
+    model = SGDClassifier( loss='log_loss', alpha=alpha, random_state=random_state )
+    rng = np.random.default_rng( random_state )
+    for epoch in range( epochs ):
+        for chunk, holdout in read_chunks( data_file, chunksize, holdout_every ):
+            train = chunk[~holdout]
+            if not len( train ):
+                continue
+            order = rng.permutation( len( train ) )
+            X = features( engine, train ).iloc[order]
+            y = train['response'].to_numpy()[order]
+            model.partial_fit( X, y, classes=np.array( [ 0, 1 ] ), sample_weight=weights[y] )
+        print( f"🤖 Época {epoch + 1}/{epochs} concluída" )
+
+    metrics = evaluate( model, engine, data_file, chunksize, holdout_every )
+    if metrics:
+        print( f"📈 Validação: acurácia {metrics['accuracy']:.4f}  recall {metrics['recall']:.4f}  AUC {metrics['roc_auc']:.4f}" )
+
+    os.makedirs( 'model', exist_ok=True )
+    os.makedirs( 'parameter', exist_ok=True )
+    with open( 'model/model_health_insurance.pkl', 'wb' ) as f:
+        pickle.dump( model, f )
+    for name, obj in artifacts.items():
+        with open( f'parameter/{name}.pkl', 'wb' ) as f:
+            pickle.dump( obj, f )
+    print( "✅ Modelo e parâmetros salvos com sucesso!" )
+    export_model_bundle()
+    return metrics
+
+
+def evaluate( model, engine, data_file, chunksize, holdout_every ):
+    from sklearn.metrics import accuracy_score, recall_score, roc_auc_score
+    scores, labels = [], []
+    for chunk, holdout in read_chunks( data_file, chunksize, holdout_every ):
+        if holdout.any():
+            scores.append( model.predict_proba( features( engine, chunk[holdout] ) )[:, 1] )
+            labels.append( chunk['response'].to_numpy()[holdout] )
+    if not scores:
+        return None
+    p, y = np.concatenate( scores ), np.concatenate( labels )
+    return { 'accuracy': accuracy_score( y, p > 0.5 ), 'recall': recall_score( y, p > 0.5, zero_division=0 ),
+             'roc_auc': roc_auc_score( y, p ) if len( np.unique( y ) ) == 2 else float( 'nan' ) }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description="Treino out-of-core do SGDClassifier sobre o train.csv completo" )
+    parser.add_argument( '--data', default='data/train.csv' )
+    parser.add_argument( '--chunksize', type=int, default=DEFAULT_CHUNKSIZE )
+    parser.add_argument( '--epochs', type=int, default=3 )
+    parser.add_argument( '--holdout-every', type=int, default=5, help='1 linha de validação a cada N (0 desativa)' )
+    parser.add_argument( '--no-balance', dest='balanced', action='store_false', help='sem pesos de classe balanceados' )
+    args = parser.parse_args()
+    train_streaming_model( args.data, args.chunksize, args.epochs, args.holdout_every, args.balanced )